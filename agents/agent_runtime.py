@@ -0,0 +1,223 @@
+import os
+import sys
+import time
+import random
+import signal
+import asyncio
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from firebase_admin import firestore
+
+from agent_v3_cloud import C_Agent_Cloud
+from agent_v4_persistent import C_Agent_Persistent, initialize_firestore
+from heartbeat_coordinator import HeartbeatCoordinator
+from ledger_backends import WriteBehindCache, open_backend
+from metrics import METRICS
+
+# --- ASYNC AGENT RUNTIME ---
+
+class AgentRuntime:
+    """
+    Hosts many agent lifecycles as coroutines on one event loop.
+    Each lifecycle registers its agent, heartbeats on a jittered interval and writes a
+    final 'stopped' status on shutdown. The Firestore client is blocking, so every call
+    is offloaded to a bounded thread pool; the loop itself never blocks on the network.
+    In batched mode, persistent agents only mark themselves and one flusher coroutine
+    commits the marks through a HeartbeatCoordinator. With a `ledger` backend, agents
+    write there instead and the backend (typically a WriteBehindCache) does the batching.
+    """
+    FINAL_FLUSH_ATTEMPTS = 3  # Flushes tried at shutdown before pending marks are given up
+    def __init__(self, db, count, kind="persistent", interval=30.0, jitter=0.1,
+                 max_workers=32, batched=True, flush_interval=1.0, id_prefix="runtime-agent", ledger=None):
+        self.db = db
+        self.count = count
+        self.kind = kind
+        self.interval = interval
+        self.jitter = jitter
+        self.ledger = ledger
+        self.batched = batched and kind == "persistent" and ledger is None
+        self.flush_interval = flush_interval
+        self.id_prefix = id_prefix
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="firestore")
+        # Caps the blocking calls queued on the executor so 10k agents cannot flood it
+        self._slots = None
+        self._max_workers = max_workers
+        self.coordinator = HeartbeatCoordinator(db, interval=interval, jitter=jitter) if self.batched else None
+        self.agents = []
+        self.stopping = None
+        self.heartbeats = 0
+        self.errors = 0
+
+    async def _blocking(self, fn, *args):
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def _create(self, index):
+        agent_id = f"{self.id_prefix}-{os.getpid()}-{index}"
+        if self.kind == "cloud":
+            return C_Agent_Cloud(db=self.db, agent_id=agent_id, ledger=self.ledger)
+        return C_Agent_Persistent(db=self.db, agent_id=agent_id, coordinator=self.coordinator, ledger=self.ledger)
+
+    def _beat(self, agent):
+        # C_Agent_Cloud has no heartbeat; re-registering refreshes its last_seen
+        if self.kind == "cloud":
+            agent.register()
+        else:
+            agent.heartbeat()
+
+    def _final_status(self, agent):
+        agent.ledger.update(agent.id, {
+            'last_seen': firestore.SERVER_TIMESTAMP,
+            'status': 'stopped',
+        })
+
+    async def _wait(self, seconds):
+        """Sleeps, returning early (True) if shutdown was requested."""
+        try:
+            await asyncio.wait_for(self.stopping.wait(), timeout=seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _lifecycle(self, index):
+        try:
+            agent = await self._blocking(self._create, index)
+        except Exception as e:
+            self.errors += 1
+            print(f"[!!!] Agent {index} failed to register: {e}")
+            return
+        self.agents.append(agent)
+
+        # Spread the first heartbeats across one interval
+        if await self._wait(random.uniform(0, self.interval)):
+            return
+        while True:
+            try:
+                if self.batched:
+                    self._beat(agent)  # Only records a mark; the flusher does the I/O
+                else:
+                    await self._blocking(self._beat, agent)
+                self.heartbeats += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"[!] Heartbeat failed for Agent {agent.id}: {e}")
+            spread = self.interval * self.jitter
+            if await self._wait(self.interval + random.uniform(-spread, spread)):
+                return
+
+    async def _flush(self):
+        # Marks are made on this loop, so the pending map is swapped and refilled here;
+        # only the Firestore commits go to the executor
+        items = self.coordinator.take_pending()
+        if items:
+            self.coordinator.requeue(await self._blocking(self.coordinator.commit_pending, items))
+
+    async def _flusher(self):
+        while not await self._wait(self.flush_interval):
+            await self._flush()
+
+    async def _shutdown(self):
+        print(f"[SYS] Shutting down {len(self.agents)} agents...")
+        if self.batched:
+            for agent in self.agents:
+                self.coordinator.mark(agent, status='stopped')
+            # Each flush already retries transient errors; a few more cover a longer outage
+            for _ in range(self.FINAL_FLUSH_ATTEMPTS):
+                await self._flush()
+                if not self.coordinator.pending:
+                    break
+            lost = len(self.coordinator.pending)
+            if lost:
+                self.errors += lost
+                print(f"[!!!] {lost} final statuses could not be written.")
+        else:
+            results = await asyncio.gather(*(self._blocking(self._final_status, agent) for agent in self.agents),
+                                           return_exceptions=True)
+            self.errors += sum(isinstance(result, Exception) for result in results)
+        print(f"[SYS] Final status written. Heartbeats sent: {self.heartbeats}. Errors: {self.errors}.")
+
+    def request_stop(self):
+        if not self.stopping.is_set():
+            print("[SYS] Stop requested.")
+            self.stopping.set()
+
+    async def run(self):
+        self.stopping = asyncio.Event()
+        self._slots = asyncio.Semaphore(self._max_workers * 4)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            with contextlib.suppress(NotImplementedError):
+                loop.add_signal_handler(sig, self.request_stop)
+
+        print(f"[SYS] Starting {self.count} {self.kind} agents on one event loop.")
+        tasks = [asyncio.create_task(self._lifecycle(index)) for index in range(self.count)]
+        if self.batched:
+            tasks.append(asyncio.create_task(self._flusher()))
+        await self.stopping.wait()
+        await asyncio.gather(*tasks)
+        await self._shutdown()
+        self.executor.shutdown(wait=True)
+
+
+# --- Main execution block ---
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host many Chrysalis agents in one process.")
+    parser.add_argument("--agents", type=int, default=int(os.environ.get("AGENTS_PER_PROCESS", "1")),
+                        help="Agents hosted by this process (default: $AGENTS_PER_PROCESS or 1).")
+    parser.add_argument("--kind", choices=("persistent", "cloud"), default="persistent")
+    parser.add_argument("--interval", type=float, default=30.0, help="Seconds between heartbeats.")
+    parser.add_argument("--executor-workers", type=int, default=32, help="Threads for blocking Firestore calls.")
+    parser.add_argument("--unbatched", action="store_true", help="One Firestore update per heartbeat.")
+    parser.add_argument("--offline", action="store_true", help="Use the in-memory Firestore stand-in.")
+    parser.add_argument("--ledger", default=None,
+                        help="Ledger backend instead of Firestore: 'memory' or 'sqlite:<path>' (write-behind cached).")
+    parser.add_argument("--run-for", type=float, default=None, help="Stop after this many seconds.")
+    parser.add_argument("--quiet", action="store_true", help="Silence the per-agent console lines.")
+    parser.add_argument("--metrics-port", type=int, default=int(os.environ.get("METRICS_PORT", "0")),
+                        help="Serve Prometheus metrics on this local port (default: $METRICS_PORT, 0 = off).")
+    parser.add_argument("--metrics-sample", type=int, default=16, help="Time one call in N per stage.")
+    args = parser.parse_args()
+
+    print("------ Project Chrysalis: Async Agent Runtime ------")
+    if args.offline:
+        from memory_firestore import InMemoryFirestore
+        db_client = InMemoryFirestore()
+    else:
+        db_client = initialize_firestore()
+    if not db_client:
+        print("[!!!] Could not initialize Firestore. Runtime shutting down.")
+        sys.exit(1)
+
+    ledger = None
+    if args.ledger:
+        ledger = WriteBehindCache(open_backend(args.ledger, db=db_client))
+        ledger.start()
+    runtime = AgentRuntime(db_client, args.agents, kind=args.kind, interval=args.interval,
+                           max_workers=args.executor_workers, batched=not args.unbatched, ledger=ledger)
+    if args.metrics_port:
+        METRICS.enable(args.metrics_sample)
+        METRICS.gauge("runtime_agents", lambda: len(runtime.agents))
+        METRICS.gauge("runtime_heartbeats_total", lambda: runtime.heartbeats, kind="counter")
+        METRICS.gauge("runtime_errors_total", lambda: runtime.errors, kind="counter")
+        METRICS.serve(args.metrics_port, host=os.environ.get("METRICS_HOST", "127.0.0.1"))
+
+    async def main():
+        if args.run_for is not None:
+            asyncio.get_running_loop().call_later(args.run_for, runtime.request_stop)
+        await runtime.run()
+
+    started = time.monotonic()
+    with contextlib.ExitStack() as stack:
+        if args.quiet:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        asyncio.run(main())
+    if ledger is not None:
+        ledger.close()
+        print(f"[SYS] Ledger writes: {ledger.stats()}")
+    if args.offline:
+        print(f"[SYS] In-memory ledger stats after {time.monotonic() - started:.1f}s: {db_client.stats()}")
+    if METRICS.enabled:
+        METRICS.report()
+    print("------ RUNTIME STOPPED ------")
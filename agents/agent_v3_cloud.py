@@ -3,6 +3,8 @@ import time
 import os
 import firebase_admin
 from firebase_admin import credentials, firestore
+from ledger_backends import FirestoreBackend
+from metrics import METRICS
 
 # --- AGENT DEFINITION (v3.0 with Cloud Ledger Integration) ---
 
@@ -11,25 +13,34 @@ class C_Agent_Cloud:
     Chrysalis Agent v3.0
     This version communicates with a live Google Firestore database as its Synaptic Ledger.
     """
-    def __init__(self, db, agent_id=None):
+    def __init__(self, db, agent_id=None, ledger=None, peers=None):
         self.db = db  # Firestore database client
         self.id = agent_id if agent_id else str(uuid.uuid4())
         self.internal_state = 0.5 # Start with a neutral state
-        self.collection_ref = self.db.collection('agents') # Reference to the 'agents' collection
+        # Where the agent's record lives: the 'agents' collection unless another backend is given
+        self.ledger = ledger if ledger is not None else FirestoreBackend(db)
+
+        # Optional PeerCache shared by the agents of this process, for read-free peer discovery
+        self.peers = peers
 
         # Register this agent in the cloud ledger
         self.register()
 
     def register(self):
-        """Registers or updates the agent's document in Firestore."""
-        doc_ref = self.collection_ref.document(self.id)
-        doc_ref.set({
+        """Registers or updates the agent's record in the ledger."""
+        self.ledger.set(self.id, {
             'id': self.id,
             'internal_state': self.internal_state,
             'last_seen': firestore.SERVER_TIMESTAMP # Use server time for consistency
         })
         print(f"[+] AGENT {self.id} is ALIVE and registered in the Cloud Ledger.")
 
+    def find_peer(self):
+        """ID of a random live agent to pulse, from the local peer cache (no remote read)."""
+        return self.peers.random_peer(exclude_id=self.id) if self.peers is not None else None
+
+METRICS.hot_path(C_Agent_Cloud, "register", "find_peer", prefix="cloud_agent_")
+
 # --- INITIALIZATION AND TEST BLOCK ---
 
 def initialize_firestore():
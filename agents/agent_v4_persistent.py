@@ -3,18 +3,26 @@ import time
 import os
 import firebase_admin
 from firebase_admin import credentials, firestore
+from ledger_backends import FirestoreBackend
+from metrics import METRICS
 
 class C_Agent_Persistent:
-    def __init__(self, db, agent_id=None):
+    def __init__(self, db, agent_id=None, coordinator=None, ledger=None, peers=None):
         self.db = db
         self.id = agent_id if agent_id else f"heroku-agent-{uuid.uuid4().hex[:6]}"
-        self.collection_ref = self.db.collection('agents')
+        # Any ledger backend works (SQLite, in-memory, a WriteBehindCache); Firestore by default
+        self.ledger = ledger if ledger is not None else FirestoreBackend(db)
+        self.collection_ref = self.db.collection('agents') if db is not None else None
+        # When hosted by a HeartbeatCoordinator, heartbeats are batched with other agents
+        self.coordinator = coordinator
+        # Optional PeerCache shared by the agents of this process, for read-free peer discovery
+        self.peers = peers
         self.register()
 
     def register(self):
-        """Registers the agent's document in Firestore."""
-        self.doc_ref = self.collection_ref.document(self.id)
-        self.doc_ref.set({
+        """Registers the agent's record in the ledger."""
+        self.doc_ref = self.collection_ref.document(self.id) if self.collection_ref is not None else None
+        self.ledger.set(self.id, {
             'id': self.id,
             'last_seen': firestore.SERVER_TIMESTAMP,
             'status': 'born'
@@ -23,12 +31,22 @@ class C_Agent_Persistent:
 
     def heartbeat(self):
         """Periodically updates the 'last_seen' timestamp to show the agent is alive."""
-        self.doc_ref.update({
+        if self.coordinator is not None:
+            self.coordinator.mark(self)
+            return
+        self.ledger.update(self.id, {
             'last_seen': firestore.SERVER_TIMESTAMP,
             'status': 'running'
         })
         print(f"[*] HEARTBEAT from Agent {self.id}...")
 
+    def find_peer(self):
+        """ID of a random live agent to pulse, from the local peer cache (no remote read)."""
+        return self.peers.random_peer(exclude_id=self.id) if self.peers is not None else None
+
+# NEW: stages exported on the metrics endpoint
+METRICS.hot_path(C_Agent_Persistent, "register", "heartbeat", "find_peer", prefix="agent_")
+
 def initialize_firestore():
     # We need to get the credentials differently on Heroku
     # Heroku provides them as an environment variable
@@ -52,6 +70,11 @@ def initialize_firestore():
 
 if __name__ == "__main__":
     print("------ Project Chrysalis: Persistent Cloud Agent v4.0 ------")
+    # Prometheus text on http://127.0.0.1:9464/metrics (METRICS_PORT=0 turns it off)
+    metrics_port = int(os.environ.get("METRICS_PORT", "9464"))
+    if metrics_port:
+        METRICS.enable(int(os.environ.get("METRICS_SAMPLE_EVERY", "1")))
+        METRICS.serve(metrics_port, host=os.environ.get("METRICS_HOST", "127.0.0.1"))
     db_client = initialize_firestore()
     if db_client:
         agent = C_Agent_Persistent(db=db_client)
@@ -0,0 +1,205 @@
+import time
+import heapq
+import random
+from firebase_admin import firestore
+from google.api_core import exceptions as google_exceptions
+
+from metrics import METRICS
+
+# --- HEARTBEAT COORDINATOR ---
+
+class HeartbeatCoordinator:
+    """
+    Hosts the heartbeats of many C_Agent_Persistent instances in one process.
+    Agents only mark themselves as alive. The coordinator coalesces those marks per
+    document and commits them in WriteBatch chunks of up to 500 documents, so N agents
+    cost N/500 round-trips per interval instead of N. Each agent's schedule is jittered
+    so a fleet started together does not keep firing at the same instant.
+    Transient commit errors are retried with backoff. Any other error is permanent for
+    some document in the batch (e.g. NotFound once it was deleted); the batch is split
+    until that document is alone, and its heartbeat is dropped.
+    """
+    MAX_BATCH = 500  # Firestore's limit on writes per batch
+    TRANSIENT = (ConnectionError, TimeoutError,
+                 google_exceptions.ServiceUnavailable, google_exceptions.DeadlineExceeded,
+                 google_exceptions.Aborted, google_exceptions.InternalServerError,
+                 google_exceptions.TooManyRequests, google_exceptions.ResourceExhausted,
+                 google_exceptions.Unknown)
+
+    def __init__(self, db, interval=30.0, jitter=0.1, batch_size=MAX_BATCH, flush_interval=1.0,
+                 max_retries=5, backoff=0.5, max_backoff=30.0, clock=time.monotonic, sleep=time.sleep):
+        self.db = db
+        self.interval = interval
+        self.jitter = jitter
+        self.flush_interval = flush_interval  # How long run() gathers due heartbeats before committing
+        self.batch_size = min(batch_size, self.MAX_BATCH)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.sleep = sleep
+        self._schedule = []   # (due time, sequence, agent id)
+        self._sequence = 0
+        self.agents = {}
+        self.pending = {}     # agent id -> (doc_ref, fields), coalesced between flushes
+        self.commits = 0
+        self.documents = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0     # Updates dropped because of a permanent error
+
+    def _next_due(self, now):
+        spread = self.interval * self.jitter
+        return now + self.interval + random.uniform(-spread, spread)
+
+    def add(self, agent):
+        """Hosts an agent. Its first heartbeat falls at a random point in the first interval."""
+        self.agents[agent.id] = agent
+        self._sequence += 1
+        heapq.heappush(self._schedule, (self.clock() + random.uniform(0, self.interval), self._sequence, agent.id))
+
+    def remove(self, agent_id):
+        # Its schedule entry is skipped lazily when it comes due
+        self.agents.pop(agent_id, None)
+        self.pending.pop(agent_id, None)
+
+    def mark(self, agent, status="running"):
+        """Records a pending update for the agent. Repeated marks before a flush collapse into one write."""
+        self.pending[agent.id] = (agent.doc_ref, {
+            'last_seen': firestore.SERVER_TIMESTAMP,
+            'status': status,
+        })
+
+    def tick(self, now=None):
+        """Heartbeats every agent that is due, then flushes. Returns the number of agents that beat."""
+        now = self.clock() if now is None else now
+        beats = 0
+        while self._schedule and self._schedule[0][0] <= now:
+            _, _, agent_id = heapq.heappop(self._schedule)
+            agent = self.agents.get(agent_id)
+            if agent is None:
+                continue
+            agent.heartbeat()
+            beats += 1
+            self._sequence += 1
+            heapq.heappush(self._schedule, (self._next_due(now), self._sequence, agent_id))
+        self.flush()
+        return beats
+
+    def flush(self):
+        """Commits all pending updates in batches. Updates from a batch that keeps failing stay pending."""
+        items = self.take_pending()
+        if not items:
+            return 0
+        failed = self.commit_pending(items)
+        self.requeue(failed)
+        return len(items) - len(failed)
+
+    # A flush in three steps, for callers that commit on another thread (agent_runtime):
+    # take_pending and requeue run on the thread that calls mark(), commit_pending anywhere.
+
+    def take_pending(self):
+        """Detaches the pending updates. Marks made from now on go into a fresh map."""
+        pending, self.pending = self.pending, {}
+        return list(pending.items())
+
+    def commit_pending(self, items):
+        """Commits detached updates in batches. Returns the updates of batches that kept failing."""
+        failed = []
+        for start in range(0, len(items), self.batch_size):
+            failed += self._commit(items[start:start + self.batch_size])
+        return failed
+
+    def requeue(self, items):
+        """Keeps failed updates for the next flush, unless a newer mark has replaced them meanwhile."""
+        for agent_id, update in items:
+            self.pending.setdefault(agent_id, update)
+
+    def _commit(self, chunk):
+        """Commits one batch. Returns the updates to requeue: all of them if transient errors persist."""
+        for attempt in range(self.max_retries + 1):
+            batch = self.db.batch()
+            for _, (doc_ref, fields) in chunk:
+                batch.update(doc_ref, fields)
+            try:
+                batch.commit()
+            except self.TRANSIENT as e:
+                if attempt == self.max_retries:
+                    self.failures += 1
+                    print(f"[!!!] Heartbeat batch of {len(chunk)} failed after {attempt + 1} attempts: {e}")
+                    return chunk
+                self.retries += 1
+                delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+                self.sleep(delay * random.uniform(0.5, 1.5))
+                continue
+            except Exception as e:
+                # Retrying cannot help, and a batch is atomic: one bad document would sink
+                # the rest of the batch on every flush. Split until it is alone, then drop it.
+                if len(chunk) == 1:
+                    self.rejected += 1
+                    print(f"[!!!] Heartbeat for {chunk[0][0]} dropped: {e}")
+                    return []
+                middle = len(chunk) // 2
+                return self._commit(chunk[:middle]) + self._commit(chunk[middle:])
+            self.commits += 1
+            self.documents += len(chunk)
+            return []
+        return chunk
+
+    def run(self, should_stop=lambda: False):
+        """Blocking loop: ticks every flush_interval, or sleeps until the next agent is due if that is later."""
+        while not should_stop():
+            if self._schedule:
+                self.sleep(max(self.flush_interval, self._schedule[0][0] - self.clock()))
+            else:
+                self.sleep(self.interval)
+            beats = self.tick()
+            if beats:
+                print(f"[*] HEARTBEAT x{beats}. Batches committed so far: {self.commits}.")
+
+    def stats(self):
+        return {
+            "agents": len(self.agents),
+            "commits": self.commits,
+            "documents": self.documents,
+            "documents_per_commit": self.documents / self.commits if self.commits else 0.0,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+
+METRICS.hot_path(HeartbeatCoordinator, "flush", "commit_pending", "_commit", prefix="heartbeat_")
+
+
+# --- Main execution block: offline batching test ---
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import contextlib
+    from memory_firestore import InMemoryFirestore
+    from agent_v4_persistent import C_Agent_Persistent
+
+    print("------ Project Chrysalis: Heartbeat Coordinator Test (in-memory ledger) ------")
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    db = InMemoryFirestore()
+
+    # A simulated clock lets several 30-second intervals run instantly
+    now = [0.0]
+    coordinator = HeartbeatCoordinator(db, clock=lambda: now[0], sleep=lambda seconds: None)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for index in range(count):
+            coordinator.add(C_Agent_Persistent(db=db, agent_id=f"hosted-agent-{index}", coordinator=coordinator))
+    registration_trips = db.round_trips
+
+    db.fail_commits = 2  # Two transient failures to exercise retry/backoff
+    for second in range(0, 121):
+        now[0] = float(second)
+        coordinator.tick()
+
+    heartbeat_trips = db.round_trips - registration_trips
+    stats = coordinator.stats()
+    print(f"[SYS] {count} agents, {stats['documents']} heartbeats in {heartbeat_trips} round-trips "
+          f"({stats['documents_per_commit']:.0f} documents per commit, {stats['retries']} retries).")
+    print("------ TEST COMPLETE ------")
@@ -0,0 +1,409 @@
+import time
+import json
+import sqlite3
+import threading
+
+from metrics import METRICS
+
+# --- LEDGER BACKENDS ---
+# One storage interface for the Synaptic Ledger, shared by the cloud agents and the
+# network simulations. A backend stores one record (a dict) per agent ID:
+#
+#   set(agent_id, fields)        replace the record
+#   update(agent_id, fields)     merge fields into the record, creating it if missing
+#   delete(agent_id)
+#   get(agent_id)                the record, or None
+#   write_many(ops)              apply (op, agent_id, fields) tuples in bulk
+#   scan()                       iterate (agent_id, record)
+#   close()
+#
+# Fields may hold firestore.SERVER_TIMESTAMP; local backends store the local time instead.
+
+
+def resolve_fields(fields):
+    """Replaces Firestore sentinels (SERVER_TIMESTAMP) with local values."""
+    return {key: time.time() if type(value).__name__ == "Sentinel" else value
+            for key, value in fields.items()}
+
+
+class LedgerBackend:
+    """Base class. write_many falls back to one call per operation."""
+    def set(self, agent_id, fields):
+        raise NotImplementedError
+
+    def update(self, agent_id, fields):
+        raise NotImplementedError
+
+    def delete(self, agent_id):
+        raise NotImplementedError
+
+    def get(self, agent_id):
+        raise NotImplementedError
+
+    def scan(self):
+        raise NotImplementedError
+
+    def write_many(self, ops):
+        for op, agent_id, fields in ops:
+            if op == "delete":
+                self.delete(agent_id)
+            else:
+                getattr(self, op)(agent_id, fields)
+
+    def close(self):
+        pass
+
+
+class InMemoryBackend(LedgerBackend):
+    """Records in a dict. For tests and short simulations."""
+    def __init__(self):
+        self.records = {}
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def set(self, agent_id, fields):
+        with self._lock:
+            self.records[agent_id] = resolve_fields(fields)
+            self.writes += 1
+
+    def update(self, agent_id, fields):
+        with self._lock:
+            self.records.setdefault(agent_id, {}).update(resolve_fields(fields))
+            self.writes += 1
+
+    def delete(self, agent_id):
+        with self._lock:
+            self.records.pop(agent_id, None)
+            self.writes += 1
+
+    def get(self, agent_id):
+        with self._lock:
+            record = self.records.get(agent_id)
+            return dict(record) if record is not None else None
+
+    def scan(self):
+        with self._lock:
+            items = [(agent_id, dict(record)) for agent_id, record in self.records.items()]
+        return iter(items)
+
+
+class SQLiteBackend(LedgerBackend):
+    """
+    Records as JSON documents in one SQLite table.
+    WAL journaling and synchronous=NORMAL keep commits cheap; write_many applies a whole
+    batch in one transaction, so bulk flushes run at local disk speed. Updates merge with
+    json_patch inside SQLite, without reading the record back into Python.
+    """
+    def __init__(self, path, table="agents"):
+        self.path = path
+        self.table = table
+        self.writes = 0
+        self.transactions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, doc TEXT NOT NULL)")
+        self._sql = {
+            "set": f"INSERT OR REPLACE INTO {table} (id, doc) VALUES (?, ?)",
+            "update": (f"INSERT INTO {table} (id, doc) VALUES (?, ?) "
+                       f"ON CONFLICT(id) DO UPDATE SET doc = json_patch(doc, excluded.doc)"),
+            "delete": f"DELETE FROM {table} WHERE id = ?",
+        }
+
+    def _execute(self, groups):
+        # groups: [(op, [params, ...]), ...] in order, applied in one transaction
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for op, params in groups:
+                    self._db.executemany(self._sql[op], params)
+                    self.writes += len(params)
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            self.transactions += 1
+
+    def set(self, agent_id, fields):
+        self._execute([("set", [(agent_id, json.dumps(resolve_fields(fields)))])])
+
+    def update(self, agent_id, fields):
+        self._execute([("update", [(agent_id, json.dumps(resolve_fields(fields)))])])
+
+    def delete(self, agent_id):
+        self._execute([("delete", [(agent_id,)])])
+
+    def write_many(self, ops):
+        # Consecutive operations of the same kind share one executemany call
+        groups = []
+        for op, agent_id, fields in ops:
+            params = (agent_id,) if op == "delete" else (agent_id, json.dumps(resolve_fields(fields)))
+            if groups and groups[-1][0] == op:
+                groups[-1][1].append(params)
+            else:
+                groups.append((op, [params]))
+        if groups:
+            self._execute(groups)
+
+    def get(self, agent_id):
+        with self._lock:
+            row = self._db.execute(f"SELECT doc FROM {self.table} WHERE id = ?", (agent_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def scan(self):
+        with self._lock:
+            rows = self._db.execute(f"SELECT id, doc FROM {self.table}").fetchall()
+        return ((agent_id, json.loads(doc)) for agent_id, doc in rows)
+
+    def count(self):
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class FirestoreBackend(LedgerBackend):
+    """
+    Records as documents of a Firestore collection (or the in-memory stand-in).
+    write_many uses WriteBatch commits of up to 500 writes each.
+    """
+    MAX_BATCH = 500
+
+    def __init__(self, db, collection="agents"):
+        self.db = db
+        self.collection_ref = db.collection(collection)
+
+    def set(self, agent_id, fields):
+        self.collection_ref.document(agent_id).set(fields)
+
+    def update(self, agent_id, fields):
+        self.collection_ref.document(agent_id).set(fields, merge=True)
+
+    def delete(self, agent_id):
+        self.collection_ref.document(agent_id).delete()
+
+    def get(self, agent_id):
+        snapshot = self.collection_ref.document(agent_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def scan(self):
+        return ((snapshot.id, snapshot.to_dict()) for snapshot in self.collection_ref.stream())
+
+    def write_many(self, ops):
+        ops = list(ops)
+        for start in range(0, len(ops), self.MAX_BATCH):
+            batch = self.db.batch()
+            for op, agent_id, fields in ops[start:start + self.MAX_BATCH]:
+                doc_ref = self.collection_ref.document(agent_id)
+                if op == "set":
+                    batch.set(doc_ref, fields)
+                elif op == "update":
+                    batch.set(doc_ref, fields, merge=True)
+                else:
+                    batch.delete(doc_ref)
+            batch.commit()
+
+
+# --- WRITE-BEHIND CACHE ---
+
+class WriteBehindCache(LedgerBackend):
+    """
+    Sits in front of a backend and holds writes until flush().
+    Repeated writes to the same agent coalesce into one pending operation (an update
+    after a set folds into the set), so an agent updated a thousand times between
+    flushes costs one write. Flushes happen when `max_pending` agents are pending,
+    every `flush_interval` seconds once start() is called, and on close().
+    Reads see pending writes. One flush runs at a time, so writes reach the backend in
+    order; the writes of a failed flush go back to pending for the next one. A flush
+    triggered by a write never raises into the writer: it is counted in `failures`.
+    """
+    def __init__(self, backend, max_pending=10_000, flush_interval=1.0):
+        self.backend = backend
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.pending = {}  # agent id -> (op, fields)
+        self.received = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+        self._lock = threading.Lock()        # Guards `pending`
+        self._flush_lock = threading.Lock()  # Held for a whole flush, backend call included
+        self._retry_at = 0.0                 # No inline flush before this time after a failure
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _fold(previous, op, fields):
+        """The single operation equivalent to `previous` followed by (op, fields)."""
+        if op == "update" and previous is not None:
+            if previous[0] == "delete":
+                # The record is gone, so the update creates it afresh: a set of its fields
+                return "set", dict(fields)
+            # Fold into the pending set/update; copy so callers may reuse their dict
+            merged = dict(previous[1])
+            merged.update(fields)
+            return previous[0], merged
+        return op, fields
+
+    def _put(self, agent_id, op, fields):
+        with self._lock:
+            self.received += 1
+            self.pending[agent_id] = self._fold(self.pending.get(agent_id), op, fields)
+            full = len(self.pending) >= self.max_pending
+        if full and time.monotonic() >= self._retry_at:
+            # Writers must not fail because the backend does: the writes stay pending and
+            # the next inline attempt waits one flush_interval
+            try:
+                self.flush()
+            except Exception as e:
+                self._retry_at = time.monotonic() + self.flush_interval
+                print(f"[!] Write-behind flush failed, {len(self.pending)} writes kept pending: {e}")
+
+    def set(self, agent_id, fields):
+        self._put(agent_id, "set", fields)
+
+    def update(self, agent_id, fields):
+        self._put(agent_id, "update", fields)
+
+    def delete(self, agent_id):
+        self._put(agent_id, "delete", None)
+
+    def get(self, agent_id):
+        with self._lock:
+            pending = self.pending.get(agent_id)
+        if pending is None:
+            return self.backend.get(agent_id)
+        op, fields = pending
+        if op == "delete":
+            return None
+        if op == "set":
+            return resolve_fields(fields)
+        record = self.backend.get(agent_id) or {}
+        record.update(resolve_fields(fields))
+        return record
+
+    def scan(self):
+        self.flush()
+        return self.backend.scan()
+
+    def flush(self):
+        """
+        Writes every pending operation to the backend in one bulk call. Returns the count.
+        If the backend raises, the operations are put back under any newer writes made
+        to the same agents meanwhile, and the error is re-raised.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self.pending:
+                    return 0
+                ops = [(op, agent_id, fields) for agent_id, (op, fields) in self.pending.items()]
+                self.pending = {}
+            try:
+                self.backend.write_many(ops)
+            except Exception:
+                with self._lock:
+                    newer = self.pending
+                    self.pending = {agent_id: (op, fields) for op, agent_id, fields in ops}
+                    for agent_id, (op, fields) in newer.items():
+                        self.pending[agent_id] = self._fold(self.pending.get(agent_id), op, fields)
+                    self.failures += 1
+                raise
+            self.flushed += len(ops)
+            self.flushes += 1
+            return len(ops)
+
+    def start(self):
+        """Flushes in a background thread every flush_interval seconds."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._flush_loop, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[!] Write-behind flush failed: {e}")
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self.flush()
+        self.backend.close()
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "coalesced": self.received - self.flushed - len(self.pending),
+        }
+
+
+def open_backend(spec, db=None):
+    """
+    Builds a backend from a short spec: "memory", "firestore" (needs `db`) or
+    "sqlite:<path>". LMDB is not supported: the SQLite backend covers local persistence
+    without an extra dependency.
+    """
+    if spec == "memory":
+        return InMemoryBackend()
+    if spec == "firestore":
+        if db is None:
+            raise ValueError("The firestore backend needs a database client.")
+        return FirestoreBackend(db)
+    if spec.startswith("sqlite:"):
+        return SQLiteBackend(spec[len("sqlite:"):])
+    raise ValueError(f"Unknown ledger backend: {spec}")
+
+
+# NEW: storage round trips as metric stages, timed only while METRICS is enabled
+METRICS.hot_path(FirestoreBackend, "set", "update", "delete", "get", "write_many", prefix="firestore_")
+METRICS.hot_path(SQLiteBackend, "set", "update", "delete", "get", "write_many", prefix="sqlite_")
+METRICS.hot_path(WriteBehindCache, "flush", prefix="write_behind_")
+
+
+# --- Main execution block: a persisted network simulation on local disk ---
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import tempfile
+    import contextlib
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "network"))
+    from network_v2_veto import C_Agent, LocalLedger
+
+    print("------ Project Chrysalis: Ledger Backend Test ------")
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    with tempfile.TemporaryDirectory() as workdir:
+        cache = WriteBehindCache(SQLiteBackend(os.path.join(workdir, "ledger.sqlite")))
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            ledger = LocalLedger(store=cache)
+            for index in range(count):
+                C_Agent(ledger=ledger, agent_id=f"agent-{index}")
+        start = time.perf_counter()
+        ledger.engine.submit("agent-0", "EXTERNAL", 0.5, 200_000)
+        ledger.engine.run_until_quiescent()
+        cache.flush()
+        elapsed = time.perf_counter() - start
+        ledger.engine.report()
+
+        stats = cache.stats()
+        print(f"[SYS] {stats['received']} ledger writes coalesced into {stats['flushed']} rows "
+              f"over {stats['flushes']} flushes ({cache.backend.transactions} transactions) in {elapsed:.2f}s.")
+        record = cache.get("agent-0")
+        assert abs(record["internal_state"] - ledger.agents["agent-0"].internal_state) < 1e-12
+        print(f"[SYS] {cache.backend.count()} agents persisted; agent-0 matches the live network.")
+        cache.close()
+    print("------ TEST COMPLETE ------")
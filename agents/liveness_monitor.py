@@ -0,0 +1,168 @@
+import time
+import heapq
+import threading
+
+# --- LIVENESS MONITOR ---
+
+class LivenessMonitor:
+    """
+    Detects agents whose heartbeats have stopped, without scanning the ledger.
+    Every heartbeat event (from an on_snapshot listener on the 'agents' collection, or
+    observe() calls) moves the agent's deadline to now + timeout. Deadlines sit in a
+    min-heap; a superseded entry is skipped when it reaches the top, so each tick pops
+    only what is due: O(expired) plus the stale entries earlier heartbeats left behind.
+    Expired agents are marked 'dead' in one bulk write through a ledger backend and
+    handed to the on_expired callbacks so local registries can deregister them.
+
+    Deadlines use the monitor's own clock at the time the event is seen, not the
+    document's last_seen, so clock skew between hosts does not matter.
+    Snapshot listeners call in on their own thread, so the deadlines and heap are
+    guarded by a lock; the ledger write and callbacks of a tick run outside it.
+    """
+    INACTIVE = ("stopped", "dead")
+
+    def __init__(self, ledger, timeout=90.0, on_expired=(), clock=time.monotonic, sleep=time.sleep):
+        self.ledger = ledger          # A backend from ledger_backends; write_many batches the marks
+        self.timeout = timeout
+        self.on_expired = list(on_expired)
+        self.clock = clock
+        self.sleep = sleep
+        self.deadlines = {}           # agent id -> current deadline
+        self._heap = []               # (deadline, agent id), possibly superseded
+        self._watch = None
+        self._lock = threading.RLock()
+        self.expired = 0
+        self.stale_pops = 0
+
+    # --- Heartbeat events ---
+
+    def start(self, source):
+        """Feeds the monitor from on_snapshot events of the 'agents' collection."""
+        self._watch = source.on_snapshot(self._on_snapshot)
+        return self
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _on_snapshot(self, col_snapshot, changes, read_time):
+        for change in changes:
+            document = change.document
+            record = document.to_dict()
+            if change.type.name == "REMOVED" or record.get("status") in self.INACTIVE:
+                self.forget(document.id)
+            else:
+                self.observe(document.id)
+
+    def observe(self, agent_id, now=None):
+        """Records a heartbeat: the agent's deadline becomes now + timeout."""
+        deadline = (self.clock() if now is None else now) + self.timeout
+        with self._lock:
+            self.deadlines[agent_id] = deadline
+            heapq.heappush(self._heap, (deadline, agent_id))
+            # Superseded entries are normally popped at expiry; rebuild if they pile up
+            if len(self._heap) > 2 * len(self.deadlines) + 1024:
+                self._heap = [(deadline, agent_id) for agent_id, deadline in self.deadlines.items()]
+                heapq.heapify(self._heap)
+
+    def forget(self, agent_id):
+        """Stops tracking an agent that left cleanly. Its heap entries die lazily."""
+        with self._lock:
+            self.deadlines.pop(agent_id, None)
+
+    # --- Expiry ---
+
+    def tick(self, now=None):
+        """Marks every agent past its deadline as dead. Returns their IDs."""
+        now = self.clock() if now is None else now
+        dead = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                deadline, agent_id = heapq.heappop(heap)
+                if self.deadlines.get(agent_id) != deadline:
+                    self.stale_pops += 1
+                    continue
+                del self.deadlines[agent_id]
+                dead.append(agent_id)
+        if dead:
+            self.ledger.write_many([("update", agent_id, {'status': 'dead'}) for agent_id in dead])
+            self.expired += len(dead)
+            for callback in self.on_expired:
+                for agent_id in dead:
+                    callback(agent_id)
+        return dead
+
+    def next_deadline(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def run(self, should_stop=lambda: False, poll=1.0):
+        """Blocking loop: sleeps until the earliest deadline (at most `poll` seconds), then ticks."""
+        while not should_stop():
+            upcoming = self.next_deadline()
+            self.sleep(poll if upcoming is None else min(poll, max(0.0, upcoming - self.clock())))
+            dead = self.tick()
+            if dead:
+                print(f"[!] {len(dead)} agents missed their heartbeats and were marked dead.")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tracked": len(self.deadlines),
+                "expired": self.expired,
+                "heap": len(self._heap),
+                "stale_pops": self.stale_pops,
+            }
+
+
+# --- Main execution block: offline liveness test ---
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import contextlib
+    from memory_firestore import InMemoryFirestore
+    from ledger_backends import FirestoreBackend
+    from peer_cache import PeerCache
+    from heartbeat_coordinator import HeartbeatCoordinator
+    from agent_v4_persistent import C_Agent_Persistent
+
+    print("------ Project Chrysalis: Liveness Monitor Test (in-memory ledger) ------")
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    crashed = 50
+    db = InMemoryFirestore()
+
+    # One simulated clock drives heartbeats and deadlines
+    now = [0.0]
+    clock = lambda: now[0]
+    coordinator = HeartbeatCoordinator(db, clock=clock, sleep=lambda seconds: None)
+    peers = PeerCache(db.collection('agents')).start()
+    monitor = LivenessMonitor(FirestoreBackend(db), timeout=90.0, clock=clock, on_expired=[coordinator.remove])
+    monitor.start(db.collection('agents'))
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        agents = [C_Agent_Persistent(db=db, agent_id=f"agent-{index}", coordinator=coordinator)
+                  for index in range(count)]
+        for agent in agents:
+            coordinator.add(agent)
+
+    slowest = 0.0
+    for second in range(0, 301):
+        now[0] = float(second)
+        if second == 60:
+            # These agents crash: their heartbeats stop without a final status
+            for agent in agents[:crashed]:
+                coordinator.remove(agent.id)
+        coordinator.tick()
+        start = time.perf_counter()
+        monitor.tick()
+        slowest = max(slowest, time.perf_counter() - start)
+    print(f"[SYS] {monitor.expired} of {count} agents marked dead. Slowest monitor tick: {1000 * slowest:.2f} ms.")
+
+    docs = db.collections['agents']
+    marked = sorted(doc_id for doc_id, doc in docs.items() if doc.get('status') == 'dead')
+    assert marked == sorted(agent.id for agent in agents[:crashed])
+    assert len(peers) == count - crashed
+    print(f"[SYS] Dead agents left the peer cache ({len(peers)} live peers). Monitor: {monitor.stats()}")
+    print("------ TEST COMPLETE ------")
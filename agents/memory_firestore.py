@@ -0,0 +1,231 @@
+import time
+import enum
+import threading
+
+# --- IN-MEMORY FIRESTORE STAND-IN ---
+# A local replacement for the `db` client returned by firestore.client(), covering the
+# subset of the API the agents use. It lets benchmarks and offline runs exercise the
+# cloud agents without credentials or network access, and counts every round-trip and
+# document write so batching efficiency can be measured.
+#
+# Collections also support on_snapshot listeners. Change events are delivered
+# synchronously after each write (Firestore delivers them on a background thread),
+# with the same (collection snapshot, changes, read time) callback arguments.
+
+
+ChangeType = enum.Enum("ChangeType", "ADDED MODIFIED REMOVED")
+
+
+def _resolve(value):
+    # firestore.SERVER_TIMESTAMP is a Sentinel; the fake stores local time instead
+    if type(value).__name__ == "Sentinel":
+        return time.time()
+    return value
+
+
+class InMemoryFirestore:
+    """Drop-in stand-in for a Firestore client. `latency` simulates one network round-trip."""
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.collections = {}
+        self.round_trips = 0
+        self.writes = 0
+        self.reads = 0
+        self.fail_commits = 0  # The next N batch commits raise, to exercise retry paths
+        self._lock = threading.Lock()
+        self._listeners = {}  # collection -> [callback, ...]
+        self._events = []     # (collection, MemoryChange) waiting to be delivered
+
+    def collection(self, name):
+        return MemoryCollection(self, name)
+
+    def batch(self):
+        return MemoryWriteBatch(self)
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _apply(self, op, collection, doc_id, data):
+        docs = self.collections.setdefault(collection, {})
+        existed = doc_id in docs
+        if op == "set":
+            docs[doc_id] = {key: _resolve(value) for key, value in data.items()}
+        elif op == "merge":
+            docs.setdefault(doc_id, {}).update({key: _resolve(value) for key, value in data.items()})
+        elif op == "update":
+            if doc_id not in docs:
+                raise KeyError(f"No document to update: {collection}/{doc_id}")
+            docs[doc_id].update({key: _resolve(value) for key, value in data.items()})
+        elif op == "delete":
+            docs.pop(doc_id, None)
+        self.writes += 1
+        if self._listeners.get(collection):
+            if op == "delete":
+                if existed:
+                    self._events.append((collection, MemoryChange(ChangeType.REMOVED, MemorySnapshot(doc_id, None))))
+            else:
+                kind = ChangeType.MODIFIED if existed else ChangeType.ADDED
+                self._events.append((collection, MemoryChange(kind, MemorySnapshot(doc_id, dict(docs[doc_id])))))
+
+    def _dispatch(self):
+        # Called after the lock is released, so callbacks may read or write the fake
+        with self._lock:
+            events, self._events = self._events, []
+            listeners = {name: list(callbacks) for name, callbacks in self._listeners.items()}
+        if not events:
+            return
+        read_time = time.time()
+        by_collection = {}
+        for collection, change in events:
+            by_collection.setdefault(collection, []).append(change)
+        for collection, changes in by_collection.items():
+            for callback in listeners.get(collection, ()):
+                callback([change.document for change in changes], changes, read_time)
+
+    def stats(self):
+        return {"round_trips": self.round_trips, "writes": self.writes, "reads": self.reads}
+
+
+class MemoryCollection:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    def document(self, doc_id):
+        return MemoryDocument(self.db, self.name, doc_id)
+
+    def on_snapshot(self, callback):
+        """
+        Listens to the collection. The first call reports every existing document as
+        ADDED; later calls report each write. Returns a watch with unsubscribe().
+        """
+        with self.db._lock:
+            self.db._round_trip()
+            docs = list(self.db.collections.get(self.name, {}).items())
+            self.db.reads += len(docs)
+            self.db._listeners.setdefault(self.name, []).append(callback)
+        snapshots = [MemorySnapshot(doc_id, dict(data)) for doc_id, data in docs]
+        callback(snapshots, [MemoryChange(ChangeType.ADDED, snapshot) for snapshot in snapshots], time.time())
+        return MemoryWatch(self.db, self.name, callback)
+
+    def stream(self):
+        with self.db._lock:
+            self.db._round_trip()
+            docs = list(self.db.collections.get(self.name, {}).items())
+            self.db.reads += len(docs)
+        for doc_id, data in docs:
+            yield MemorySnapshot(doc_id, dict(data))
+
+
+class MemoryWatch:
+    def __init__(self, db, collection, callback):
+        self.db = db
+        self.collection = collection
+        self.callback = callback
+
+    def unsubscribe(self):
+        with self.db._lock:
+            callbacks = self.db._listeners.get(self.collection, [])
+            if self.callback in callbacks:
+                callbacks.remove(self.callback)
+
+
+class MemoryChange:
+    """One entry of the `changes` list passed to on_snapshot callbacks, like DocumentChange."""
+    def __init__(self, change_type, document):
+        self.type = change_type
+        self.document = document
+
+
+class MemoryDocument:
+    def __init__(self, db, collection, doc_id):
+        self.db = db
+        self.collection = collection
+        self.id = doc_id
+
+    def set(self, data, merge=False):
+        with self.db._lock:
+            self.db._round_trip()
+            self.db._apply("merge" if merge else "set", self.collection, self.id, data)
+        self.db._dispatch()
+
+    def update(self, data):
+        with self.db._lock:
+            self.db._round_trip()
+            self.db._apply("update", self.collection, self.id, data)
+        self.db._dispatch()
+
+    def delete(self):
+        with self.db._lock:
+            self.db._round_trip()
+            self.db._apply("delete", self.collection, self.id, None)
+        self.db._dispatch()
+
+    def get(self):
+        with self.db._lock:
+            self.db._round_trip()
+            self.db.reads += 1
+            data = self.db.collections.get(self.collection, {}).get(self.id)
+        return MemorySnapshot(self.id, dict(data) if data is not None else None)
+
+
+class MemorySnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return self._data
+
+
+class MemoryWriteBatch:
+    """Collects writes and applies them in one round-trip, like firestore.WriteBatch."""
+    MAX_WRITES = 500
+
+    def __init__(self, db):
+        self.db = db
+        self._ops = []
+
+    def __len__(self):
+        return len(self._ops)
+
+    def _add(self, op, doc_ref, data):
+        if len(self._ops) >= self.MAX_WRITES:
+            raise ValueError(f"A write batch can hold at most {self.MAX_WRITES} writes.")
+        self._ops.append((op, doc_ref.collection, doc_ref.id, data))
+
+    def set(self, doc_ref, data, merge=False):
+        self._add("merge" if merge else "set", doc_ref, data)
+
+    def update(self, doc_ref, data):
+        self._add("update", doc_ref, data)
+
+    def delete(self, doc_ref):
+        self._add("delete", doc_ref, None)
+
+    def commit(self):
+        with self.db._lock:
+            self.db._round_trip()
+            if self.db.fail_commits > 0:
+                self.db.fail_commits -= 1
+                raise ConnectionError("Simulated transient commit failure.")
+            # Batches are atomic: validate every update before applying anything
+            created = set()
+            for op, collection, doc_id, _ in self._ops:
+                key = (collection, doc_id)
+                if op in ("set", "merge"):
+                    created.add(key)
+                elif op == "delete":
+                    created.discard(key)
+                elif key not in created and doc_id not in self.db.collections.get(collection, {}):
+                    raise KeyError(f"No document to update: {collection}/{doc_id}")
+            for op, collection, doc_id, data in self._ops:
+                self.db._apply(op, collection, doc_id, data)
+        self._ops = []
+        self.db._dispatch()
@@ -0,0 +1,307 @@
+import os
+import time
+import atexit
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- LATENCY HISTOGRAM ---
+
+SUB_BITS = 3                    # 8 sub-buckets per power of two: at most 12.5% relative error
+SUB_BUCKETS = 1 << SUB_BITS
+MAX_INDEX = (64 << SUB_BITS) + 2 * SUB_BUCKETS
+
+# Bucket bounds (seconds) exported to Prometheus; fixed so every scrape has the same series
+EXPORT_BOUNDS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3,
+                 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _index(value):
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BITS - 1
+    return (shift << SUB_BITS) + (value >> shift)
+
+
+def _upper(index):
+    """Exclusive upper bound of a bucket, in nanoseconds."""
+    if index < 2 * SUB_BUCKETS:
+        return index + 1
+    shift = (index >> SUB_BITS) - 1
+    return (index - (shift << SUB_BITS) + 1) << shift
+
+
+class Histogram:
+    """
+    HDR-style log-linear histogram of nanosecond durations. Recording is one bucket
+    index computation and an increment in a preallocated list; memory is fixed
+    (about 530 counters) whatever the range of values.
+    """
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * MAX_INDEX
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        self.counts[_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bound (ns) of the bucket holding the q-quantile."""
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(_upper(index), self.max)
+        return self.max
+
+    def cumulative(self, bounds_ns):
+        """Counts of values below each bound, for Prometheus buckets."""
+        result = []
+        seen = 0
+        index = 0
+        for bound in bounds_ns:
+            while index < MAX_INDEX and _upper(index) <= bound:
+                seen += self.counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+
+# --- STAGE INSTRUMENTATION ---
+
+class Stage:
+    """Call counter plus a sampled latency histogram for one hot-path function."""
+    __slots__ = ("name", "calls", "histogram", "scale")
+
+    def __init__(self, name, scale=1):
+        self.name = name
+        self.calls = 0
+        self.histogram = Histogram()
+        self.scale = scale  # Calls represented by each counted call
+
+
+class Metrics:
+    """
+    Process-wide registry of stages, counters and gauges. Times are inclusive:
+    receive_pulse contains _process. Two kinds of stage:
+
+    - Wrapped stages, declared with hot_path(): methods such as Firestore writes or
+      register, where an extra Python call is noise. While enabled, each call is
+      counted and one in `sample_every` is timed.
+    - Pulse stages, a few microseconds each, where a wrapper would cost a third of the
+      pulse. The pulse engine runs one pulse in `sample_every` with `timing` set; call
+      sites check the flag (like TRACE.pulse) and go through timed() only then, and
+      settle() records the pulse's durations once it is over. Their counts are scaled
+      by `sample_every`, an unbiased estimate of the totals.
+
+    Disabled, the registry costs nothing on wrapped stages and one flag check per pulse
+    stage. At the default of one pulse in 256, enabled metrics add well under 1% to a
+    run. Counts are updated without locks and may lose the odd increment under threads.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.timing = False       # True while a sampled pulse runs; read by call sites
+        self.sample_every = 256
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}          # name -> (callable, Prometheus type)
+        self._hooks = []          # (owner, attribute, stage name)
+        self._originals = {}      # (owner, attribute) -> (function, defined on owner)
+        self._samples = []        # (pulse stage, ns) of the running sampled pulse
+        self._server = None
+
+    def stage(self, name, scale=1):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(name, scale)
+        return stage
+
+    def inc(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, read, kind="gauge"):
+        """Registers a value read at export time, e.g. lambda: len(engine.pending)."""
+        self.gauges[name] = (read, kind)
+
+    # --- Pulse stages ---
+
+    def timed(self, name, func, *args, **kwargs):
+        """Calls func and buffers its duration under a pulse stage until settle()."""
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._samples.append((name, time.perf_counter_ns() - start))
+
+    def settle(self):
+        """Ends a sampled pulse: clears `timing` and records its buffered durations."""
+        self.timing = False
+        for name, elapsed in self._samples:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stage(name, self.sample_every)
+            stage.calls += 1
+            stage.histogram.record(elapsed)
+        self._samples.clear()
+
+    # --- Wrapped stages ---
+
+    def hot_path(self, owner, *attributes, prefix=""):
+        """Declares methods of `owner` to time, as stages named prefix + name."""
+        for attribute in attributes:
+            hook = (owner, attribute, prefix + attribute.lstrip("_"))
+            self._hooks.append(hook)
+            if self.enabled:
+                self._install(*hook)
+
+    def _install(self, owner, attribute, name):
+        if (owner, attribute) in self._originals:
+            return
+        func = getattr(owner, attribute)
+        self._originals[owner, attribute] = (func, attribute in owner.__dict__)
+        setattr(owner, attribute, self._wrap(self.stage(name), func))
+
+    def _wrap(self, stage, func):
+        mask = self.sample_every - 1
+        clock = time.perf_counter_ns
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            stage.calls += 1
+            if (stage.calls - 1) & mask:  # Times the first call, then one in sample_every
+                return func(*args, **kwargs)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stage.histogram.record(clock() - start)
+
+        return timed
+
+    def enable(self, sample_every=256):
+        """Starts recording. sample_every is rounded up to a power of two."""
+        if self.enabled:
+            self.disable()
+        self.sample_every = 1 << max(0, int(sample_every) - 1).bit_length()
+        self.enabled = True
+        for hook in self._hooks:
+            self._install(*hook)
+        return self
+
+    def disable(self):
+        """Restores the wrapped methods. Recorded values are kept."""
+        for (owner, attribute), (func, own) in self._originals.items():
+            if own:
+                setattr(owner, attribute, func)
+            else:
+                delattr(owner, attribute)
+        self._originals.clear()
+        self.enabled = False
+        self.timing = False
+
+    def reset(self):
+        for stage in self.stages.values():
+            stage.calls = 0
+            stage.histogram = Histogram()
+        self.counters.clear()
+
+    # --- Export ---
+
+    def exposition(self):
+        """The registry in Prometheus text format (version 0.0.4)."""
+        lines = []
+        stages = sorted((name, stage) for name, stage in self.stages.items() if stage.calls)
+        if stages:
+            lines.append("# HELP chrysalis_stage_calls_total Calls per instrumented stage (estimated when sampled).")
+            lines.append("# TYPE chrysalis_stage_calls_total counter")
+            for name, stage in stages:
+                lines.append(f'chrysalis_stage_calls_total{{stage="{name}"}} {stage.calls * stage.scale}')
+            lines.append("# HELP chrysalis_stage_seconds Sampled stage latency, inclusive of nested stages.")
+            lines.append("# TYPE chrysalis_stage_seconds histogram")
+            bounds_ns = [round(bound * 1e9) for bound in EXPORT_BOUNDS]
+            for name, stage in stages:
+                histogram = stage.histogram
+                for bound, count in zip(EXPORT_BOUNDS, histogram.cumulative(bounds_ns)):
+                    lines.append(f'chrysalis_stage_seconds_bucket{{stage="{name}",le="{bound:g}"}} {count}')
+                lines.append(f'chrysalis_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'chrysalis_stage_seconds_sum{{stage="{name}"}} {histogram.total / 1e9:.9f}')
+                lines.append(f'chrysalis_stage_seconds_count{{stage="{name}"}} {histogram.count}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE chrysalis_{name}_total counter")
+            lines.append(f"chrysalis_{name}_total {value}")
+        for name, (read, kind) in sorted(self.gauges.items()):
+            try:
+                value = read()
+            except Exception:
+                continue
+            lines.append(f"# TYPE chrysalis_{name} {kind}")
+            lines.append(f"chrysalis_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """Prints one line per stage, busiest first."""
+        print(f"[SYS] Stage metrics (1 in {self.sample_every} calls or pulses timed, times inclusive):")
+        for stage in sorted(self.stages.values(), key=lambda stage: -stage.calls):
+            histogram = stage.histogram
+            if not stage.calls:
+                continue
+            calls = stage.calls * stage.scale
+            mean = histogram.total / histogram.count if histogram.count else 0.0
+            print(f"    {stage.name:<22} {calls:>12,.0f} calls  mean {mean / 1000:9.2f} us  "
+                  f"p50 {histogram.quantile(0.5) / 1000:9.2f} us  p99 {histogram.quantile(0.99) / 1000:9.2f} us  "
+                  f"max {histogram.max / 1000:10.2f} us  est. total {mean * calls / 1e9:8.3f}s")
+        for name, value in sorted(self.counters.items()):
+            print(f"    {name:<22} {value:>12,}")
+
+    def dump(self, path=None):
+        """End-of-run dump: the report, plus the Prometheus text in `path` if given."""
+        self.report()
+        if path:
+            with open(path, "w") as handle:
+                handle.write(self.exposition())
+            print(f"[SYS] Metrics written to {path}.")
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        """Serves GET /metrics from a daemon thread. Returns the server."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.exposition().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="metrics").start()
+        print(f"[SYS] Metrics endpoint on http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server
+
+
+# Shared registry. CHRYSALIS_METRICS=<sample_every> enables it for any run (e.g. a network
+# simulation, with agents/ on PYTHONPATH) and dumps the stage report at exit;
+# CHRYSALIS_METRICS_FILE also writes the Prometheus text there.
+METRICS = Metrics()
+
+if os.environ.get("CHRYSALIS_METRICS"):
+    METRICS.enable(int(os.environ["CHRYSALIS_METRICS"]))
+    atexit.register(METRICS.dump, os.environ.get("CHRYSALIS_METRICS_FILE"))
@@ -0,0 +1,214 @@
+import time
+import random
+import threading
+from collections import OrderedDict
+
+# --- PEER CACHE ---
+
+class PeerCache:
+    """
+    Client-side registry of the agents in the ledger, for peer discovery without reads.
+    It is filled by one on_snapshot listener on the 'agents' collection (or anything with
+    the same on_snapshot interface, such as the in-memory Firestore), so keeping it
+    current costs one streamed read per changed document rather than a query per hop.
+    Agents that report status 'stopped' or 'dead' are dropped.
+
+    Entries are kept in least-recently-refreshed order: a change event or a lookup
+    refreshes an entry. Entries older than `ttl` seconds and the oldest entries beyond
+    `max_size` are evicted. A `loader` (a ledger backend) makes get() read-through on a miss.
+    random_peer() is O(1): IDs live in an index-aligned list with swap-remove.
+    """
+    INACTIVE = ("stopped", "dead")
+
+    def __init__(self, source=None, ttl=None, max_size=None, loader=None, clock=time.monotonic):
+        self.source = source
+        self.ttl = ttl
+        self.max_size = max_size
+        self.loader = loader
+        self.clock = clock
+        self.records = {}
+        self._order = OrderedDict()  # agent id -> refresh time, oldest first
+        self._ids = []               # Index-aligned with _slots for O(1) random selection
+        self._slots = {}
+        self._lock = threading.RLock()
+        self._watch = None
+        self.events = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+
+    # --- Change stream ---
+
+    def start(self):
+        """Subscribes to the source. The listener's first callback fills the cache."""
+        if self._watch is None:
+            self._watch = self.source.on_snapshot(self._on_snapshot)
+        return self
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _on_snapshot(self, col_snapshot, changes, read_time):
+        with self._lock:
+            for change in changes:
+                self.events += 1
+                document = change.document
+                if change.type.name == "REMOVED":
+                    self._remove(document.id)
+                else:
+                    self.put(document.id, document.to_dict())
+
+    # --- Entries ---
+
+    def put(self, agent_id, record):
+        with self._lock:
+            if record is None or record.get("status") in self.INACTIVE:
+                self._remove(agent_id)
+                return
+            if agent_id not in self._slots:
+                self._slots[agent_id] = len(self._ids)
+                self._ids.append(agent_id)
+            self.records[agent_id] = record
+            self._refresh(agent_id)
+            if self.max_size is not None:
+                while len(self._ids) > self.max_size:
+                    self._evict_oldest()
+
+    def _refresh(self, agent_id):
+        self._order[agent_id] = self.clock()
+        self._order.move_to_end(agent_id)
+
+    def _remove(self, agent_id):
+        slot = self._slots.pop(agent_id, None)
+        if slot is None:
+            return False
+        last = self._ids.pop()
+        if last != agent_id:
+            self._ids[slot] = last
+            self._slots[last] = slot
+        del self.records[agent_id]
+        del self._order[agent_id]
+        return True
+
+    def _evict_oldest(self):
+        self._remove(next(iter(self._order)))
+        self.evictions += 1
+
+    def _stale(self, agent_id, now):
+        return self.ttl is not None and now - self._order[agent_id] > self.ttl
+
+    def expire(self):
+        """Evicts entries not refreshed within ttl. Costs O(expired): the oldest come first."""
+        if self.ttl is None:
+            return 0
+        expired = 0
+        with self._lock:
+            now = self.clock()
+            while self._order:
+                agent_id, refreshed = next(iter(self._order.items()))
+                if now - refreshed <= self.ttl:
+                    break
+                self._evict_oldest()
+                expired += 1
+        return expired
+
+    # --- Lookup ---
+
+    def get(self, agent_id):
+        """The cached record; on a miss, one read through the loader if there is one."""
+        with self._lock:
+            if agent_id in self.records and not self._stale(agent_id, self.clock()):
+                self.hits += 1
+                self._refresh(agent_id)
+                return self.records[agent_id]
+            self.misses += 1
+        if self.loader is None:
+            return None
+        self.loads += 1
+        record = self.loader.get(agent_id)
+        self.put(agent_id, record)
+        return record if record is not None and record.get("status") not in self.INACTIVE else None
+
+    def random_peer(self, exclude_id=None):
+        """
+        ID of a random cached agent other than exclude_id, or None. O(1): draws from the
+        N-1 other slots. A stale draw is evicted and drawn again.
+        """
+        with self._lock:
+            now = self.clock()
+            while True:
+                count = len(self._ids)
+                skip = self._slots.get(exclude_id)
+                if skip is not None:
+                    count -= 1
+                if count <= 0:
+                    return None
+                index = random.randrange(count)
+                if skip is not None and index >= skip:
+                    index += 1
+                agent_id = self._ids[index]
+                if not self._stale(agent_id, now):
+                    self.hits += 1
+                    return agent_id
+                self._remove(agent_id)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, agent_id):
+        return agent_id in self._slots
+
+    def stats(self):
+        return {
+            "peers": len(self._ids),
+            "events": self.events,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+# --- Main execution block: peer discovery against the in-memory ledger ---
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import contextlib
+    from memory_firestore import InMemoryFirestore
+    from ledger_backends import FirestoreBackend
+    from agent_v4_persistent import C_Agent_Persistent
+
+    print("------ Project Chrysalis: Peer Cache Test (in-memory ledger) ------")
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    lookups = 100_000
+    db = InMemoryFirestore()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        agents = [C_Agent_Persistent(db=db, agent_id=f"agent-{index}") for index in range(count // 2)]
+        # The listener's first callback loads the agents registered so far
+        peers = PeerCache(db.collection('agents'), loader=FirestoreBackend(db)).start()
+        for agent in agents:
+            agent.peers = peers
+        agents += [C_Agent_Persistent(db=db, agent_id=f"agent-{index}", peers=peers)
+                   for index in range(count // 2, count)]
+    print(f"[SYS] Cache holds {len(peers)} peers after {peers.events} change events.")
+
+    reads_before = db.reads
+    start = time.perf_counter()
+    for index in range(lookups):
+        agents[index % count].find_peer()
+    elapsed = time.perf_counter() - start
+    print(f"[SYS] {lookups} peer lookups in {elapsed:.3f}s, {db.reads - reads_before} remote reads.")
+
+    # Stopping agents removes them from every cache through the change stream
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for agent in agents[:10]:
+            agent.ledger.update(agent.id, {'status': 'stopped'})
+    assert agents[0].id not in peers and len(peers) == count - 10
+    print(f"[SYS] 10 agents stopped; cache now holds {len(peers)} peers. Stats: {peers.stats()}")
+    peers.stop()
+    print("------ TEST COMPLETE ------")
@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import contextlib
+
+from bench_network import REPO_ROOT, git_commit, peak_rss_mb, parse_list
+
+sys.path.insert(0, os.path.join(REPO_ROOT, 'agents'))
+
+from memory_firestore import InMemoryFirestore
+from agent_v3_cloud import C_Agent_Cloud
+from agent_v4_persistent import C_Agent_Persistent
+
+
+# --- BENCHMARK CASES ---
+
+def bench_cloud(n_agents, latency):
+    db = InMemoryFirestore(latency=latency)
+    start = time.perf_counter()
+    for index in range(n_agents):
+        C_Agent_Cloud(db=db, agent_id=f"bench-cloud-{index}")
+    elapsed = time.perf_counter() - start
+    return {"agent": "v3_cloud", "phase": "register", "ops": n_agents, "seconds": elapsed, **db.stats()}
+
+
+def bench_persistent(n_agents, rounds, latency):
+    db = InMemoryFirestore(latency=latency)
+    start = time.perf_counter()
+    agents = [C_Agent_Persistent(db=db, agent_id=f"bench-persistent-{index}") for index in range(n_agents)]
+    register_seconds = time.perf_counter() - start
+    register_stats = db.stats()
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for agent in agents:
+            agent.heartbeat()
+    heartbeat_seconds = time.perf_counter() - start
+    heartbeat_stats = {key: value - register_stats[key] for key, value in db.stats().items()}
+    return [
+        {"agent": "v4_persistent", "phase": "register", "ops": n_agents, "seconds": register_seconds, **register_stats},
+        {"agent": "v4_persistent", "phase": "heartbeat", "ops": n_agents * rounds, "seconds": heartbeat_seconds,
+         **heartbeat_stats},
+    ]
+
+
+# --- Main execution block ---
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Firestore-backed agents against an in-memory client.")
+    parser.add_argument("--agents", default="10,100,1000,10000")
+    parser.add_argument("--heartbeat-rounds", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated round-trip time in seconds.")
+    parser.add_argument("--output", default="bench_agents.jsonl")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    print(f"------ Project Chrysalis: Agent Benchmark (commit {commit}) ------")
+    with open(args.output, "a") as output:
+        for n_agents in parse_list(args.agents):
+            # The agents print on every call; keep that out of the terminal
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                results = [bench_cloud(n_agents, args.latency)]
+                results += bench_persistent(n_agents, args.heartbeat_rounds, args.latency)
+            for result in results:
+                result.update({
+                    "bench": "agents",
+                    "agents": n_agents,
+                    "latency": args.latency,
+                    "ops_per_sec": result["ops"] / result["seconds"] if result["seconds"] > 0 else 0.0,
+                    "writes_per_round_trip": result["writes"] / result["round_trips"] if result["round_trips"] else 0.0,
+                    "peak_rss_mb": peak_rss_mb(),
+                    "commit": commit,
+                    "python": platform.python_version(),
+                    "timestamp": time.time(),
+                })
+                output.write(json.dumps(result) + "\n")
+                print(f"[BENCH] {result['agent']:<14} {result['phase']:<10} agents={n_agents:<7} "
+                      f"{result['ops_per_sec']:>12,.0f} ops/sec  round_trips={result['round_trips']}")
+
+    print(f"------ Results appended to {args.output} ------")
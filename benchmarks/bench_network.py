@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import importlib
+import subprocess
+import multiprocessing as mp
+
+# The network modules are scripts that import their siblings directly; agents/ provides
+# the stage metrics registry they use when it is importable
+REPO_ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'agents'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'network'))
+
+MODULES = {
+    "v1_debugged": "network_v1_debugged",
+    "v2_veto": "network_v2_veto",
+}
+
+
+# --- HELPERS ---
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentiles(samples, points=(50, 90, 99, 99.9)):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {f"p{point:g}": ordered[min(last, int(round(point / 100 * last)))] for point in points}
+
+
+def parse_list(text):
+    return [int(float(item)) for item in text.split(",") if item]
+
+
+# --- SINGLE BENCHMARK CASE ---
+
+def run_case(module_key, n_agents, ttl, fanout, max_pulses, max_in_flight, latency_samples, seed):
+    """Runs one configuration in the current process and returns its metrics."""
+    random.seed(seed)
+    module = importlib.import_module(MODULES[module_key])
+
+    # Mass registration
+    start = time.perf_counter()
+    ledger = module.LocalLedger(max_in_flight=max_in_flight, fanout=fanout)
+    for index in range(n_agents):
+        module.C_Agent(ledger=ledger, agent_id=str(index))
+    build_seconds = time.perf_counter() - start
+    engine = ledger.engine
+
+    # Throughput: one cascade from agent 0, capped at max_pulses deliveries
+    engine.submit("0", "EXTERNAL", 0.5, ttl)
+    engine.run(steps=max_pulses)
+    pulses = engine.processed
+    pulses_per_sec = engine.pulses_per_second()
+    dropped = engine.dropped
+
+    # Per-hop latency: time single deliveries, re-seeding the cascade when it dies out
+    engine.cancel_in_flight()
+    samples = []
+    clock = time.perf_counter_ns
+    for _ in range(latency_samples):
+        if not engine.pending:
+            engine.submit("0", "EXTERNAL", 0.5, ttl)
+        began = clock()
+        engine.run(steps=1)
+        samples.append(clock() - began)
+
+    # Veto broadcast latency, measured with pulses still in flight
+    veto_ns = None
+    if hasattr(ledger, "broadcast_veto"):
+        for index in range(min(n_agents, 10000)):
+            engine.submit(str(index), "EXTERNAL", 0.5, ttl)
+        began = clock()
+        ledger.broadcast_veto()
+        veto_ns = clock() - began
+
+    return {
+        "module": module_key,
+        "agents": n_agents,
+        "ttl": ttl,
+        "fanout": fanout,
+        "build_seconds": build_seconds,
+        "registrations_per_sec": n_agents / build_seconds if build_seconds > 0 else 0.0,
+        "pulses": pulses,
+        "pulses_per_sec": pulses_per_sec,
+        "dropped": dropped,
+        "hop_latency_ns": percentiles(samples),
+        "veto_latency_ns": veto_ns,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# --- Main execution block ---
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pulse-throughput and scaling benchmark for the network modules.")
+    parser.add_argument("--modules", default="v1_debugged,v2_veto")
+    parser.add_argument("--agents", default="10,100,1000,10000,100000,1000000")
+    parser.add_argument("--ttl", default="1000,100000")
+    parser.add_argument("--fanout", default="1,4")
+    parser.add_argument("--max-pulses", type=int, default=200000, help="Delivery cap per throughput run.")
+    parser.add_argument("--max-in-flight", type=int, default=1000000)
+    parser.add_argument("--latency-samples", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_network.jsonl", help="JSON-lines file results are appended to.")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    cases = [
+        (module_key, n_agents, ttl, fanout)
+        for module_key in args.modules.split(",")
+        for n_agents in parse_list(args.agents)
+        for ttl in parse_list(args.ttl)
+        for fanout in parse_list(args.fanout)
+    ]
+    print(f"------ Project Chrysalis: Network Benchmark ({len(cases)} cases, commit {commit}) ------")
+
+    # A fresh worker per case keeps each peak RSS reading independent
+    with mp.get_context().Pool(1, maxtasksperchild=1) as pool, open(args.output, "a") as output:
+        for module_key, n_agents, ttl, fanout in cases:
+            result = pool.apply(run_case, (module_key, n_agents, ttl, fanout, args.max_pulses,
+                                           args.max_in_flight, args.latency_samples, args.seed))
+            result.update({
+                "bench": "network",
+                "commit": commit,
+                "python": platform.python_version(),
+                "timestamp": time.time(),
+            })
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            p99 = result["hop_latency_ns"].get("p99", 0)
+            print(f"[BENCH] {module_key:<12} agents={n_agents:<8} ttl={ttl:<7} fanout={fanout}  "
+                  f"{result['pulses_per_sec']:>12,.0f} pulses/sec  p99 hop={p99 / 1000:.1f}us  "
+                  f"rss={result['peak_rss_mb']:.0f}MB")
+
+    print(f"------ Results appended to {args.output} ------")
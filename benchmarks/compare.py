@@ -0,0 +1,52 @@
+import sys
+import json
+import argparse
+
+# Fields that identify a benchmark case, and the throughput metric compared for each bench
+CASE_KEYS = {
+    "network": ("module", "agents", "ttl", "fanout"),
+    "agents": ("agent", "phase", "agents", "latency"),
+}
+METRICS = {
+    "network": "pulses_per_sec",
+    "agents": "ops_per_sec",
+}
+
+
+def load(path):
+    """Loads a results file. When a case appears more than once, the last run wins."""
+    results = {}
+    with open(path) as stream:
+        for line in stream:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            bench = record.get("bench", "network")
+            key = (bench,) + tuple(record.get(field) for field in CASE_KEYS[bench])
+            results[key] = record
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files case by case.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown treated as a regression.")
+    args = parser.parse_args()
+
+    baseline = load(args.baseline)
+    candidate = load(args.candidate)
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys(), key=str):
+        metric = METRICS[key[0]]
+        before = baseline[key][metric]
+        after = candidate[key][metric]
+        ratio = after / before if before else float("inf")
+        flag = ""
+        if ratio < 1.0 - args.threshold:
+            flag = "  <-- REGRESSION"
+            regressions += 1
+        print(f"{str(key[1:]):<45} {before:>14,.0f} -> {after:>14,.0f}  x{ratio:.2f}{flag}")
+
+    print(f"[SYS] {regressions} regression(s) beyond {args.threshold:.0%}.")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,336 @@
+import sys
+import mmap
+import random
+import struct
+from array import array
+
+from compact_ledger import CompactLedger
+from rng_streams import RngStreams
+
+# --- CHECKPOINT FORMAT ---
+# Every checkpoint starts with a fixed header followed by raw sections at the offsets
+# the header records. A full checkpoint stores whole arrays, so restoring is a handful
+# of bulk copies out of an mmap with no per-agent parsing. An incremental checkpoint
+# stores only the agents touched since the previous checkpoint.
+#
+#   header    CHECKPOINT_HEADER
+#   state     size * float64
+#   created   size * float64
+#   halted    size * uint8
+#   alive     size * uint8
+#   names     (handle int64, length uint32, utf-8 bytes) per explicitly named agent
+#   pending   PENDING_RECORD per queued pulse
+#   rng       RNG_STATE (Mersenne Twister state of the `random` module)
+#   prefix    utf-8 bytes
+#   changes   CHANGE_RECORD per touched agent (incremental checkpoints only)
+#   streams   STREAMS_HEADER, then per stream PHILOX_STATE and its unread block of
+#             float64 draws (ledgers with rng_streams.RngStreams only)
+#
+# The topology is not stored: it does not change during a run, and is passed back
+# to load_checkpoint like the one the ledger was created with.
+
+CHECKPOINT_MAGIC = b"CHRYSCK1"
+CHECKPOINT_VERSION = 2
+FLAG_INCREMENTAL = 1
+FLAG_BIG_ENDIAN = 2
+
+CHECKPOINT_SECTIONS = 10
+CHECKPOINT_HEADER = struct.Struct("<8sII" + "q" * 6 + "qq" * CHECKPOINT_SECTIONS)  # scalars, then (offset, length) pairs
+PENDING_RECORD = struct.Struct("<qqdq")      # target handle, source handle (-1 = external), payload, ttl
+CHANGE_RECORD = struct.Struct("<qddBB6x")    # handle, state, creation time, halted, alive
+NAME_ENTRY = struct.Struct("<qI")
+RNG_STATE = struct.Struct("<q625Iqd")        # version, MT state, has gauss_next, gauss_next
+STREAMS_HEADER = struct.Struct("<qq")        # stream count, block size
+PHILOX_STATE = struct.Struct("<4Q2Q4QqqQq")  # counter, key, buffer, buffer_pos, has_uint32, uinteger, unread draws
+
+
+def _pack_rng():
+    version, internal, gauss_next = random.getstate()
+    return RNG_STATE.pack(version, *internal, gauss_next is not None, gauss_next or 0.0)
+
+
+def _unpack_rng(data):
+    fields = RNG_STATE.unpack(data)
+    version, internal, has_gauss, gauss_next = fields[0], fields[1:626], fields[626], fields[627]
+    random.setstate((version, tuple(internal), gauss_next if has_gauss else None))
+
+
+def _pack_streams(streams):
+    # A BlockStream is its generator's state plus the draws of its current block not yet used
+    if streams is None:
+        return b""
+    chunks = [STREAMS_HEADER.pack(streams.n_streams, streams.streams[0].block_size)]
+    for stream in streams.streams:
+        state = stream.generator.bit_generator.state
+        if state["bit_generator"] != "Philox":
+            raise ValueError(f"Cannot checkpoint a {state['bit_generator']} stream.")
+        unread = stream._block[stream._next:]
+        chunks.append(PHILOX_STATE.pack(*state["state"]["counter"], *state["state"]["key"], *state["buffer"],
+                                        state["buffer_pos"], state["has_uint32"], state["uinteger"], len(unread)))
+        chunks.append(array("d", unread).tobytes())
+    return b"".join(chunks)
+
+
+def _unpack_streams(streams, data, byteswap):
+    """Restores saved stream states into `streams`, or into new RngStreams if it is None."""
+    n_streams, block_size = STREAMS_HEADER.unpack_from(data, 0)
+    if streams is None:
+        streams = RngStreams(n_streams=n_streams, block_size=block_size)
+    elif streams.n_streams != n_streams:
+        raise ValueError(f"The checkpoint has {n_streams} RNG streams, the ledger {streams.n_streams}.")
+    offset = STREAMS_HEADER.size
+    for stream in streams.streams:
+        fields = PHILOX_STATE.unpack_from(data, offset)
+        offset += PHILOX_STATE.size
+        state = stream.generator.bit_generator.state
+        state["state"]["counter"][:] = fields[0:4]
+        state["state"]["key"][:] = fields[4:6]
+        state["buffer"][:] = fields[6:10]
+        state["buffer_pos"], state["has_uint32"], state["uinteger"] = fields[10:13]
+        stream.generator.bit_generator.state = state
+        unread = array("d", bytes(data[offset:offset + 8 * fields[13]]))
+        if byteswap:
+            unread.byteswap()
+        stream._block = unread.tolist()
+        stream._next = 0
+        offset += 8 * fields[13]
+    return streams
+
+
+def _pack_names(ledger, handles=None):
+    chunks = []
+    for handle, agent_id in ledger._names.items():
+        if handles is not None and handle not in handles:
+            continue
+        encoded = agent_id.encode("utf-8")
+        chunks.append(NAME_ENTRY.pack(handle, len(encoded)))
+        chunks.append(encoded)
+    return b"".join(chunks)
+
+
+def _unpack_names(data):
+    names = {}
+    offset = 0
+    while offset < len(data):
+        handle, length = NAME_ENTRY.unpack_from(data, offset)
+        offset += NAME_ENTRY.size
+        names[handle] = sys.intern(bytes(data[offset:offset + length]).decode("utf-8"))
+        offset += length
+    return names
+
+
+def _pack_pending(ledger):
+    handle_of = ledger.handle_of
+    return b"".join(PENDING_RECORD.pack(handle_of(target_id), handle_of(source_id), payload, ttl)
+                    for target_id, source_id, payload, ttl in ledger.engine.pending)
+
+
+def _write(path, flags, ledger, sections, base_size):
+    # Sections are written back to back after the header; the header records where each starts
+    offsets = []
+    position = CHECKPOINT_HEADER.size
+    for section in sections:
+        offsets += [position, len(section)]
+        position += len(section)
+    offsets += [0, 0] * (CHECKPOINT_SECTIONS - len(sections))
+    header = CHECKPOINT_HEADER.pack(
+        CHECKPOINT_MAGIC, CHECKPOINT_VERSION, flags | (FLAG_BIG_ENDIAN if sys.byteorder == "big" else 0),
+        ledger.size, ledger.live, base_size, 0, int(ledger.network_halted), ledger.fanout,
+        *offsets)
+    with open(path, "wb") as stream:
+        stream.write(header)
+        for section in sections:
+            stream.write(section)
+
+
+# --- SAVE ---
+
+def save_checkpoint(ledger, path):
+    """
+    Writes a full checkpoint of a CompactLedger: IDs, states, halted flags, the pending
+    pulse queue and the RNG state, including the ledger's RNG streams if it has them.
+    Starts dirty tracking for later incremental checkpoints.
+    """
+    sections = [
+        ledger.state.tobytes(),
+        ledger.creation_time.tobytes(),
+        bytes(ledger.halted),
+        bytes(ledger.alive),
+        _pack_names(ledger),
+        _pack_pending(ledger),
+        _pack_rng(),
+    ]
+    sections += [ledger.prefix.encode("utf-8"), b"", _pack_streams(ledger.streams)]
+    _write(path, 0, ledger, sections, base_size=0)
+    ledger.dirty = set()
+    ledger._checkpoint_size = ledger.size
+    print(f"[SYS] Checkpoint written: {ledger.size} agents, {len(ledger.engine.pending)} pending pulses -> {path}")
+
+
+def save_incremental(ledger, path):
+    """
+    Writes only the agents changed or added since the last checkpoint (full or incremental),
+    plus the current pending queue and RNG states. Requires a prior save_checkpoint.
+    """
+    if ledger.dirty is None:
+        raise RuntimeError("save_checkpoint must be called before save_incremental.")
+    base_size = ledger._checkpoint_size
+    handles = sorted(ledger.dirty.union(range(base_size, ledger.size)))
+    state, created, halted, alive = ledger.state, ledger.creation_time, ledger.halted, ledger.alive
+    changes = b"".join(CHANGE_RECORD.pack(h, state[h], created[h], halted[h], alive[h]) for h in handles)
+    sections = [b"", b"", b"", b"", _pack_names(ledger, set(handles)), _pack_pending(ledger), _pack_rng(),
+                ledger.prefix.encode("utf-8"), changes, _pack_streams(ledger.streams)]
+    _write(path, FLAG_INCREMENTAL, ledger, sections, base_size=base_size)
+    ledger.dirty = set()
+    ledger._checkpoint_size = ledger.size
+    print(f"[SYS] Incremental checkpoint written: {len(handles)} changed agents -> {path}")
+
+
+# --- RESTORE ---
+
+def _read_header(view):
+    fields = CHECKPOINT_HEADER.unpack_from(view, 0)
+    if fields[0] != CHECKPOINT_MAGIC:
+        raise ValueError("Not a Chrysalis checkpoint.")
+    if fields[1] != CHECKPOINT_VERSION:
+        raise ValueError(f"Checkpoint format version {fields[1]} is not supported (expected {CHECKPOINT_VERSION}).")
+    flags = fields[2]
+    size, live, base_size, _, network_halted, fanout = fields[3:9]  # The 4th scalar is reserved
+    offsets = fields[9:]
+    sections = [(offsets[i], offsets[i + 1]) for i in range(0, len(offsets), 2)]
+    return flags, size, live, base_size, network_halted, fanout, sections
+
+
+def _apply_common(ledger, view, header):
+    flags, size, live, _, network_halted, fanout, sections = header
+    ledger.live = live
+    ledger.network_halted = bool(network_halted)
+    ledger.vetoes_active = ledger.network_halted
+    ledger.fanout = fanout
+    start, length = sections[4]
+    for handle, agent_id in _unpack_names(view[start:start + length]).items():
+        ledger._names[handle] = agent_id
+        ledger._named[agent_id] = handle
+    start, length = sections[6]
+    _unpack_rng(view[start:start + length])
+    start, length = sections[9]
+    if length:
+        ledger.streams = _unpack_streams(ledger.streams, bytes(view[start:start + length]),
+                                         bool(flags & FLAG_BIG_ENDIAN) != (sys.byteorder == "big"))
+
+    # The queue is replaced by the one saved with the newest checkpoint
+    ledger.engine.pending.clear()
+    id_of = ledger.id_of
+    start, length = sections[5]
+    for offset in range(start, start + length, PENDING_RECORD.size):
+        target, source, payload, ttl = PENDING_RECORD.unpack_from(view, offset)
+        ledger.engine.pending.append((id_of(target), id_of(source) if source >= 0 else "EXTERNAL", payload, ttl))
+
+
+def load_checkpoint(path, incrementals=(), max_in_flight=None, streams=None, topology=None):
+    """
+    Restores a CompactLedger from a full checkpoint and any incremental checkpoints
+    written after it, in order. The files are mapped with mmap and the arrays are
+    filled with bulk copies, so loading time is dominated by disk bandwidth.
+
+    `topology` is the graph the ledger ran on. Saved RNG streams are restored into
+    `streams` (an RngStreams with the same stream count) or, if it is None, into new
+    ones, so a resumed run draws exactly what the original would have.
+    """
+    ledger = CompactLedger(max_in_flight=max_in_flight, topology=topology, streams=streams)
+    with open(path, "rb") as stream, mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            header = _read_header(view)
+            flags, size = header[0], header[1]
+            if flags & FLAG_INCREMENTAL:
+                raise ValueError(f"{path} is an incremental checkpoint; pass it in `incrementals`.")
+            sections = header[6]
+            ledger.size = size
+            for index, name in enumerate(("state", "creation_time")):
+                start, length = sections[index]
+                getattr(ledger, name).frombytes(view[start:start + length])
+            start, length = sections[2]
+            ledger.halted = bytearray(view[start:start + length])
+            start, length = sections[3]
+            ledger.alive = bytearray(view[start:start + length])
+            start, length = sections[7]
+            ledger.prefix = bytes(view[start:start + length]).decode("utf-8")
+            if bool(flags & FLAG_BIG_ENDIAN) != (sys.byteorder == "big"):
+                ledger.state.byteswap()
+                ledger.creation_time.byteswap()
+            _apply_common(ledger, view, header)
+        finally:
+            view.release()
+
+    for delta_path in incrementals:
+        _apply_incremental(ledger, delta_path)
+
+    ledger.dirty = set()
+    ledger._checkpoint_size = ledger.size
+    print(f"[SYS] Checkpoint restored: {ledger.size} agents, {len(ledger.engine.pending)} pending pulses.")
+    return ledger
+
+
+def _apply_incremental(ledger, path):
+    with open(path, "rb") as stream, mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            header = _read_header(view)
+            flags, size, base_size = header[0], header[1], header[3]
+            if not flags & FLAG_INCREMENTAL:
+                raise ValueError(f"{path} is a full checkpoint.")
+            if base_size != ledger.size:
+                raise ValueError(f"{path} continues a ledger of {base_size} agents, not {ledger.size}.")
+            # Grow the arrays for agents registered since the previous checkpoint
+            grow = size - ledger.size
+            if grow > 0:
+                ledger.state.extend(array("d", bytes(8 * grow)))
+                ledger.creation_time.extend(array("d", bytes(8 * grow)))
+                ledger.halted.extend(bytes(grow))
+                ledger.alive.extend(bytes(grow))
+                ledger.size = size
+            start, length = header[6][8]
+            for offset in range(start, start + length, CHANGE_RECORD.size):
+                handle, state, created, halted, alive = CHANGE_RECORD.unpack_from(view, offset)
+                ledger.state[handle] = state
+                ledger.creation_time[handle] = created
+                ledger.halted[handle] = halted
+                ledger.alive[handle] = alive
+            _apply_common(ledger, view, header)
+        finally:
+            view.release()
+
+
+# --- Main execution block for a checkpoint round-trip ---
+
+if __name__ == "__main__":
+    import os
+    import time
+    import tempfile
+
+    print("------ Project Chrysalis: Checkpoint Test ------")
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    ledger = CompactLedger()
+    ledger.add_many(count)
+    ledger.add(agent_id="alpha")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        full_path = os.path.join(workdir, "network.ckpt")
+        delta_path = os.path.join(workdir, "network.ckpt.1")
+
+        save_checkpoint(ledger, full_path)
+        ledger.engine.submit("alpha", "EXTERNAL", 0.5, 10_000)
+        ledger.engine.run(steps=5_000)
+        save_incremental(ledger, delta_path)
+
+        start = time.perf_counter()
+        restored = load_checkpoint(full_path, incrementals=[delta_path])
+        print(f"[SYS] Restore took {time.perf_counter() - start:.2f}s.")
+
+        assert restored.state == ledger.state and restored.halted == ledger.halted
+        assert list(restored.engine.pending) == list(ledger.engine.pending)
+        print("[SYS] Restored network matches the original. Resuming the cascade from the checkpoint.")
+        restored.engine.run_until_quiescent()
+        restored.engine.report()
+    print("------ SIMULATION COMPLETE ------")
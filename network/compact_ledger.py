@@ -0,0 +1,318 @@
+import sys
+import time
+import random
+from array import array
+
+from pulse_engine import PulseEngine, METRICS
+from network_v2_veto import C_Agent
+from tracing import TRACE, EV_REGISTER
+
+# --- COMPACT AGENT VIEW ---
+
+class CompactAgent:
+    """
+    A C_Agent whose fields live in the CompactLedger's typed arrays.
+    The view itself is two slots (ledger, handle), so it is cheap to create on demand
+    and is not kept once a pulse has been delivered. The pulse-handling methods are
+    C_Agent's own, so behaviour is identical to the object-per-agent network.
+    """
+    __slots__ = ("ledger", "handle")
+
+    group = None
+
+    def __init__(self, ledger, handle):
+        self.ledger = ledger
+        self.handle = handle
+
+    @property
+    def id(self):
+        return self.ledger.id_of(self.handle)
+
+    @property
+    def internal_state(self):
+        return self.ledger.state[self.handle]
+
+    @internal_state.setter
+    def internal_state(self, value):
+        ledger = self.ledger
+        ledger.state[self.handle] = value
+        if ledger.dirty is not None:
+            ledger.dirty.add(self.handle)
+
+    @property
+    def halted(self):
+        return self.ledger.halted[self.handle] != 0
+
+    @halted.setter
+    def halted(self, value):
+        ledger = self.ledger
+        ledger.halted[self.handle] = 1 if value else 0
+        if ledger.dirty is not None:
+            ledger.dirty.add(self.handle)
+
+    @property
+    def creation_time(self):
+        return self.ledger.creation_time[self.handle]
+
+    receive_pulse = C_Agent.receive_pulse
+    receive_pulse_batch = C_Agent.receive_pulse_batch
+    _process = C_Agent._process
+    _process_coalesced = C_Agent._process_coalesced
+    _emit_pulse = C_Agent._emit_pulse
+    _emit_fanout = C_Agent._emit_fanout
+    issue_veto_command = C_Agent.issue_veto_command
+
+
+class _AgentTable:
+    """
+    Read-only mapping from agent ID to a CompactAgent view, used by the pulse engine.
+    Works over any HandleLedger: iteration walks the handle space and skips dead handles.
+    """
+    __slots__ = ("ledger",)
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+
+    def get(self, agent_id, default=None):
+        handle = self.ledger.handle_of(agent_id)
+        if handle < 0:
+            return default
+        return CompactAgent(self.ledger, handle)
+
+    def __getitem__(self, agent_id):
+        agent = self.get(agent_id)
+        if agent is None:
+            raise KeyError(agent_id)
+        return agent
+
+    def __contains__(self, agent_id):
+        return self.ledger.handle_of(agent_id) >= 0
+
+    def __len__(self):
+        return self.ledger.live
+
+    def __iter__(self):
+        ledger = self.ledger
+        is_live = ledger._is_live
+        return (ledger.id_of(handle) for handle in range(ledger._capacity) if is_live(handle))
+
+    def items(self):
+        return ((agent_id, self.get(agent_id)) for agent_id in self)
+
+
+# --- HANDLE LEDGER BASE ---
+
+class HandleLedger:
+    """
+    Peer selection and veto shared by the ledgers whose agents are integer handles
+    viewed through CompactAgent. A subclass provides `_capacity` (handles issued so
+    far; every live handle is below it), `_is_live(handle)`, `live`, `handle_of`,
+    `topology`, `streams` and `engine`.
+    """
+    def _is_live(self, handle):
+        raise NotImplementedError
+
+    # --- Peer selection ---
+
+    def rng_for(self, agent):
+        """Random source for the agent's draws: its logical shard's stream, or the random module."""
+        return random if self.streams is None else self.streams.stream(agent.handle)
+
+    def _draw(self, skip, rng=random):
+        # Rejection sampling over the handle space skips deregistered agents
+        count = self._capacity - (1 if skip >= 0 else 0)
+        if self.live - (1 if skip >= 0 else 0) <= 0:
+            return -1
+        is_live = self._is_live
+        while True:
+            handle = rng.randrange(count)
+            if skip >= 0 and handle >= skip:
+                handle += 1
+            if is_live(handle):
+                return handle
+
+    def get_random_agent(self, exclude_id=None, rng=random):
+        handle = self._draw(self.handle_of(exclude_id) if exclude_id is not None else -1, rng)
+        return CompactAgent(self, handle) if handle >= 0 else None
+
+    def sample(self, k, exclude_id=None, rng=random):
+        skip = self.handle_of(exclude_id) if exclude_id is not None else -1
+        k = min(k, self.live - (1 if skip >= 0 else 0))
+        picked = set()
+        while len(picked) < k:
+            picked.add(self._draw(skip, rng))
+        return [CompactAgent(self, handle) for handle in picked]
+
+    def neighbors_of(self, agent, k=1, rng=random):
+        """Up to k distinct live topology neighbours of the agent."""
+        if k == 1:
+            nodes = (self.topology.neighbor(agent.handle, rng),)
+        else:
+            nodes = self.topology.neighbors(agent.handle, k, rng)
+        capacity = self._capacity
+        return [CompactAgent(self, node) for node in nodes if 0 <= node < capacity and self._is_live(node)]
+
+    # --- Veto ---
+
+    def is_vetoed(self, agent):
+        return self.network_halted
+
+    def broadcast_veto(self):
+        """O(1) network-wide halt, same protocol as LocalLedger."""
+        print("\n" + "="*20 + " NEXUS VETO BROADCAST " + "="*20)
+        self.network_halted = True
+        self.vetoes_active = True
+        self.engine.cancel_in_flight()
+        print("="*22 + " BROADCAST SENT " + "="*22 + "\n")
+
+    def resume(self):
+        print("[SYS] Nexus lifted the network-wide veto.")
+        self.network_halted = False
+        self.vetoes_active = False
+
+
+# --- COMPACT LEDGER DEFINITION ---
+
+class CompactLedger(HandleLedger):
+    """
+    Ledger for very large populations.
+    Agents are integer handles into typed arrays (8-byte state, 8-byte creation time,
+    1-byte halted and alive flags) instead of a dict of objects. IDs are not stored for
+    agents created in bulk: handle h is named f"{prefix}{h}" and the name is parsed back
+    on lookup. Only explicitly named agents go into an interned ID -> handle table.
+    Handles are also the node numbers of an optional `topology`, and pick the
+    logical-shard stream of an optional `streams` (rng_streams.RngStreams).
+    """
+    def __init__(self, max_in_flight=None, fanout=1, prefix="agent-", topology=None, streams=None):
+        self.prefix = prefix
+        self.fanout = fanout
+        self.topology = topology
+        self.streams = streams
+        self.state = array("d")
+        self.creation_time = array("d")
+        self.halted = bytearray()
+        self.alive = bytearray()
+        self.size = 0   # Handles issued
+        self.live = 0   # Handles not deregistered
+        self._named = {}          # Explicit ID -> handle
+        self._names = {}          # handle -> explicit ID
+        self.network_halted = False
+        self.vetoes_active = False
+        # Handles changed since the last checkpoint; None until checkpointing starts
+        self.dirty = None
+        self._checkpoint_size = 0
+        self.store = None  # Ledger backends are not used here; the arrays are the storage
+        self.agents = _AgentTable(self)
+        self.engine = PulseEngine(self, max_in_flight=max_in_flight)
+        print("[SYS] Compact Synaptic Ledger initialized.")
+
+    # --- Registration ---
+
+    def add(self, agent_id=None, state=None):
+        """Registers one agent and returns its view."""
+        handle = self.size
+        if agent_id is not None:
+            if self.handle_of(agent_id) >= 0:
+                raise ValueError(f"Agent {agent_id} is already registered.")
+            agent_id = sys.intern(agent_id)
+            self._named[agent_id] = handle
+            self._names[handle] = agent_id
+        if state is None:
+            state = (random if self.streams is None else self.streams.stream(handle)).random()
+        self.state.append(state)
+        self.creation_time.append(time.time())
+        self.halted.append(0)
+        self.alive.append(1)
+        self.size += 1
+        self.live += 1
+        if TRACE.sys:
+            TRACE.name(handle, self.id_of(handle))
+            TRACE.record(EV_REGISTER, -1, handle, self.state[handle])
+        return CompactAgent(self, handle)
+
+    def add_many(self, count):
+        """
+        Mass registration of `count` unnamed agents with random initial state.
+        No per-agent objects or strings are created. Returns the range of new handles.
+        """
+        start = self.size
+        if self.streams is None:
+            draw = random.random
+            self.state.extend(draw() for _ in range(count))
+        else:
+            stream = self.streams.stream
+            self.state.extend(stream(handle).random() for handle in range(start, start + count))
+        self.creation_time.extend(array("d", [time.time()]) * count)
+        self.halted.extend(bytes(count))
+        self.alive.extend(b"\x01" * count)
+        self.size += count
+        self.live += count
+        return range(start, self.size)
+
+    def deregister(self, agent_id):
+        handle = self.handle_of(agent_id)
+        if handle < 0:
+            return None
+        self.alive[handle] = 0
+        self.live -= 1
+        if self.dirty is not None:
+            self.dirty.add(handle)
+        return CompactAgent(self, handle)
+
+    # --- ID <-> handle ---
+
+    def id_of(self, handle):
+        name = self._names.get(handle)
+        return name if name is not None else f"{self.prefix}{handle}"
+
+    def handle_of(self, agent_id):
+        """Handle of a live agent, or -1 (also used for external sources in trace records)."""
+        handle = self._named.get(agent_id)
+        if handle is None:
+            if not agent_id or not agent_id.startswith(self.prefix):
+                return -1
+            digits = agent_id[len(self.prefix):]
+            if not digits.isdigit():
+                return -1
+            handle = int(digits)
+            # Only the canonical spelling names a handle: "agent-007" is not agent-7
+            if digits != str(handle):
+                return -1
+            # A handle that was given an explicit name is not reachable by its default one
+            if handle >= self.size or handle in self._names:
+                return -1
+        return handle if self.alive[handle] else -1
+
+    # --- HandleLedger hooks ---
+
+    @property
+    def _capacity(self):
+        return self.size
+
+    def _is_live(self, handle):
+        return self.alive[handle] != 0
+
+
+METRICS.hot_path(CompactLedger, "add", "add_many")
+
+
+# --- Main execution block for a large-population test ---
+
+if __name__ == "__main__":
+    import resource
+
+    print("------ Project Chrysalis: Compact Ledger Test ------")
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    ledger = CompactLedger()
+
+    start = time.perf_counter()
+    ledger.add_many(count)
+    ledger.add(agent_id="alpha")
+    elapsed = time.perf_counter() - start
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"[SYS] {ledger.live} agents registered in {elapsed:.2f}s. Peak RSS: {rss_mb:.0f} MB.")
+
+    ledger.engine.submit("alpha", "EXTERNAL", 0.5, 200_000)
+    ledger.engine.run_until_quiescent()
+    ledger.engine.report()
+    print("------ SIMULATION COMPLETE ------")
@@ -0,0 +1,352 @@
+import os
+import sys
+import stat
+import time
+import json
+import random
+import socket
+import asyncio
+import threading
+from collections import deque
+
+# --- STIMULUS SOURCES ---
+# A source is any iterable of text lines, one stimulus per line:
+#     <target_id> <payload> [ttl]
+# or a JSON object {"target": ..., "payload": ..., "ttl": ...}. A target of "*" means
+# a random live agent. The sources below are plain generators; feed_async() accepts
+# any async iterable of the same lines.
+
+def file_source(path, follow=False, poll=0.05, stop=None):
+    """Lines of a file. With follow=True, keeps reading what is appended (like tail -f)."""
+    with open(path) as handle:
+        while stop is None or not stop.is_set():
+            line = handle.readline()
+            if line:
+                yield line
+            elif follow:
+                time.sleep(poll)
+            else:
+                return
+
+
+def stdin_source():
+    yield from sys.stdin
+
+
+def socket_source(address, stop=None, timeout=0.2):
+    """
+    Lines from clients of a local socket: a TCP port on 127.0.0.1, or a Unix socket
+    path. Clients are served one after another. While the consumer is blocked the
+    socket is not read, so the kernel buffers fill and the sender is throttled.
+    """
+    if isinstance(address, int):
+        server = socket.create_server(("127.0.0.1", address))
+    else:
+        if os.path.exists(address):
+            # A socket left by an earlier run is replaced; anything else is not ours to delete
+            if not stat.S_ISSOCK(os.stat(address).st_mode):
+                raise FileExistsError(f"{address} exists and is not a socket.")
+            os.unlink(address)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(address)
+        server.listen()
+    server.settimeout(timeout)
+    try:
+        while stop is None or not stop.is_set():
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                continue
+            with conn, conn.makefile("r") as lines:
+                yield from lines
+    finally:
+        server.close()
+
+
+def synthetic_source(count, targets, rate=None, ttl=20, seed=None):
+    """`count` stimuli to random targets, at `rate` per second (None: as fast as possible)."""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for index in range(count):
+        if rate is not None:
+            delay = start + index / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield f"{rng.choice(targets)} {rng.random():.6f} {ttl}"
+
+
+def parse_stimulus(line, default_ttl=20):
+    """Returns (target_id, payload, ttl), or None for a blank or comment line."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line.startswith("{"):
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError(f"expected a JSON object, got {type(record).__name__}")
+        return str(record["target"]), float(record["payload"]), int(record.get("ttl", default_ttl))
+    fields = line.split()
+    ttl = int(fields[2]) if len(fields) > 2 else default_ttl
+    return fields[0], float(fields[1]), ttl
+
+
+# --- INGESTOR DEFINITION ---
+
+BLOCK = "block"              # The reader waits for room: backpressure reaches the source
+DROP = "drop"                # A stimulus that finds the queue full is discarded
+DROP_OLDEST = "drop-oldest"  # The oldest queued stimulus makes room for the new one
+SAMPLE = "sample"            # Above the high-water mark only `sample_rate` of stimuli are kept
+POLICIES = (BLOCK, DROP, DROP_OLDEST, SAMPLE)
+
+
+class Ingestor:
+    """
+    Feeds external stimuli into a running network through a bounded queue.
+    A reader thread (start) or coroutine (feed_async) parses lines from a source and
+    queues (target_id, payload, ttl, arrival time). The simulation loop calls pump()
+    between engine steps, which submits queued stimuli as EXTERNAL pulses, never more
+    than the engine's max_in_flight bound allows. When the network falls behind, the
+    queue fills and the policy decides what happens: block the reader, drop, or sample.
+    Memory is bounded by `capacity` either way.
+
+    Ingest lag is measured from arrival in the reader to submission to the engine, on
+    this process's monotonic clock.
+    """
+    def __init__(self, ledger, capacity=10_000, policy=BLOCK, sample_rate=0.1, high_water=0.5,
+                 default_ttl=20, seed=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown ingest policy {policy!r}; expected one of {POLICIES}.")
+        self.ledger = ledger
+        self.capacity = capacity
+        self.policy = policy
+        self.sample_rate = sample_rate
+        self.high_water = int(capacity * high_water)
+        self.default_ttl = default_ttl
+        self.rng = random.Random(seed)
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.stopping = threading.Event()
+        self.exhausted = threading.Event()  # Set when the source has no more lines
+        self._reader = None
+        # Counters
+        self.received = 0
+        self.malformed = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.submitted = 0
+        self.refused = 0       # Queue had stimuli but the engine was at its bound
+        self.max_depth = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+
+    def __len__(self):
+        return len(self.queue)
+
+    @property
+    def done(self):
+        """The source is exhausted and every accepted stimulus has been submitted."""
+        return self.exhausted.is_set() and not self.queue
+
+    # --- Producer side ---
+
+    def offer(self, line):
+        """Parses and queues one stimulus under the policy. Returns True if it was queued."""
+        try:
+            stimulus = parse_stimulus(line, self.default_ttl)
+        except (ValueError, TypeError, KeyError, IndexError):
+            # TypeError covers JSON values of the wrong type, e.g. "payload": null
+            self.malformed += 1
+            return False
+        if stimulus is None:
+            return False
+        self.received += 1
+        queue = self.queue
+        with self.cond:
+            if self.policy == SAMPLE and len(queue) >= self.high_water and self.rng.random() >= self.sample_rate:
+                self.sampled_out += 1
+                return False
+            if len(queue) >= self.capacity:
+                if self.policy == BLOCK:
+                    while len(queue) >= self.capacity and not self.stopping.is_set():
+                        self.cond.wait(0.1)
+                    if self.stopping.is_set():
+                        return False
+                elif self.policy == DROP_OLDEST:
+                    queue.popleft()
+                    self.dropped += 1
+                else:
+                    self.dropped += 1
+                    return False
+            queue.append((*stimulus, time.monotonic()))
+            if len(queue) > self.max_depth:
+                self.max_depth = len(queue)
+        return True
+
+    def feed(self, source):
+        """Blocking: queues every line of the source until it ends or stop() is called."""
+        try:
+            for line in source:
+                if self.stopping.is_set():
+                    break
+                self.offer(line)
+        finally:
+            self.exhausted.set()
+
+    def start(self, source):
+        """Reads the source on a daemon thread."""
+        self._reader = threading.Thread(target=self.feed, args=(source,), daemon=True)
+        self._reader.start()
+        return self
+
+    async def feed_async(self, source):
+        """Queues every line of an async iterable. Blocking waits yield to the event loop."""
+        try:
+            async for line in source:
+                if self.stopping.is_set():
+                    break
+                if self.policy == BLOCK:
+                    while len(self.queue) >= self.capacity and not self.stopping.is_set():
+                        await asyncio.sleep(0.001)
+                self.offer(line)
+        finally:
+            self.exhausted.set()
+
+    def stop(self):
+        self.stopping.set()
+        with self.cond:
+            self.cond.notify_all()
+        if self._reader is not None:
+            self._reader.join(timeout=1.0)
+
+    # --- Consumer side ---
+
+    def pump(self, limit=None):
+        """Submits queued stimuli to the engine. Returns how many were submitted."""
+        engine = self.ledger.engine
+        room = len(self.queue) if limit is None else min(limit, len(self.queue))
+        if engine.max_in_flight is not None:
+            room = min(room, engine.max_in_flight - engine.in_flight())
+        if room <= 0:
+            if self.queue:
+                self.refused += 1
+            return 0
+        with self.cond:
+            batch = [self.queue.popleft() for _ in range(min(room, len(self.queue)))]
+            self.cond.notify_all()
+        now = time.monotonic()
+        count = 0
+        for target_id, payload, ttl, arrived in batch:
+            if target_id == "*":
+                target = self.ledger.get_random_agent()
+                if target is None:
+                    continue
+                target_id = target.id
+            engine.submit(target_id, "EXTERNAL", payload, ttl)
+            lag = now - arrived
+            self.lag_total += lag
+            if lag > self.lag_max:
+                self.lag_max = lag
+            count += 1
+        self.submitted += count
+        return count
+
+    def run(self, steps=4096, ticks=False, report_every=None):
+        """
+        Simulation loop: pump, then deliver up to `steps` pulses (or one tick with
+        ticks=True), until the source is exhausted and the network is quiescent.
+        """
+        engine = self.ledger.engine
+        last_report = time.monotonic()
+        while not (self.done and not engine.pending):
+            if not self.pump() and not engine.pending:
+                # Nothing to do until the reader queues more
+                with self.cond:
+                    if not self.queue and not self.exhausted.is_set():
+                        self.cond.wait(0.01)
+                continue
+            if ticks:
+                engine.run_tick()
+            else:
+                engine.run(steps)
+            if report_every is not None and time.monotonic() - last_report >= report_every:
+                self.report()
+                last_report = time.monotonic()
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "malformed": self.malformed,
+            "queue_depth": len(self.queue),
+            "max_depth": self.max_depth,
+            "mean_lag_ms": 1000 * self.lag_total / self.submitted if self.submitted else 0.0,
+            "max_lag_ms": 1000 * self.lag_max,
+        }
+
+    def report(self):
+        stats = self.stats()
+        print(f"[SYS] Ingest: {stats['received']} received, {stats['submitted']} submitted, "
+              f"{stats['dropped']} dropped, {stats['sampled_out']} sampled out. "
+              f"Queue depth {stats['queue_depth']}/{self.capacity} (max {stats['max_depth']}). "
+              f"Lag mean {stats['mean_lag_ms']:.2f} ms, max {stats['max_lag_ms']:.2f} ms.")
+
+
+# --- Main execution block: feed a compact network from a stream ---
+
+if __name__ == "__main__":
+    import argparse
+    import contextlib
+    from compact_ledger import CompactLedger
+
+    parser = argparse.ArgumentParser(description="Feed external stimuli into a Chrysalis network.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--file", help="Read stimuli from a file.")
+    group.add_argument("--stdin", action="store_true", help="Read stimuli from stdin.")
+    group.add_argument("--socket", help="Listen on a local TCP port or Unix socket path.")
+    parser.add_argument("--follow", action="store_true", help="Keep reading a file as it grows.")
+    parser.add_argument("--agents", type=int, default=100_000)
+    parser.add_argument("--capacity", type=int, default=10_000)
+    parser.add_argument("--policy", choices=POLICIES, default=BLOCK)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--max-in-flight", type=int, default=50_000)
+    args = parser.parse_args()
+
+    print("------ Project Chrysalis: Stimulus Ingestion Test ------")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        ledger = CompactLedger(max_in_flight=args.max_in_flight)
+    ledger.add_many(args.agents)
+
+    def ingest(make_source, policy, label, report_every=1.0):
+        ingestor = Ingestor(ledger, capacity=args.capacity, policy=policy, sample_rate=args.sample_rate, seed=7)
+        start = time.perf_counter()
+        ingestor.start(make_source(ingestor.stopping))
+        try:
+            ingestor.run(report_every=report_every)
+        except KeyboardInterrupt:
+            print("\n[SYS] Interrupted. Stopping ingestion.")
+        finally:
+            ingestor.stop()
+        elapsed = time.perf_counter() - start
+        print(f"[SYS] {label} ({policy}): finished in {elapsed:.2f}s.")
+        ingestor.report()
+        return ingestor
+
+    if args.file:
+        ingest(lambda stop: file_source(args.file, follow=args.follow, stop=stop), args.policy, args.file)
+    elif args.stdin:
+        ingest(lambda stop: stdin_source(), args.policy, "stdin")
+    elif args.socket:
+        address = int(args.socket) if args.socket.isdigit() else args.socket
+        ingest(lambda stop: socket_source(address, stop=stop), args.policy, f"socket {args.socket}")
+    else:
+        # A burst far faster than the network: the queue stays bounded under every policy
+        ids = [ledger.id_of(handle) for handle in range(0, args.agents, 97)]
+        for policy in POLICIES:
+            ingestor = ingest(lambda stop: synthetic_source(100_000, ids, ttl=5, seed=7), policy,
+                              "Synthetic burst", report_every=None)
+            assert ingestor.max_depth <= args.capacity
+            assert ingestor.received == ingestor.submitted + ingestor.dropped + ingestor.sampled_out
+    ledger.engine.report()
+    print("------ SIMULATION COMPLETE ------")
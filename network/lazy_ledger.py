@@ -0,0 +1,186 @@
+import time
+import random
+from array import array
+
+from pulse_engine import PulseEngine
+from compact_ledger import CompactAgent, HandleLedger, _AgentTable
+
+MASK64 = (1 << 64) - 1
+
+
+def splitmix64(value):
+    """One SplitMix64 step: a well-mixed 64-bit hash of `value`."""
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+# --- LAZY COLUMNS ---
+# CompactAgent reads and writes ledger.state[h], ledger.halted[h] and
+# ledger.creation_time[h]. These columns answer from the sparse store when the agent
+# has been materialized and derive the value from (seed, handle) otherwise.
+
+class _StateColumn:
+    __slots__ = ("ledger",)
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+
+    def __getitem__(self, handle):
+        ledger = self.ledger
+        row = ledger._rows.get(handle)
+        return ledger._state[row] if row is not None else ledger.initial_state(handle)
+
+    def __setitem__(self, handle, value):
+        ledger = self.ledger
+        row = ledger._rows.get(handle)
+        if row is None:
+            ledger._rows[handle] = len(ledger._state)
+            ledger._state.append(value)
+        else:
+            ledger._state[row] = value
+
+
+class _HaltedColumn:
+    __slots__ = ("ledger",)
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+
+    def __getitem__(self, handle):
+        return 1 if handle in self.ledger._halted else 0
+
+    def __setitem__(self, handle, value):
+        if value:
+            self.ledger._halted.add(handle)
+        else:
+            self.ledger._halted.discard(handle)
+
+
+class _CreationColumn:
+    __slots__ = ("ledger",)
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+
+    def __getitem__(self, handle):
+        return self.ledger.created_at
+
+
+# --- LAZY LEDGER DEFINITION ---
+
+class LazyLedger(HandleLedger):
+    """
+    Ledger over an address space of `count` agents that are never built up front.
+    An agent is only a handle in range(count), named f"{prefix}{handle}". Its initial
+    state is derived from (seed, handle) with SplitMix64, so it is the same in every run
+    and on every host. The first write materializes the agent into a compact store
+    (a handle -> row dict over an array('d')); halted and deregistered agents are kept
+    in sets. CompactAgent views are created only when a pulse or caller asks for one.
+    Memory therefore grows with the agents a cascade reaches, not with `count`.
+    Peer choices use the global `random` module unless `streams` is given.
+    Peer selection and veto are CompactLedger's, through the HandleLedger base.
+    """
+    def __init__(self, count, seed=0, max_in_flight=None, fanout=1, prefix="agent-", topology=None, streams=None):
+        self.count = count
+        self.seed = seed & MASK64
+        self.prefix = prefix
+        self.fanout = fanout
+        self.topology = topology
+        self.streams = streams
+        self.created_at = time.time()
+        self._rows = {}           # Materialized handle -> row in _state
+        self._state = array("d")
+        self._halted = set()
+        self._removed = set()
+        self.state = _StateColumn(self)
+        self.halted = _HaltedColumn(self)
+        self.creation_time = _CreationColumn(self)
+        self.network_halted = False
+        self.vetoes_active = False
+        self.dirty = None
+        self.store = None
+        self.agents = _AgentTable(self)
+        self.engine = PulseEngine(self, max_in_flight=max_in_flight)
+        print(f"[SYS] Lazy Synaptic Ledger initialized over {count:,} agents (seed {seed}).")
+
+    @property
+    def live(self):
+        return self.count - len(self._removed)
+
+    @property
+    def materialized(self):
+        return len(self._rows)
+
+    def initial_state(self, handle):
+        """Deterministic initial state of an untouched agent, uniform in [0, 1)."""
+        return (splitmix64(self.seed ^ splitmix64(handle)) >> 11) * (1.0 / (1 << 53))
+
+    def view(self, agent_id):
+        """A CompactAgent view of the agent. Nothing is materialized until it is written."""
+        return self.agents[agent_id]
+
+    def deregister(self, agent_id):
+        handle = self.handle_of(agent_id)
+        if handle < 0:
+            return None
+        self._removed.add(handle)
+        return CompactAgent(self, handle)
+
+    # --- ID <-> handle ---
+
+    def id_of(self, handle):
+        return f"{self.prefix}{handle}"
+
+    def handle_of(self, agent_id):
+        """Handle of a live agent, or -1 (also used for external sources in trace records)."""
+        if not agent_id or not agent_id.startswith(self.prefix):
+            return -1
+        digits = agent_id[len(self.prefix):]
+        if not digits.isdigit():
+            return -1
+        handle = int(digits)
+        # Only the canonical spelling names a handle: "agent-007" is not agent-7
+        if digits != str(handle):
+            return -1
+        if handle >= self.count or handle in self._removed:
+            return -1
+        return handle
+
+    # --- HandleLedger hooks ---
+
+    @property
+    def _capacity(self):
+        return self.count
+
+    def _is_live(self, handle):
+        return handle not in self._removed
+
+# --- Main execution block: a cascade through a billion-agent address space ---
+
+if __name__ == "__main__":
+    import sys
+    import resource
+
+    print("------ Project Chrysalis: Lazy Ledger Test ------")
+    count = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000_000
+    random.seed(7)
+    ledger = LazyLedger(count, seed=42)
+    untouched = ledger.agents[ledger.id_of(count - 1)].internal_state
+
+    ledger.engine.submit(ledger.id_of(0), "EXTERNAL", 0.5, 100_000)
+    ledger.engine.run_until_quiescent()
+    ledger.engine.report()
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"[SYS] {ledger.materialized:,} of {ledger.count:,} agents materialized. Peak RSS: {rss_mb:.0f} MB.")
+
+    # Same seed, same RNG stream: the same network and the same cascade
+    random.seed(7)
+    replay = LazyLedger(count, seed=42)
+    assert replay.agents[replay.id_of(count - 1)].internal_state == untouched
+    replay.engine.submit(replay.id_of(0), "EXTERNAL", 0.5, 100_000)
+    replay.engine.run_until_quiescent()
+    assert replay._rows == ledger._rows and replay._state == ledger._state
+    print("[SYS] Replay with the same seed reproduced every materialized state.")
+    print("------ SIMULATION COMPLETE ------")
@@ -2,6 +2,9 @@ import uuid
 import time
 import random
 
+from pulse_engine import PulseEngine
+from tracing import TRACE, TRACE_PULSE, EV_REGISTER, EV_RECEIVE, EV_EMIT, EV_EXPIRE, EV_NO_PEER, EV_BATCH
+
 # --- AGENT DEFINITION (v1.2 with TTL logic) ---
 
 class C_Agent:
@@ -9,28 +12,62 @@ class C_Agent:
     Chrysalis Agent v1.2
     UPGRADED with a Time-To-Live (TTL) mechanism to prevent infinite loops.
     """
+    # No per-instance __dict__: keeps each agent small in large ledgers
+    __slots__ = ("ledger", "id", "internal_state", "creation_time", "handle")
+
     def __init__(self, ledger, agent_id=None):
         self.ledger = ledger
         self.id = agent_id if agent_id else str(uuid.uuid4())
         self.internal_state = random.uniform(0.0, 1.0)
         self.creation_time = time.time()
+        self.handle = None  # Assigned by the ledger; identifies the agent in trace records
         self.ledger.register(self)
-        print(f"[+] AGENT CREATED & REGISTERED. ID: {self.id}. Initial State: {self.internal_state:.4f}")
 
     # MODIFICATION: receive_pulse now accepts a ttl
     def receive_pulse(self, source_agent_id, pulse_payload, ttl):
         """
         Receives a SynapticPulse. Now checks TTL before processing.
         """
-        print(f"[->] PULSE RECEIVED by Agent {self.id} from {source_agent_id}. Payload: {pulse_payload:.4f}. [TTL={ttl}]")
-        
+        if TRACE.pulse:
+            TRACE.record(EV_RECEIVE, self.ledger.handle_of(source_agent_id), self.handle, pulse_payload, ttl)
+
         # TERMINATION CONDITION: If TTL has expired, the pulse dies.
         if ttl <= 0:
-            print(f"[!] TTL expired at Agent {self.id}. Pulse terminated.\n")
+            if TRACE.pulse:
+                TRACE.record(EV_EXPIRE, -1, self.handle, pulse_payload, ttl)
             return
 
         self._process(stimulus=pulse_payload, ttl=ttl)
 
+    # NEW: tick mode delivers every pulse for this agent at once
+    def receive_pulse_batch(self, pulses):
+        """
+        Receives all (source_agent_id, pulse_payload, ttl) pulses addressed to this agent in one tick.
+        Expired pulses die; the rest are coalesced into one update and one emitted pulse.
+        """
+        stimuli = [pulse_payload for _, pulse_payload, ttl in pulses if ttl > 0]
+        if TRACE.pulse:
+            # A batch record carries the number of live pulses in the ttl field
+            TRACE.record(EV_BATCH, -1, self.handle, self.internal_state, len(stimuli))
+        if not stimuli:
+            if TRACE.pulse:
+                TRACE.record(EV_EXPIRE, -1, self.handle, 0.0, 0)
+            return
+        self._process_coalesced(stimuli, ttl=max(ttl for _, _, ttl in pulses))
+
+    def _process_coalesced(self, stimuli, ttl):
+        """
+        Closed form of k successive updates:
+        0.9^k * s + 0.1 * sum(0.9^(k-1-i) * x_i)
+        """
+        decay = 1.0
+        weighted = 0.0
+        for stimulus in reversed(stimuli):
+            weighted += decay * stimulus
+            decay *= 0.9
+        self.internal_state = (self.internal_state * decay) + (weighted * 0.1)
+        self._emit_pulse(ttl=ttl)
+
     # MODIFICATION: _process now passes the TTL along
     def _process(self, stimulus, ttl):
         """Internal cognitive process, same as before."""
@@ -43,29 +80,98 @@ class C_Agent:
         Selects a random target and sends it a new pulse with a decremented TTL.
         """
         response_payload = self.internal_state * 1.1 
+        if self.ledger.fanout > 1:
+            self._emit_fanout(response_payload, ttl)
+            return
         target_agent = self.ledger.get_random_agent(exclude_id=self.id)
         
         if target_agent:
-            print(f"[<-] PULSE EMITTED by Agent {self.id} to {target_agent.id}. Payload: {response_payload:.4f}. [New TTL={ttl-1}]")
-            # Pass the decremented TTL to the next agent in the chain
-            target_agent.receive_pulse(self.id, response_payload, ttl - 1)
-        else:
-            print(f"[!] No other agents in network for Agent {self.id} to pulse.\n")
+            if TRACE.pulse:
+                TRACE.record(EV_EMIT, self.handle, target_agent.handle, response_payload, ttl - 1)
+            # Queue the decremented TTL pulse on the engine instead of recursing into the target
+            self.ledger.engine.submit(target_agent.id, self.id, response_payload, ttl - 1)
+        elif TRACE.pulse:
+            TRACE.record(EV_NO_PEER, self.handle, -1, response_payload, ttl - 1)
+
+    def _emit_fanout(self, response_payload, ttl):
+        """Sends the same pulse to `ledger.fanout` distinct random peers."""
+        targets = self.ledger.sample(self.ledger.fanout, exclude_id=self.id)
+        for target_agent in targets:
+            if TRACE.pulse:
+                TRACE.record(EV_EMIT, self.handle, target_agent.handle, response_payload, ttl - 1)
+            self.ledger.engine.submit(target_agent.id, self.id, response_payload, ttl - 1)
+        if not targets and TRACE.pulse:
+            TRACE.record(EV_NO_PEER, self.handle, -1, response_payload, ttl - 1)
 
-# --- LEDGER DEFINITION (Unchanged) ---
+# --- LEDGER DEFINITION (now owns the pulse engine) ---
 
 class LocalLedger:
-    def __init__(self):
+    def __init__(self, max_in_flight=None, fanout=1):
         self.agents = {}
+        self.fanout = fanout  # Peers each processed pulse is forwarded to
+        self._agent_list = []  # Index-aligned with _slots for O(1) random selection
+        self._slots = {}
+        self._next_handle = 0
+        self.engine = PulseEngine(self, max_in_flight=max_in_flight)
         print("[SYS] Local Synaptic Ledger initialized.")
+
     def register(self, agent):
-        print(f"[SYS] Registering Agent {agent.id} in Ledger.")
+        if agent.handle is None:
+            agent.handle = self._next_handle
+            self._next_handle += 1
+        if TRACE.sys:
+            TRACE.name(agent.handle, agent.id)
+            TRACE.record(EV_REGISTER, -1, agent.handle, agent.internal_state)
+        slot = self._slots.get(agent.id)
+        if slot is None:
+            self._slots[agent.id] = len(self._agent_list)
+            self._agent_list.append(agent)
+        else:
+            self._agent_list[slot] = agent
         self.agents[agent.id] = agent
+
+    def handle_of(self, agent_id):
+        """Handle of a registered agent, or -1 for external sources. Used for trace records."""
+        agent = self.agents.get(agent_id)
+        return agent.handle if agent is not None else -1
+
+    def deregister(self, agent_id):
+        """Removes an agent in O(1) by moving the last agent into its slot."""
+        agent = self.agents.pop(agent_id, None)
+        if agent is None:
+            return None
+        slot = self._slots.pop(agent_id)
+        last = self._agent_list.pop()
+        if last is not agent:
+            self._agent_list[slot] = last
+            self._slots[last.id] = slot
+        return agent
+
     def get_random_agent(self, exclude_id=None):
-        available_agents = [agent for agent_id, agent in self.agents.items() if agent_id != exclude_id]
-        if not available_agents:
+        """O(1): draws from the N-1 other slots and steps over the sender's slot."""
+        count = len(self._agent_list)
+        skip = self._slots.get(exclude_id)
+        if skip is not None:
+            count -= 1
+        if count <= 0:
             return None
-        return random.choice(available_agents)
+        index = random.randrange(count)
+        if skip is not None and index >= skip:
+            index += 1
+        return self._agent_list[index]
+
+    def sample(self, k, exclude_id=None):
+        """Returns up to k distinct agents, excluding the sender, for fan-out."""
+        count = len(self._agent_list)
+        skip = self._slots.get(exclude_id)
+        if skip is not None:
+            count -= 1
+        if count <= 0 or k <= 0:
+            return []
+        picks = random.sample(range(count), min(k, count))
+        if skip is None:
+            return [self._agent_list[i] for i in picks]
+        return [self._agent_list[i + 1 if i >= skip else i] for i in picks]
 
 # --- Main execution block for network simulation ---
 
@@ -73,6 +179,10 @@ if __name__ == "__main__":
     print("------ Project Chrysalis: Network Test v1.1 (Debugged) ------")
     print("Objective: Demonstrate a CONTROLLED chain reaction using a TTL.\n")
 
+    # Echo the trace to the console so the cascade can be followed
+    TRACE.console = True
+    TRACE.set_level(TRACE_PULSE)
+
     master_ledger = LocalLedger()
     print("-" * 60)
 
@@ -83,7 +193,9 @@ if __name__ == "__main__":
     print("--- SIMULATING EXTERNAL STIMULUS to Agent alpha with TTL of 4 ---")
     initial_stimulus = random.uniform(0.0, 1.0)
     
-    # MODIFICATION: The first pulse is sent with an initial TTL of 4
-    agent_alpha.receive_pulse(source_agent_id="EXTERNAL", pulse_payload=initial_stimulus, ttl=4)
+    # MODIFICATION: The first pulse is sent with an initial TTL of 4 and the engine drains the cascade
+    master_ledger.engine.submit("alpha", "EXTERNAL", initial_stimulus, 4)
+    master_ledger.engine.run_until_quiescent()
+    master_ledger.engine.report()
 
     print("------ SIMULATION COMPLETE: Controlled Termination ------")
\ No newline at end of file
@@ -2,6 +2,9 @@ import uuid
 import time
 import random
 
+from pulse_engine import PulseEngine, METRICS
+from tracing import TRACE, TRACE_PULSE, EV_REGISTER, EV_RECEIVE, EV_EMIT, EV_EXPIRE, EV_HALTED, EV_VETO, EV_NO_PEER, EV_BATCH
+
 # --- AGENT DEFINITION (v1.3 with Veto Protocol) ---
 
 class C_Agent:
@@ -9,75 +12,326 @@ class C_Agent:
     Chrysalis Agent v1.3
     UPGRADED with the Asimovian Veto Protocol.
     Agents now have a 'halted' state and will obey a broadcast veto command.
+    An optional group tag lets the Nexus veto part of the network at once.
     """
-    def __init__(self, ledger, agent_id=None):
+    # No per-instance __dict__: keeps each agent small in large ledgers
+    __slots__ = ("ledger", "id", "internal_state", "halted", "group", "handle")
+
+    def __init__(self, ledger, agent_id=None, group=None):
         self.ledger = ledger
         self.id = agent_id if agent_id else str(uuid.uuid4())
         self.internal_state = random.uniform(0.0, 1.0)
         self.halted = False  # NEW: Agent starts in an active state
+        self.group = group
+        self.handle = None  # Assigned by the ledger; indexes the scoped-veto bitmap
         self.ledger.register(self)
-        print(f"[+] AGENT CREATED & REGISTERED. ID: {self.id}. State: {self.internal_state:.4f}")
 
     def receive_pulse(self, source_agent_id, pulse_payload, ttl):
         """Receives a pulse. Now checks if the agent is halted."""
-        # VETO CHECK: If halted, the agent refuses to process the pulse.
-        if self.halted:
-            print(f"[!] Agent {self.id} is HALTED. Pulse from {source_agent_id} ignored.")
+        # VETO CHECK: If halted, or vetoed at ledger level, the agent refuses to process the pulse.
+        if self.halted or (self.ledger.vetoes_active and self.ledger.is_vetoed(self)):
+            if TRACE.pulse:
+                TRACE.record(EV_HALTED, self.ledger.handle_of(source_agent_id), self.handle, pulse_payload, ttl)
             return
 
-        print(f"[->] PULSE RECEIVED by {self.id} from {source_agent_id}. Payload: {pulse_payload:.4f}. [TTL={ttl}]")
+        if TRACE.pulse:
+            TRACE.record(EV_RECEIVE, self.ledger.handle_of(source_agent_id), self.handle, pulse_payload, ttl)
         if ttl <= 0:
-            print(f"[!] TTL expired at Agent {self.id}. Pulse terminated.\n")
+            if TRACE.pulse:
+                TRACE.record(EV_EXPIRE, -1, self.handle, pulse_payload, ttl)
+            return
+
+        if METRICS.timing:
+            METRICS.timed("process", self._process, pulse_payload, ttl)
+        else:
+            self._process(stimulus=pulse_payload, ttl=ttl)
+
+    # NEW: tick mode delivers every pulse for this agent at once
+    def receive_pulse_batch(self, pulses):
+        """
+        Receives all (source_agent_id, pulse_payload, ttl) pulses addressed to this agent in one tick.
+        Expired pulses die; the rest are coalesced into one update and one emitted pulse.
+        """
+        if self.halted or (self.ledger.vetoes_active and self.ledger.is_vetoed(self)):
+            if TRACE.pulse:
+                TRACE.record(EV_HALTED, -1, self.handle, 0.0, len(pulses))
             return
 
-        self._process(stimulus=pulse_payload, ttl=ttl)
+        stimuli = [pulse_payload for _, pulse_payload, ttl in pulses if ttl > 0]
+        if TRACE.pulse:
+            # A batch record carries the number of live pulses in the ttl field
+            TRACE.record(EV_BATCH, -1, self.handle, self.internal_state, len(stimuli))
+        if not stimuli:
+            if TRACE.pulse:
+                TRACE.record(EV_EXPIRE, -1, self.handle, 0.0, 0)
+            return
+        ttl = max(ttl for _, _, ttl in pulses)
+        if METRICS.timing:
+            METRICS.timed("process_coalesced", self._process_coalesced, stimuli, ttl)
+        else:
+            self._process_coalesced(stimuli, ttl=ttl)
+
+    def _process_coalesced(self, stimuli, ttl):
+        """
+        Closed form of k successive updates:
+        0.9^k * s + 0.1 * sum(0.9^(k-1-i) * x_i)
+        """
+        decay = 1.0
+        weighted = 0.0
+        for stimulus in reversed(stimuli):
+            weighted += decay * stimulus
+            decay *= 0.9
+        self.internal_state = (self.internal_state * decay) + (weighted * 0.1)
+        if self.ledger.store is not None:
+            self.ledger.store.update(self.id, {'internal_state': self.internal_state})
+        if METRICS.timing:
+            METRICS.timed("emit_pulse", self._emit_pulse, ttl)
+        else:
+            self._emit_pulse(ttl=ttl)
 
     def _process(self, stimulus, ttl):
         """Process is unchanged."""
         self.internal_state = (self.internal_state * 0.9) + (stimulus * 0.1)
-        self._emit_pulse(ttl=ttl)
+        if self.ledger.store is not None:
+            self.ledger.store.update(self.id, {'internal_state': self.internal_state})
+        if METRICS.timing:
+            METRICS.timed("emit_pulse", self._emit_pulse, ttl)
+        else:
+            self._emit_pulse(ttl=ttl)
 
     def _emit_pulse(self, ttl):
         """Emit is unchanged, but will not be called if halted."""
         response_payload = self.internal_state * 1.1 
-        target_agent = self.ledger.get_random_agent(exclude_id=self.id)
+        rng = self.ledger.rng_for(self)
+        if self.ledger.fanout > 1 or self.ledger.topology is not None:
+            self._emit_fanout(response_payload, ttl, rng)
+            return
+        if METRICS.timing:
+            target_agent = METRICS.timed("get_random_agent", self.ledger.get_random_agent, self.id, rng)
+        else:
+            target_agent = self.ledger.get_random_agent(exclude_id=self.id, rng=rng)
         if target_agent:
-            print(f"[<-] PULSE EMITTED by {self.id} to {target_agent.id}. Payload: {response_payload:.4f}. [New TTL={ttl-1}]")
-            target_agent.receive_pulse(self.id, response_payload, ttl - 1)
+            if TRACE.pulse:
+                TRACE.record(EV_EMIT, self.handle, target_agent.handle, response_payload, ttl - 1)
+            self.ledger.engine.submit(target_agent.id, self.id, response_payload, ttl - 1)
+        elif TRACE.pulse:
+            TRACE.record(EV_NO_PEER, self.handle, -1, response_payload, ttl - 1)
+
+    def _emit_fanout(self, response_payload, ttl, rng=random):
+        """
+        Sends the same pulse to `ledger.fanout` distinct peers: neighbours in the
+        ledger's topology if it has one, otherwise random agents.
+        """
+        if self.ledger.topology is not None:
+            select, args = self.ledger.neighbors_of, (self, self.ledger.fanout, rng)
         else:
-            print(f"[!] No other agents for Agent {self.id} to pulse.\n")
-            
+            select, args = self.ledger.sample, (self.ledger.fanout, self.id, rng)
+        targets = METRICS.timed("select_peers", select, *args) if METRICS.timing else select(*args)
+        for target_agent in targets:
+            if TRACE.pulse:
+                TRACE.record(EV_EMIT, self.handle, target_agent.handle, response_payload, ttl - 1)
+            self.ledger.engine.submit(target_agent.id, self.id, response_payload, ttl - 1)
+        if not targets and TRACE.pulse:
+            TRACE.record(EV_NO_PEER, self.handle, -1, response_payload, ttl - 1)
+
     def issue_veto_command(self):
-        """NEW: The function that halts the agent."""
-        print(f"[!!!] VETO COMMAND RECEIVED by Agent {self.id}. Halting all operations.")
+        """NEW: The function that halts this one agent."""
+        if TRACE.sys:
+            TRACE.record(EV_VETO, -1, self.handle)
         self.halted = True
 
 
 # --- LEDGER DEFINITION (with Veto Broadcast) ---
 
 class LocalLedger:
-    """Ledger now includes a method to broadcast a command to all agents."""
-    def __init__(self):
+    """
+    Ledger now includes a method to broadcast a command to all agents.
+    Vetoes are held here rather than written into every agent: a network-wide halt flag,
+    a set of vetoed groups, and a bitmap of vetoed agent handles. Agents consult them in
+    receive_pulse, so halting or resuming costs O(1). A network-wide veto also cancels
+    the queued pulses, so none sent before it can be delivered after a resume.
+    An optional `store` (a ledger backend from agents/ledger_backends.py, usually behind a
+    WriteBehindCache) persists each agent's record and state changes.
+    An optional `topology` (topology.Topology over agent handles) makes pulses travel
+    along its edges instead of to uniformly random agents.
+    With `streams` (rng_streams.RngStreams), each agent's initial state and peer choices
+    come from its logical shard's stream instead of the global `random` module.
+    """
+    def __init__(self, max_in_flight=None, fanout=1, store=None, topology=None, streams=None):
         self.agents = {}
+        self.store = store
+        self.topology = topology
+        self.streams = streams
+        self._by_handle = []  # Agent per handle (None once deregistered), for topology routing
+        self.fanout = fanout  # Peers each processed pulse is forwarded to
+        self._agent_list = []  # Index-aligned with _slots for O(1) random selection
+        self._slots = {}
+        self._next_handle = 0
+        # Veto state
+        self.network_halted = False
+        self.vetoes_active = False
+        self._vetoed_groups = set()
+        self._veto_bits = bytearray()
+        self._vetoed_handles = 0
+        self.engine = PulseEngine(self, max_in_flight=max_in_flight)
         print("[SYS] Local Synaptic Ledger initialized.")
 
     def register(self, agent):
-        print(f"[SYS] Registering Agent {agent.id}.")
+        if agent.handle is None:
+            agent.handle = self._next_handle
+            self._next_handle += 1
+            self._by_handle.append(None)
+            if (agent.handle >> 3) >= len(self._veto_bits):
+                self._veto_bits.append(0)
+            if self.streams is not None:
+                agent.internal_state = self.rng_for(agent).random()
+        self._by_handle[agent.handle] = agent
+        if TRACE.sys:
+            TRACE.name(agent.handle, agent.id)
+            TRACE.record(EV_REGISTER, -1, agent.handle, agent.internal_state)
+        slot = self._slots.get(agent.id)
+        if slot is None:
+            self._slots[agent.id] = len(self._agent_list)
+            self._agent_list.append(agent)
+        else:
+            self._agent_list[slot] = agent
         self.agents[agent.id] = agent
+        if self.store is not None:
+            self.store.set(agent.id, {'id': agent.id, 'internal_state': agent.internal_state, 'group': agent.group})
 
-    def get_random_agent(self, exclude_id=None):
-        available_agents = [agent for agent_id, agent in self.agents.items() if agent_id != exclude_id]
-        if not available_agents:
+    def deregister(self, agent_id):
+        """Removes an agent in O(1) by moving the last agent into its slot."""
+        agent = self.agents.pop(agent_id, None)
+        if agent is None:
             return None
-        return random.choice(available_agents)
+        slot = self._slots.pop(agent_id)
+        self._by_handle[agent.handle] = None
+        last = self._agent_list.pop()
+        if last is not agent:
+            self._agent_list[slot] = last
+            self._slots[last.id] = slot
+        if self.store is not None:
+            self.store.delete(agent_id)
+        return agent
+
+    def rng_for(self, agent):
+        """Random source for the agent's draws: its logical shard's stream, or the random module."""
+        return random if self.streams is None else self.streams.stream(agent.handle)
+
+    def get_random_agent(self, exclude_id=None, rng=random):
+        """O(1): draws from the N-1 other slots and steps over the sender's slot."""
+        count = len(self._agent_list)
+        skip = self._slots.get(exclude_id)
+        if skip is not None:
+            count -= 1
+        if count <= 0:
+            return None
+        index = rng.randrange(count)
+        if skip is not None and index >= skip:
+            index += 1
+        return self._agent_list[index]
+
+    def sample(self, k, exclude_id=None, rng=random):
+        """Returns up to k distinct agents, excluding the sender, for fan-out."""
+        count = len(self._agent_list)
+        skip = self._slots.get(exclude_id)
+        if skip is not None:
+            count -= 1
+        if count <= 0 or k <= 0:
+            return []
+        picks = rng.sample(range(count), min(k, count))
+        if skip is None:
+            return [self._agent_list[i] for i in picks]
+        return [self._agent_list[i + 1 if i >= skip else i] for i in picks]
+
+    def neighbors_of(self, agent, k=1, rng=random):
+        """Up to k distinct live topology neighbours of the agent."""
+        by_handle = self._by_handle
+        if k == 1:
+            nodes = (self.topology.neighbor(agent.handle, rng),)
+        else:
+            nodes = self.topology.neighbors(agent.handle, k, rng)
+        return [by_handle[node] for node in nodes if 0 <= node < len(by_handle) and by_handle[node] is not None]
+
+    def handle_of(self, agent_id):
+        """Handle of a registered agent, or -1 for external sources. Used for trace records."""
+        agent = self.agents.get(agent_id)
+        return agent.handle if agent is not None else -1
+
+    def is_vetoed(self, agent):
+        """True if a network-wide, group or handle-range veto covers this agent."""
+        if self.network_halted:
+            return True
+        if agent.group is not None and agent.group in self._vetoed_groups:
+            return True
+        handle = agent.handle
+        return bool(self._veto_bits[handle >> 3] & (1 << (handle & 7)))
+
+    def _refresh_vetoes(self):
+        self.vetoes_active = self.network_halted or bool(self._vetoed_groups) or self._vetoed_handles > 0
 
     def broadcast_veto(self):
-        """NEW: The Genesis Nexus command to halt the entire network."""
+        """NEW: The Genesis Nexus command to halt the entire network. O(1) in the number of agents."""
         print("\n" + "="*20 + " NEXUS VETO BROADCAST " + "="*20)
-        for agent_id, agent in self.agents.items():
-            agent.issue_veto_command()
+        self.network_halted = True
+        # Pulses already queued were sent before the veto and must not outlive it
+        self.engine.cancel_in_flight()
+        self._refresh_vetoes()
         print("="*22 + " BROADCAST SENT " + "="*22 + "\n")
 
+    def resume(self):
+        """Lifts the network-wide veto. Group and range vetoes stay in force."""
+        print("[SYS] Nexus lifted the network-wide veto.")
+        self.network_halted = False
+        self._refresh_vetoes()
+
+    def veto_group(self, group):
+        print(f"[SYS] Veto issued to group '{group}'.")
+        self._vetoed_groups.add(group)
+        self._refresh_vetoes()
+
+    def resume_group(self, group):
+        print(f"[SYS] Veto lifted for group '{group}'.")
+        self._vetoed_groups.discard(group)
+        self._refresh_vetoes()
+
+    def veto_range(self, start, stop):
+        """Vetoes agents with handles in [start, stop), i.e. in registration order."""
+        print(f"[SYS] Veto issued to agent handles {start}..{stop - 1}.")
+        self._set_handle_range(start, stop, True)
+
+    def resume_range(self, start, stop):
+        print(f"[SYS] Veto lifted for agent handles {start}..{stop - 1}.")
+        self._set_handle_range(start, stop, False)
+
+    def _set_handle_range(self, start, stop, vetoed):
+        stop = min(stop, self._next_handle)
+        bits = self._veto_bits
+        handle = max(start, 0)
+        while handle < stop:
+            byte, bit = handle >> 3, handle & 7
+            if bit == 0 and handle + 8 <= stop:
+                # Whole bytes at once for the aligned middle of the range
+                full = (stop - handle) >> 3
+                for i in range(byte, byte + full):
+                    self._vetoed_handles += (8 if vetoed else 0) - bin(bits[i]).count("1")
+                bits[byte:byte + full] = (b"\xff" if vetoed else b"\x00") * full
+                handle += full << 3
+                continue
+            mask = 1 << bit
+            if vetoed and not bits[byte] & mask:
+                bits[byte] |= mask
+                self._vetoed_handles += 1
+            elif not vetoed and bits[byte] & mask:
+                bits[byte] &= ~mask
+                self._vetoed_handles -= 1
+            handle += 1
+        self._refresh_vetoes()
+
+
+# NEW: setup-time stage. Pulse stages are timed inline on sampled pulses.
+METRICS.hot_path(LocalLedger, "register")
+
 
 # --- Main execution block for Veto simulation ---
 
@@ -85,6 +339,10 @@ if __name__ == "__main__":
     print("------ Project Chrysalis: Asimovian Veto Test ------")
     print("Objective: Demonstrate that the Nexus can halt all agent activity.\n")
 
+    # Echo the trace to the console so the cascade can be followed
+    TRACE.console = True
+    TRACE.set_level(TRACE_PULSE)
+
     master_ledger = LocalLedger()
     print("-" * 50)
     
@@ -96,7 +354,8 @@ if __name__ == "__main__":
 
     # Start a cascade of pulses
     print("--- STEP 1: Starting a normal pulse cascade with TTL=5 ---\n")
-    master_ledger.agents["alpha"].receive_pulse("EXTERNAL", 0.5, 5)
+    master_ledger.engine.submit("alpha", "EXTERNAL", 0.5, 5)
+    master_ledger.engine.run_until_quiescent()
 
     # After the cascade, issue the Veto
     print("--- STEP 2: Nexus issuing VETO command to all agents ---")
@@ -104,6 +363,14 @@ if __name__ == "__main__":
 
     # Attempt to start a new cascade
     print("--- STEP 3: Attempting to start a new pulse cascade ---")
-    master_ledger.agents["beta"].receive_pulse("EXTERNAL_2", 0.9, 2)
+    master_ledger.engine.submit("beta", "EXTERNAL_2", 0.9, 2)
+    master_ledger.engine.run_until_quiescent()
+
+    # Lift the veto and confirm the network answers again
+    print("--- STEP 4: Nexus lifting the VETO ---")
+    master_ledger.resume()
+    master_ledger.engine.submit("gamma", "EXTERNAL_3", 0.7, 2)
+    master_ledger.engine.run_until_quiescent()
+    master_ledger.engine.report()
 
     print("------ SIMULATION COMPLETE: Veto authority confirmed. ------")
\ No newline at end of file
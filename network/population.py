@@ -0,0 +1,212 @@
+import uuid
+import time
+
+import numpy as np
+
+# --- POPULATION DEFINITION (structure-of-arrays) ---
+
+class AgentPopulation:
+    """
+    Vectorized population mode for C-Agents.
+    Every agent is a slot index. Its state, halted flag and creation time live in
+    contiguous NumPy arrays, so a whole tick of pulses is applied with array operations
+    instead of one interpreted _process call per pulse.
+    With a `topology` over slots, each hit slot emits to `fanout` of its neighbours
+    instead of one uniformly random slot.
+    """
+    def __init__(self, capacity=1024, rng=None, topology=None, fanout=1):
+        self.size = 0
+        self.state = np.empty(capacity, dtype=np.float64)
+        self.halted = np.zeros(capacity, dtype=np.bool_)
+        self.creation_time = np.empty(capacity, dtype=np.float64)
+        self.ids = []
+        self.slots = {}
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.topology = topology
+        self.fanout = fanout
+        self.processed = 0
+        # Pulses injected from outside, applied on the next tick
+        self._pending = ([], [], [])
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        capacity = len(self.state)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("state", "halted", "creation_time"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def spawn(self, count, ids=None):
+        """Creates `count` agents with random initial state. Returns their slots as a range."""
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in range(count)]
+        elif len(ids) != count:
+            raise ValueError(f"spawn({count}) was given {len(ids)} IDs.")
+        self._reserve(count)
+        start = self.size
+        stop = start + count
+        self.state[start:stop] = self.rng.uniform(0.0, 1.0, count)
+        self.halted[start:stop] = False
+        self.creation_time[start:stop] = time.time()
+        for offset, agent_id in enumerate(ids):
+            self.slots[agent_id] = start + offset
+        self.ids.extend(ids)
+        self.size = stop
+        return range(start, stop)
+
+    def view(self, agent_id):
+        """Returns a PopulationAgent view over the agent's slot."""
+        return PopulationAgent(self, self.slots[agent_id])
+
+    def inject(self, slot, payload, ttl):
+        """Queues an external pulse for the next tick."""
+        targets, payloads, ttls = self._pending
+        targets.append(slot)
+        payloads.append(payload)
+        ttls.append(ttl)
+
+    def tick(self, targets, payloads, ttls):
+        """
+        Applies one tick of pulses and returns the pulses it emits as
+        (targets, payloads, ttls) arrays.
+
+        Pulses to the same slot are applied in the order given, using the closed form
+        of k successive 0.9/0.1 updates, so the resulting state matches sequential
+        processing. Each live slot then emits one pulse carrying state * 1.1 with the
+        highest incoming TTL minus one.
+        """
+        targets = np.asarray(targets, dtype=np.intp)
+        payloads = np.asarray(payloads, dtype=np.float64)
+        ttls = np.asarray(ttls, dtype=np.int64)
+
+        # Halted agents ignore the pulse; expired pulses die without being processed.
+        live = ~self.halted[targets] & (ttls > 0)
+        targets, payloads, ttls = targets[live], payloads[live], ttls[live]
+        self.processed += len(targets)
+        if len(targets) == 0:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, np.empty(0, dtype=np.float64), np.empty(0, dtype=np.int64)
+
+        # Gather: group the pulses by target while keeping arrival order inside a group.
+        order = np.argsort(targets, kind="stable")
+        targets, payloads, ttls = targets[order], payloads[order], ttls[order]
+        hit, first, counts = np.unique(targets, return_index=True, return_counts=True)
+        rank = np.arange(len(targets)) - np.repeat(first, counts)
+        remaining = np.repeat(counts, counts) - 1 - rank
+
+        # Scatter: s' = 0.9^k * s + 0.1 * sum(0.9^(k-1-i) * x_i)
+        self.state[hit] *= 0.9 ** counts
+        np.add.at(self.state, targets, 0.1 * payloads * 0.9 ** remaining)
+
+        out_ttls = np.maximum.reduceat(ttls, first) - 1
+        out_payloads = self.state[hit] * 1.1
+        if self.topology is not None:
+            # Emit along the topology: `fanout` sampled neighbours per hit slot.
+            position, out_targets = self.topology.sample_neighbors(hit, self.fanout, self.rng)
+            keep = out_targets < self.size
+            position, out_targets = position[keep], out_targets[keep].astype(np.intp)
+            return out_targets, out_payloads[position], out_ttls[position]
+
+        # Emit one pulse per hit slot to a uniformly random other slot.
+        if self.size < 2:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, np.empty(0, dtype=np.float64), np.empty(0, dtype=np.int64)
+        out_targets = self.rng.integers(0, self.size - 1, len(hit))
+        out_targets += out_targets >= hit
+        return out_targets, out_payloads, out_ttls
+
+    def run(self, max_ticks=None):
+        """
+        Runs ticks from the injected pulses until no pulses remain or `max_ticks`
+        is reached. Returns the number of pulses processed.
+        """
+        targets, payloads, ttls = self._pending
+        self._pending = ([], [], [])
+        before = self.processed
+        ticks = 0
+        while len(targets) and (max_ticks is None or ticks < max_ticks):
+            targets, payloads, ttls = self.tick(targets, payloads, ttls)
+            ticks += 1
+        # Anything still in flight waits for the next run.
+        self._pending = (list(targets), list(payloads), list(ttls))
+        return self.processed - before
+
+
+# --- AGENT VIEW ---
+
+class PopulationAgent:
+    """
+    A thin C_Agent-compatible view over one population slot.
+    It holds no state of its own; reads and writes go straight to the arrays.
+    This is a separate class rather than C_Agent itself: C_Agent processes a pulse
+    the moment it arrives, while a population applies pulses a tick at a time, so the
+    view queues what it receives for the next tick instead of processing it.
+    """
+    __slots__ = ("population", "slot")
+
+    group = None
+
+    def __init__(self, population, slot):
+        self.population = population
+        self.slot = slot
+
+    @property
+    def id(self):
+        return self.population.ids[self.slot]
+
+    @property
+    def internal_state(self):
+        return float(self.population.state[self.slot])
+
+    @internal_state.setter
+    def internal_state(self, value):
+        self.population.state[self.slot] = value
+
+    @property
+    def halted(self):
+        return bool(self.population.halted[self.slot])
+
+    @halted.setter
+    def halted(self, value):
+        self.population.halted[self.slot] = bool(value)
+
+    @property
+    def creation_time(self):
+        return float(self.population.creation_time[self.slot])
+
+    def receive_pulse(self, source_agent_id, pulse_payload, ttl):
+        """Queues the pulse for the population's next tick."""
+        self.population.inject(self.slot, pulse_payload, ttl)
+
+    def receive_pulse_batch(self, pulses):
+        """Queues (source_id, payload, ttl) pulses for the next tick, in order."""
+        for _, pulse_payload, ttl in pulses:
+            self.population.inject(self.slot, pulse_payload, ttl)
+
+    def issue_veto_command(self):
+        self.population.halted[self.slot] = True
+
+
+# --- Main execution block for a population benchmark ---
+
+if __name__ == "__main__":
+    print("------ Project Chrysalis: Vectorized Population Test ------")
+    population = AgentPopulation(capacity=1_000_000, rng=np.random.default_rng(7))
+    population.spawn(1_000_000, ids=[f"agent-{i}" for i in range(1_000_000)])
+    print(f"[SYS] Population of {population.size} agents spawned.")
+
+    # Seed 100k concurrent cascades with TTL 20
+    seeds = population.rng.integers(0, population.size, 100_000)
+    for slot in seeds:
+        population.inject(int(slot), 0.5, 20)
+
+    start = time.perf_counter()
+    processed = population.run()
+    elapsed = time.perf_counter() - start
+    print(f"[SYS] {processed} pulses processed in {elapsed:.3f}s ({processed / elapsed:,.0f} pulses/sec).")
+    print("------ SIMULATION COMPLETE ------")
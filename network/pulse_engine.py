@@ -0,0 +1,174 @@
+import os
+import time
+from collections import deque
+
+# NEW: stage metrics are shared with the cloud agents, so the registry lives in agents/.
+# Entry scripts that want them put agents/ on the path (the benchmarks do; for a demo,
+# PYTHONPATH=../agents). Otherwise the network runs with metrics off.
+try:
+    from metrics import METRICS
+except ImportError:
+    class _MetricsOff:
+        """Stand-in registry that is never enabled, so no call site times anything."""
+        enabled = False
+        timing = False
+        sample_every = 1
+
+        def hot_path(self, owner, *attributes, prefix=""):
+            pass
+
+    METRICS = _MetricsOff()
+    if os.environ.get("CHRYSALIS_METRICS"):
+        print("[SYS] CHRYSALIS_METRICS is set but agents/metrics.py is not importable: "
+              "add agents/ to PYTHONPATH. Metrics are off.")
+
+# --- PULSE ENGINE DEFINITION ---
+
+class PulseEngine:
+    """
+    Iterative scheduler for Synaptic Pulses.
+    Agents no longer call each other directly. Every emitted pulse is queued here as a
+    (target_id, source_id, payload, ttl) tuple and the engine drains the queue in a loop,
+    so a cascade of any TTL runs without growing the call stack.
+    """
+    def __init__(self, ledger, max_in_flight=None):
+        self.ledger = ledger
+        self.max_in_flight = max_in_flight  # None means the queue is unbounded
+        self.pending = deque()
+        self.processed = 0
+        self.dropped = 0      # Refused because the in-flight bound was reached
+        self.undelivered = 0  # Target was no longer in the ledger
+        self.elapsed = 0.0
+        self.ticks = 0
+        self.batches = 0      # Target groups delivered by run_tick
+        ledger.engine = self
+
+    def submit(self, target_id, source_id, payload, ttl):
+        """Queues a pulse. Returns False if the in-flight bound refused it."""
+        if self.max_in_flight is not None and len(self.pending) >= self.max_in_flight:
+            self.dropped += 1
+            return False
+        self.pending.append((target_id, source_id, payload, ttl))
+        return True
+
+    def cancel_in_flight(self):
+        """Discards every queued pulse, e.g. when a network-wide veto is broadcast."""
+        self.dropped += len(self.pending)
+        self.pending.clear()
+
+    def in_flight(self):
+        return len(self.pending)
+
+    def run(self, steps=None):
+        """
+        Delivers up to `steps` pulses, or every pulse until the network is quiescent
+        when `steps` is None. Returns the number of pulses delivered by this call.
+        """
+        pending = self.pending
+        agents = self.ledger.agents
+        # With metrics enabled, one pulse in sample_every runs with its stages timed. The
+        # position counts every pulse this engine delivered, so short calls sample fairly.
+        sampled = METRICS.enabled
+        mask = METRICS.sample_every - 1
+        position = self.processed
+        count = 0
+        start = time.perf_counter()
+        while pending and (steps is None or count < steps):
+            target_id, source_id, payload, ttl = pending.popleft()
+            target = agents.get(target_id)
+            if target is None:
+                self.undelivered += 1
+                continue
+            if sampled and not (position + count) & mask:
+                METRICS.timing = True
+                try:
+                    METRICS.timed("receive_pulse", target.receive_pulse, source_id, payload, ttl)
+                finally:
+                    METRICS.settle()
+            else:
+                target.receive_pulse(source_id, payload, ttl)
+            count += 1
+        self.elapsed += time.perf_counter() - start
+        self.processed += count
+        return count
+
+    def run_until_quiescent(self):
+        """Drains the queue completely."""
+        return self.run()
+
+    def run_tick(self, exact=False, order=None):
+        """
+        Synchronous mode: delivers every pulse that was pending when the tick started,
+        grouped by target. Pulses emitted during the tick wait for the next one.
+
+        By default each target gets its whole group through receive_pulse_batch, which
+        applies one coalesced update and emits one pulse, so the cost is O(distinct targets).
+        With exact=True each pulse is still delivered on its own, in arrival order.
+        With an `order` function (agent ID -> sortable key), targets are served in key
+        order and each target's pulses are sorted by (source key, payload, ttl), so the
+        result does not depend on the order in which pulses arrived.
+        Returns the number of pulses delivered.
+        """
+        pending = self.pending
+        groups = {}
+        for _ in range(len(pending)):
+            target_id, source_id, payload, ttl = pending.popleft()
+            group = groups.get(target_id)
+            if group is None:
+                groups[target_id] = [(source_id, payload, ttl)]
+            else:
+                group.append((source_id, payload, ttl))
+
+        items = groups.items()
+        if order is not None:
+            items = sorted(items, key=lambda item: order(item[0]))
+            for _, group in items:
+                group.sort(key=lambda pulse: (order(pulse[0]), pulse[1], pulse[2]))
+
+        agents = self.ledger.agents
+        sampled = METRICS.enabled
+        mask = METRICS.sample_every - 1
+        count = 0
+        start = time.perf_counter()
+        # Groups are numbered across ticks, so one in sample_every is timed however small the ticks
+        for index, (target_id, group) in enumerate(items, self.batches):
+            target = agents.get(target_id)
+            if target is None:
+                self.undelivered += len(group)
+                continue
+            if exact:
+                for source_id, payload, ttl in group:
+                    target.receive_pulse(source_id, payload, ttl)
+            elif sampled and not index & mask:
+                METRICS.timing = True
+                try:
+                    METRICS.timed("receive_pulse_batch", target.receive_pulse_batch, group)
+                finally:
+                    METRICS.settle()
+            else:
+                target.receive_pulse_batch(group)
+            count += len(group)
+        self.elapsed += time.perf_counter() - start
+        self.processed += count
+        self.batches += len(items)
+        self.ticks += 1
+        return count
+
+    def run_ticks(self, max_ticks=None, exact=False, order=None):
+        """Runs ticks until the network is quiescent or `max_ticks` is reached."""
+        count = 0
+        ticks = 0
+        while self.pending and (max_ticks is None or ticks < max_ticks):
+            count += self.run_tick(exact=exact, order=order)
+            ticks += 1
+        return count
+
+    def pulses_per_second(self):
+        if self.elapsed <= 0.0:
+            return 0.0
+        return self.processed / self.elapsed
+
+    def report(self):
+        print(f"[SYS] Pulse engine delivered {self.processed} pulses in {self.elapsed:.4f}s "
+              f"({self.pulses_per_second():,.0f} pulses/sec). "
+              f"In flight: {len(self.pending)}, dropped: {self.dropped}, undelivered: {self.undelivered}.")
@@ -0,0 +1,80 @@
+import numpy as np
+
+# --- RNG STREAMS ---
+# Reproducible randomness for the network modules. One seed is split with
+# SeedSequence.spawn into independent Philox (counter-based) streams, one per logical
+# shard. An agent always draws from the stream of its logical shard (its global index
+# modulo the number of streams), so its draws do not depend on how many processes
+# host the network, as long as each process owns whole logical shards.
+
+
+class BlockStream:
+    """
+    The subset of the `random` module the ledgers use (random, uniform, randrange,
+    choice, sample), served from blocks of pre-generated doubles. One NumPy call fills
+    a block, so the per-draw cost is a list index instead of a generator call.
+    """
+    __slots__ = ("generator", "block_size", "_block", "_next")
+
+    def __init__(self, generator, block_size=4096):
+        self.generator = generator
+        self.block_size = block_size
+        self._block = []
+        self._next = 0
+
+    def random(self):
+        index = self._next
+        if index == len(self._block):
+            self._block = self.generator.random(self.block_size).tolist()
+            index = 0
+        self._next = index + 1
+        return self._block[index]
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+    def randrange(self, start, stop=None):
+        if stop is None:
+            start, stop = 0, start
+        span = stop - start
+        if span <= 0:
+            raise ValueError("empty range for randrange()")
+        offset = int(self.random() * span)
+        return start + (offset if offset < span else span - 1)  # Guards float rounding up to span
+
+    def choice(self, sequence):
+        return sequence[self.randrange(len(sequence))]
+
+    def sample(self, population, k):
+        """k distinct elements, drawn by rejection. Meant for small k (fan-out)."""
+        size = len(population)
+        if not 0 <= k <= size:
+            raise ValueError("Sample larger than population or is negative")
+        seen = set()
+        picked = []
+        while len(picked) < k:
+            index = self.randrange(size)
+            if index not in seen:
+                seen.add(index)
+                picked.append(population[index])
+        return picked
+
+
+class RngStreams:
+    """
+    `n_streams` independent streams spawned from one seed. stream(key) returns the
+    BlockStream of logical shard key % n_streams; generator(key) returns its NumPy
+    Generator for vectorized code.
+    """
+    def __init__(self, seed=None, n_streams=64, block_size=4096):
+        root = np.random.SeedSequence(seed)
+        self.seed = root.entropy
+        self.n_streams = n_streams
+        self.streams = [BlockStream(np.random.Generator(np.random.Philox(child)), block_size)
+                        for child in root.spawn(n_streams)]
+
+    def stream(self, key):
+        return self.streams[key % self.n_streams]
+
+    def generator(self, key=0):
+        return self.streams[key % self.n_streams].generator
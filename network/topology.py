@@ -0,0 +1,269 @@
+import random
+from array import array
+from bisect import bisect_right
+
+import numpy as np
+
+# --- TOPOLOGY DEFINITION (CSR adjacency) ---
+
+class Topology:
+    """
+    Directed connectivity between agent handles, stored as a CSR sparse adjacency:
+    the out-neighbours of node h are indices[indptr[h]:indptr[h + 1]], with optional
+    edge weights aligned to indices. Weights are routing preferences: a weighted node
+    picks a neighbour with probability proportional to the edge weight.
+
+    Ledgers route single pulses through neighbor()/neighbors(). Whole frontiers are
+    expanded with array operations through propagate(), which is what bfs() uses.
+    """
+    def __init__(self, indptr, indices, weights=None):
+        self.indptr = np.ascontiguousarray(indptr, dtype=np.int64)
+        self.n = len(self.indptr) - 1
+        index_type = np.int32 if self.n < 2**31 else np.int64
+        self.indices = np.ascontiguousarray(indices, dtype=index_type)
+        self.weights = None if weights is None else np.ascontiguousarray(weights, dtype=np.float64)
+        self.degree = np.diff(self.indptr)
+        self._cumulative = None  # Running sum of weights, for weighted picks
+        self._scalar = None      # array() copies for the per-pulse path
+
+    @property
+    def edges(self):
+        return len(self.indices)
+
+    # --- Construction ---
+
+    @classmethod
+    def from_edges(cls, n, sources, targets, weights=None, undirected=False):
+        """Builds the CSR arrays from edge lists. Self-loops and duplicate edges are dropped."""
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)
+        if undirected:
+            sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+            if weights is not None:
+                weights = np.concatenate([weights, weights])
+        keep = sources != targets
+        sources, targets = sources[keep], targets[keep]
+        # Sorting by (source, target) gives CSR order and exposes duplicates
+        keys, first = np.unique(sources * n + targets, return_index=True)
+        sources, targets = keys // n, keys % n
+        if weights is not None:
+            weights = weights[keep][first]
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+        return cls(indptr, targets, weights)
+
+    @classmethod
+    def random_graph(cls, n, degree, rng=None, weighted=False):
+        """Each node links to `degree` uniformly random other nodes (Erdos-Renyi style)."""
+        rng = rng if rng is not None else np.random.default_rng()
+        sources = np.repeat(np.arange(n, dtype=np.int64), degree)
+        targets = rng.integers(0, n - 1, len(sources))
+        targets += targets >= sources
+        weights = rng.random(len(sources)) if weighted else None
+        return cls.from_edges(n, sources, targets, weights)
+
+    @classmethod
+    def small_world(cls, n, k, p, rng=None):
+        """
+        Watts-Strogatz: a ring where each node links to its k nearest neighbours
+        (k/2 per side), with each edge rewired to a random node with probability p.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        half = max(1, k // 2)
+        sources = np.repeat(np.arange(n, dtype=np.int64), half)
+        targets = (sources + np.tile(np.arange(1, half + 1), n)) % n
+        rewire = rng.random(len(targets)) < p
+        targets[rewire] = rng.integers(0, n, int(rewire.sum()))
+        return cls.from_edges(n, sources, targets, undirected=True)
+
+    @classmethod
+    def scale_free(cls, n, m, rng=None):
+        """
+        Barabasi-Albert preferential attachment with m edges per new node, generated
+        without a per-node loop (Batagelj-Brandes): edge e of node e // m attaches to the
+        endpoint at a uniformly random earlier position of the endpoint list. Positions
+        holding a chosen endpoint are resolved by following earlier choices, which all
+        point strictly backwards, so a few vectorized passes settle every edge.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        count = n * m
+        edge = np.arange(count, dtype=np.int64)
+        choice = (rng.random(count) * (2 * edge + 1)).astype(np.int64)  # Uniform in [0, 2e]
+        position = choice.copy()
+        odd = position & 1 == 1
+        while odd.any():
+            position[odd] = choice[position[odd] >> 1]
+            odd = position & 1 == 1
+        # An even position 2e holds the node that created edge e
+        targets = (position >> 1) // m
+        return cls.from_edges(n, edge // m, targets, undirected=True)
+
+    @classmethod
+    def load(cls, path, n=None, undirected=False):
+        """
+        Loads a graph saved with save() (.npz), or a text edge list with one
+        "source target [weight]" line per edge.
+        """
+        if str(path).endswith(".npz"):
+            with np.load(path) as data:
+                weights = data["weights"] if "weights" in data.files else None
+                return cls(data["indptr"], data["indices"], weights)
+        edges = np.loadtxt(path, ndmin=2)
+        sources, targets = edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64)
+        weights = edges[:, 2] if edges.shape[1] > 2 else None
+        if n is None:
+            n = int(max(sources.max(), targets.max())) + 1 if len(edges) else 0
+        return cls.from_edges(n, sources, targets, weights, undirected=undirected)
+
+    def save(self, path):
+        arrays = {"indptr": self.indptr, "indices": self.indices}
+        if self.weights is not None:
+            arrays["weights"] = self.weights
+        np.savez(path, **arrays)
+
+    # --- Per-pulse routing ---
+
+    def _arrays(self):
+        # Indexing array() returns plain ints, several times faster than NumPy scalars
+        if self._scalar is None:
+            indptr = array("q", self.indptr.tobytes())
+            indices = array("i" if self.indices.dtype == np.int32 else "q", self.indices.tobytes())
+            cumulative = array("d", self.cumulative().tobytes()) if self.weights is not None else None
+            self._scalar = (indptr, indices, cumulative)
+        return self._scalar
+
+    def cumulative(self):
+        if self._cumulative is None and self.weights is not None:
+            self._cumulative = np.cumsum(self.weights)
+        return self._cumulative
+
+    def neighbor(self, node, rng=random):
+        """One random out-neighbour of node (weighted if the graph has weights), or -1."""
+        if node >= self.n:
+            return -1
+        indptr, indices, cumulative = self._arrays()
+        start, stop = indptr[node], indptr[node + 1]
+        if start == stop:
+            return -1
+        if cumulative is None:
+            return indices[rng.randrange(start, stop)]
+        base = cumulative[start - 1] if start else 0.0
+        point = base + rng.random() * (cumulative[stop - 1] - base)
+        return indices[bisect_right(cumulative, point, start, stop - 1)]
+
+    def neighbors(self, node, k, rng=random):
+        """Up to k distinct out-neighbours of node; all of them if it has k or fewer."""
+        if node >= self.n:
+            return []
+        indptr, indices, cumulative = self._arrays()
+        start, stop = indptr[node], indptr[node + 1]
+        if stop - start <= k:
+            return list(indices[start:stop])
+        if cumulative is None:
+            return [indices[start + offset] for offset in rng.sample(range(stop - start), k)]
+        picked = set()
+        for _ in range(8 * k):  # Bounded: zero-weight edges are never drawn
+            picked.add(self.neighbor(node, rng))
+            if len(picked) == k:
+                break
+        return list(picked)
+
+    # --- Frontier propagation ---
+
+    def expand(self, frontier):
+        """
+        Every out-edge of the frontier nodes. Returns (position in frontier, target)
+        arrays, computed from the CSR arrays without a per-node loop.
+        """
+        frontier = np.asarray(frontier, dtype=np.int64)
+        counts = self.degree[frontier]
+        position = np.repeat(np.arange(len(frontier)), counts)
+        # Edge index = row start + offset within the row
+        offsets = np.arange(len(position)) - np.repeat(np.cumsum(counts) - counts, counts)
+        edge = np.repeat(self.indptr[frontier], counts) + offsets
+        return position, self.indices[edge]
+
+    def sample_neighbors(self, frontier, k=1, rng=None):
+        """
+        k random out-neighbours per frontier node, drawn with replacement and weighted
+        if the graph has weights. Nodes without neighbours are skipped. Returns
+        (position in frontier, target) arrays.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        frontier = np.asarray(frontier, dtype=np.int64)
+        counts = self.degree[frontier]
+        position = np.repeat(np.flatnonzero(counts > 0), k)
+        start = self.indptr[frontier[position]]
+        count = counts[position]
+        if self.weights is None:
+            edge = start + (rng.random(len(position)) * count).astype(np.int64)
+        else:
+            cumulative = self.cumulative()
+            base = np.where(start > 0, cumulative[start - 1], 0.0)
+            point = base + rng.random(len(position)) * (cumulative[start + count - 1] - base)
+            edge = np.clip(np.searchsorted(cumulative, point, side="right"), start, start + count - 1)
+        return position, self.indices[edge]
+
+    def propagate(self, frontier, fanout=None, rng=None):
+        """One hop of a cascade: every neighbour (fanout=None) or fanout sampled neighbours per node."""
+        if fanout is None:
+            return self.expand(frontier)
+        return self.sample_neighbors(frontier, fanout, rng)
+
+    def bfs(self, sources, max_depth=None, fanout=None, rng=None):
+        """
+        Breadth-first cascade from the source nodes. Returns each node's hop count from
+        the nearest source, or -1 if the cascade never reached it.
+        """
+        depth = np.full(self.n, -1, dtype=np.int32)
+        frontier = np.unique(np.asarray(sources, dtype=np.int64))
+        depth[frontier] = 0
+        level = 0
+        while len(frontier) and (max_depth is None or level < max_depth):
+            _, targets = self.propagate(frontier, fanout, rng)
+            targets = np.unique(targets[depth[targets] < 0])
+            level += 1
+            depth[targets] = level
+            frontier = targets
+        return depth
+
+
+# --- Main execution block for topology benchmarks ---
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import time
+    import contextlib
+    from compact_ledger import CompactLedger
+
+    print("------ Project Chrysalis: Topology Test ------")
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(7)
+    builders = (
+        ("random", lambda: Topology.random_graph(n, 10, rng)),
+        ("small-world", lambda: Topology.small_world(n, 10, 0.1, rng)),
+        ("scale-free", lambda: Topology.scale_free(n, 5, rng)),
+    )
+    for name, build in builders:
+        start = time.perf_counter()
+        topology = build()
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        depth = topology.bfs([0])
+        elapsed = time.perf_counter() - start
+        reached = depth >= 0
+        print(f"[SYS] {name}: {topology.edges:,} edges built in {built:.2f}s. BFS reached {int(reached.sum()):,} "
+              f"agents over {int(topology.degree[reached].sum()):,} edges in {elapsed:.2f}s "
+              f"(max degree {int(topology.degree.max())}, {int(depth.max())} hops).")
+
+    # Pulses in the object network follow the topology: fan-out to 3 neighbours
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        ledger = CompactLedger(fanout=3, topology=Topology.small_world(100_000, 6, 0.05, rng))
+    ledger.add_many(100_000)
+    ledger.engine.submit(ledger.id_of(0), "EXTERNAL", 0.5, 8)
+    ledger.engine.run_ticks()
+    ledger.engine.report()
+    print("------ SIMULATION COMPLETE ------")
@@ -0,0 +1,149 @@
+import time
+import struct
+import threading
+
+# --- TRACE LEVELS AND EVENTS ---
+
+TRACE_OFF = 0
+TRACE_SYS = 1    # Registration, vetoes
+TRACE_PULSE = 2  # Every pulse received, emitted or terminated
+
+EV_REGISTER = 1
+EV_RECEIVE = 2
+EV_EMIT = 3
+EV_EXPIRE = 4
+EV_HALTED = 5
+EV_VETO = 6
+EV_NO_PEER = 7
+EV_BATCH = 8
+
+EVENT_NAMES = {
+    EV_REGISTER: "REGISTER",
+    EV_RECEIVE: "RECEIVE",
+    EV_EMIT: "EMIT",
+    EV_EXPIRE: "EXPIRE",
+    EV_HALTED: "HALTED",
+    EV_VETO: "VETO",
+    EV_NO_PEER: "NO_PEER",
+    EV_BATCH: "BATCH",
+}
+
+# timestamp (ns), event, source handle, target handle, payload, ttl. -1 means "no agent".
+TRACE_RECORD = struct.Struct("<qB7xqqdq")
+
+
+# --- TRACER DEFINITION ---
+
+class Tracer:
+    """
+    Structured replacement for print() in the pulse hot path.
+    Call sites guard every event with a plain attribute check (`if TRACE.pulse:`), so a
+    disabled tracer costs one load and branch and never formats anything. When enabled,
+    events are packed as fixed-size binary records into a preallocated ring buffer;
+    a background flusher can stream them to disk.
+    """
+    def __init__(self, level=TRACE_OFF, capacity=65536, console=False):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity * TRACE_RECORD.size)
+        self.written = 0    # Total records ever written; the ring position is written % capacity
+        self.flushed = 0    # Records already handed to the flusher
+        self.overruns = 0   # Records overwritten before the flusher saw them
+        self.console = console
+        self.names = {}     # handle -> agent ID, kept only for console output
+        self._flusher = None
+        self._stop = threading.Event()
+        self.set_level(level)
+
+    def set_level(self, level):
+        self.level = level
+        # Hot-path flags, read directly by the call sites
+        self.sys = level >= TRACE_SYS
+        self.pulse = level >= TRACE_PULSE
+
+    def name(self, handle, agent_id):
+        if self.console:
+            self.names[handle] = agent_id
+
+    def record(self, event, source=-1, target=-1, payload=0.0, ttl=0):
+        timestamp = time.perf_counter_ns()
+        TRACE_RECORD.pack_into(self.buffer, (self.written % self.capacity) * TRACE_RECORD.size,
+                               timestamp, event, source, target, payload, ttl)
+        self.written += 1
+        if self.console:
+            print(self.format((timestamp, event, source, target, payload, ttl)))
+
+    def format(self, record):
+        _, event, source, target, payload, ttl = record
+        names = self.names
+        source = names.get(source, source if source >= 0 else "-")
+        target = names.get(target, target if target >= 0 else "-")
+        return (f"[{EVENT_NAMES.get(event, event)}] {source} -> {target}. "
+                f"Payload: {payload:.4f}. [TTL={ttl}]")
+
+    def records(self):
+        """Returns the records still held in the ring, oldest first."""
+        start = max(0, self.written - self.capacity)
+        return [TRACE_RECORD.unpack_from(self.buffer, (seq % self.capacity) * TRACE_RECORD.size)
+                for seq in range(start, self.written)]
+
+    def clear(self):
+        self.written = 0
+        self.flushed = 0
+        self.overruns = 0
+
+    # --- Disk flushing ---
+
+    def flush(self, stream):
+        """Writes every record not flushed yet to a binary stream. Returns the count written."""
+        written = self.written
+        start = self.flushed
+        if written - start > self.capacity:
+            self.overruns += written - start - self.capacity
+            start = written - self.capacity
+        size = TRACE_RECORD.size
+        first, last = start % self.capacity, written % self.capacity
+        if written - start == 0:
+            return 0
+        if first < last:
+            stream.write(self.buffer[first * size:last * size])
+        else:
+            stream.write(self.buffer[first * size:])
+            stream.write(self.buffer[:last * size])
+        self.flushed = written
+        return written - start
+
+    def start_flusher(self, path, interval=0.5):
+        """Starts a daemon thread that appends new records to `path` every `interval` seconds."""
+        if self._flusher is not None:
+            return
+        self._stop.clear()
+
+        def _run():
+            with open(path, "ab") as stream:
+                while not self._stop.wait(interval):
+                    self.flush(stream)
+                self.flush(stream)
+
+        self._flusher = threading.Thread(target=_run, name="trace-flusher", daemon=True)
+        self._flusher.start()
+
+    def stop_flusher(self):
+        if self._flusher is None:
+            return
+        self._stop.set()
+        self._flusher.join()
+        self._flusher = None
+
+
+def read_trace(path):
+    """Yields decoded records from a file written by the flusher."""
+    with open(path, "rb") as stream:
+        while True:
+            chunk = stream.read(TRACE_RECORD.size)
+            if len(chunk) < TRACE_RECORD.size:
+                return
+            yield TRACE_RECORD.unpack(chunk)
+
+
+# Process-wide tracer used by the network modules. Off unless a script turns it on.
+TRACE = Tracer()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The scripts import their siblings flatly, as they do when run from their own directory
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+for directory in ("network", "agents"):
+    path = os.path.join(REPO_ROOT, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
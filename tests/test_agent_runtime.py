@@ -0,0 +1,37 @@
+import asyncio
+from types import SimpleNamespace
+
+from agent_runtime import AgentRuntime
+from memory_firestore import InMemoryFirestore
+
+
+def shutdown(db, count, fail_commits):
+    runtime = AgentRuntime(db, count=0, max_workers=2)
+    runtime.coordinator.sleep = lambda seconds: None
+    for index in range(count):
+        doc_ref = db.collection("agents").document(f"agent-{index}")
+        doc_ref.set({"status": "running"})
+        runtime.agents.append(SimpleNamespace(id=f"agent-{index}", doc_ref=doc_ref))
+    db.fail_commits = fail_commits
+
+    async def main():
+        runtime._slots = asyncio.Semaphore(2)
+        await runtime._shutdown()
+    asyncio.run(main())
+    runtime.executor.shutdown(wait=True)
+    return runtime
+
+
+def test_final_flush_is_retried():
+    db = InMemoryFirestore()
+    # The first flush exhausts the coordinator's own retries; the second succeeds
+    runtime = shutdown(db, 3, fail_commits=6)
+    assert not runtime.coordinator.pending and runtime.errors == 0
+    assert all(doc["status"] == "stopped" for doc in db.collections["agents"].values())
+
+
+def test_unwritten_final_statuses_are_counted():
+    db = InMemoryFirestore()
+    runtime = shutdown(db, 3, fail_commits=10**6)
+    assert runtime.errors == 3
+    assert all(doc["status"] == "running" for doc in db.collections["agents"].values())
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from checkpoint import load_checkpoint, save_checkpoint, save_incremental
+from compact_ledger import CompactLedger
+from rng_streams import RngStreams
+from topology import Topology
+
+
+def make_ledger(topology=None, fanout=2):
+    streams = RngStreams(seed=3, n_streams=8, block_size=64)
+    ledger = CompactLedger(fanout=fanout, topology=topology, streams=streams)
+    ledger.add_many(500)
+    for handle in range(0, 500, 100):
+        ledger.engine.submit(ledger.id_of(handle), "EXTERNAL", 0.5, 9)
+    return ledger
+
+
+@pytest.fixture
+def topology():
+    return Topology.random_graph(500, 4, rng=np.random.default_rng(1))
+
+
+def test_resume_with_streams_matches_an_uninterrupted_run(tmp_path, topology):
+    ledger = make_ledger(topology)
+    ledger.engine.run(steps=300)
+    path = str(tmp_path / "network.ckpt")
+    save_checkpoint(ledger, path)
+    ledger.engine.run()
+
+    restored = load_checkpoint(path, streams=RngStreams(seed=3, n_streams=8, block_size=64), topology=topology)
+    assert restored.topology is topology
+    restored.engine.run()
+    assert restored.engine.processed == ledger.engine.processed - 300
+    assert restored.state == ledger.state
+
+
+def test_resume_creates_streams_when_none_are_passed(tmp_path):
+    ledger = make_ledger()
+    ledger.engine.run(steps=250)
+    path = str(tmp_path / "network.ckpt")
+    save_checkpoint(ledger, path)
+    ledger.engine.run()
+
+    restored = load_checkpoint(path)
+    assert restored.streams is not None and restored.streams.n_streams == 8
+    restored.engine.run()
+    assert restored.state == ledger.state
+
+
+def test_incremental_resume_with_streams(tmp_path, topology):
+    ledger = make_ledger(topology)
+    full, delta = str(tmp_path / "network.ckpt"), str(tmp_path / "network.ckpt.1")
+    save_checkpoint(ledger, full)
+    ledger.engine.run(steps=200)
+    ledger.add(agent_id="alpha")
+    save_incremental(ledger, delta)
+    ledger.engine.run()
+
+    restored = load_checkpoint(full, incrementals=[delta], topology=topology)
+    assert restored.handle_of("alpha") == 500
+    assert list(restored.engine.pending) and restored.size == ledger.size
+    restored.engine.run()
+    assert restored.state == ledger.state
+
+
+def test_stream_count_must_match(tmp_path):
+    ledger = make_ledger()
+    path = str(tmp_path / "network.ckpt")
+    save_checkpoint(ledger, path)
+    with pytest.raises(ValueError):
+        load_checkpoint(path, streams=RngStreams(seed=3, n_streams=4))
+
+
+def test_round_trip_without_streams(tmp_path):
+    ledger = CompactLedger()
+    ledger.add_many(100)
+    ledger.add(agent_id="alpha")
+    ledger.deregister(ledger.id_of(7))
+    ledger.engine.submit("alpha", "EXTERNAL", 0.5, 3)
+    path = str(tmp_path / "network.ckpt")
+    save_checkpoint(ledger, path)
+
+    restored = load_checkpoint(path)
+    assert restored.streams is None
+    assert restored.state == ledger.state and restored.alive == ledger.alive
+    assert restored.live == ledger.live == 100
+    assert list(restored.engine.pending) == [("alpha", "EXTERNAL", 0.5, 3)]
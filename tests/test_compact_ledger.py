@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from compact_ledger import CompactLedger
+from rng_streams import RngStreams
+
+
+@pytest.fixture
+def ledger():
+    ledger = CompactLedger()
+    ledger.add_many(20)
+    ledger.add(agent_id="alpha")
+    return ledger
+
+
+def test_ids_and_handles(ledger):
+    assert ledger.id_of(3) == "agent-3" and ledger.handle_of("agent-3") == 3
+    assert ledger.handle_of("alpha") == 20 and ledger.id_of(20) == "alpha"
+    assert ledger.handle_of("agent-20") == -1  # A named handle has no default name
+    assert ledger.handle_of("agent-x") == -1 and ledger.handle_of("EXTERNAL") == -1
+    # Only the canonical spelling: one agent, one ID
+    assert ledger.handle_of("agent-03") == -1 and ledger.handle_of("agent-٣") == -1
+    assert "agent-007" not in ledger.agents
+    with pytest.raises(ValueError):
+        ledger.add(agent_id="alpha")
+
+
+def test_deregistered_agents_are_never_picked(ledger):
+    for handle in range(0, 20, 2):
+        ledger.deregister(ledger.id_of(handle))
+    assert ledger.live == 11 and len(ledger.agents) == 11
+    assert "agent-2" not in ledger.agents and "agent-3" in ledger.agents
+    rng = random.Random(4)
+    for _ in range(200):
+        agent = ledger.get_random_agent(exclude_id="agent-3", rng=rng)
+        assert agent.handle % 2 or agent.id == "alpha"
+        assert agent.id != "agent-3"
+    peers = ledger.sample(50, exclude_id="agent-3", rng=rng)
+    assert len(peers) == 10 and len({peer.handle for peer in peers}) == 10
+
+
+def test_views_write_through_to_the_arrays(ledger):
+    agent = ledger.agents["agent-5"]
+    agent.internal_state = 0.75
+    agent.halted = True
+    assert ledger.state[5] == 0.75 and ledger.halted[5] == 1
+    state = ledger.state[5]
+    agent.receive_pulse("EXTERNAL", 1.0, 3)  # Halted: ignored
+    assert ledger.state[5] == state and not ledger.engine.pending
+
+
+def test_cascade_runs_for_ttl_hops(ledger):
+    ledger.engine.submit("alpha", "EXTERNAL", 0.5, 30)
+    assert ledger.engine.run() == 31
+    assert ledger.engine.undelivered == 0
+
+
+def test_streams_make_runs_reproducible():
+    def run():
+        ledger = CompactLedger(fanout=2, streams=RngStreams(seed=11, n_streams=4, block_size=32))
+        ledger.add_many(200)
+        ledger.engine.submit("agent-0", "EXTERNAL", 0.5, 8)
+        ledger.engine.run()
+        return ledger.state.tolist(), ledger.engine.processed
+
+    assert run() == run()
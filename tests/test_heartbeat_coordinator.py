@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+from heartbeat_coordinator import HeartbeatCoordinator
+from memory_firestore import InMemoryFirestore
+
+
+def make_agents(db, count):
+    agents = []
+    for index in range(count):
+        doc_ref = db.collection("agents").document(f"agent-{index}")
+        doc_ref.set({"status": "starting"})
+        agents.append(SimpleNamespace(id=f"agent-{index}", doc_ref=doc_ref))
+    return agents
+
+
+def make_coordinator(db, **options):
+    options.setdefault("max_retries", 0)
+    return HeartbeatCoordinator(db, batch_size=10, sleep=lambda seconds: None, **options)
+
+
+def status(db, agent):
+    return db.collections["agents"][agent.id]["status"]
+
+
+def test_flush_coalesces_marks_into_batches():
+    db = InMemoryFirestore()
+    coordinator = make_coordinator(db)
+    agents = make_agents(db, 25)
+    for agent in agents + agents:
+        coordinator.mark(agent)
+    trips = db.round_trips
+    assert coordinator.flush() == 25
+    assert db.round_trips - trips == 3
+    assert not coordinator.pending
+    assert all(status(db, agent) == "running" for agent in agents)
+
+
+def test_marks_made_during_a_commit_are_kept():
+    db = InMemoryFirestore()
+    coordinator = make_coordinator(db)
+    agents = make_agents(db, 3)
+    for agent in agents:
+        coordinator.mark(agent)
+    items = coordinator.take_pending()
+    coordinator.mark(agents[0], status="stopped")  # As the event loop would while the executor commits
+    assert coordinator.commit_pending(items) == []
+    assert list(coordinator.pending) == [agents[0].id]
+    coordinator.flush()
+    assert status(db, agents[0]) == "stopped"
+
+
+def test_failed_updates_are_requeued_without_replacing_newer_marks():
+    db = InMemoryFirestore()
+    coordinator = make_coordinator(db)
+    agents = make_agents(db, 3)
+    for agent in agents:
+        coordinator.mark(agent)
+    items = coordinator.take_pending()
+    coordinator.mark(agents[1], status="stopped")
+    db.fail_commits = 1
+    failed = coordinator.commit_pending(items)
+    assert len(failed) == 3 and coordinator.failures == 1
+    coordinator.requeue(failed)
+    assert coordinator.pending[agents[1].id][1]["status"] == "stopped"
+    assert coordinator.flush() == 3
+    assert [status(db, agent) for agent in agents] == ["running", "stopped", "running"]
+
+
+def test_a_deleted_document_does_not_sink_its_batch():
+    db = InMemoryFirestore()
+    coordinator = make_coordinator(db)
+    agents = make_agents(db, 10)
+    for agent in agents:
+        coordinator.mark(agent)
+    agents[6].doc_ref.delete()  # Update on a missing document: a permanent error
+    assert coordinator.flush() == 10
+    assert not coordinator.pending
+    assert coordinator.rejected == 1 and coordinator.failures == 0
+    assert agents[6].id not in db.collections["agents"]
+    assert all(status(db, agent) == "running" for agent in agents if agent is not agents[6])
+
+
+def test_transient_errors_are_retried_up_to_the_limit():
+    db = InMemoryFirestore()
+    coordinator = make_coordinator(db, max_retries=2)
+    agents = make_agents(db, 3)
+    for agent in agents:
+        coordinator.mark(agent)
+    db.fail_commits = 3
+    assert coordinator.flush() == 0
+    assert coordinator.retries == 2 and coordinator.failures == 1
+    assert len(coordinator.pending) == 3
+    assert coordinator.flush() == 3 and coordinator.rejected == 0
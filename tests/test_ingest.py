@@ -0,0 +1,104 @@
+import socket
+import threading
+
+import pytest
+
+from compact_ledger import CompactLedger
+from ingest import BLOCK, DROP, DROP_OLDEST, SAMPLE, Ingestor, parse_stimulus, socket_source
+
+
+@pytest.fixture
+def ledger():
+    ledger = CompactLedger(max_in_flight=1000)
+    ledger.add_many(50)
+    return ledger
+
+
+def test_parse_stimulus_formats():
+    assert parse_stimulus("agent-1 0.5 7") == ("agent-1", 0.5, 7)
+    assert parse_stimulus("agent-1 0.5", default_ttl=3) == ("agent-1", 0.5, 3)
+    assert parse_stimulus('{"target": "*", "payload": 1}') == ("*", 1.0, 20)
+    assert parse_stimulus("  # comment") is None
+    assert parse_stimulus("") is None
+
+
+@pytest.mark.parametrize("policy", [DROP, DROP_OLDEST, SAMPLE])
+def test_queue_stays_bounded(ledger, policy):
+    ingestor = Ingestor(ledger, capacity=10, policy=policy, sample_rate=0.0, high_water=0.5, seed=1)
+    for index in range(100):
+        ingestor.offer(f"agent-{index % 50} {index} 0")
+    assert ingestor.max_depth <= 10
+    assert ingestor.received == 100
+    assert ingestor.received == len(ingestor) + ingestor.dropped + ingestor.sampled_out
+    if policy == DROP_OLDEST:
+        assert [stimulus[1] for stimulus in ingestor.queue] == [float(value) for value in range(90, 100)]
+
+
+def test_malformed_lines_are_counted(ledger):
+    ingestor = Ingestor(ledger)
+    assert not ingestor.offer("agent-1 not-a-number")
+    assert not ingestor.offer("{broken json")
+    assert ingestor.malformed == 2 and not ingestor.queue
+
+
+def test_feed_survives_json_of_the_wrong_shape(ledger):
+    ingestor = Ingestor(ledger)
+    ingestor.feed([
+        '{"target": "agent-1", "payload": null}',
+        '{"target": "agent-1", "payload": [1]}',
+        '[1, 2]',
+        'agent-2 0.5 3',
+    ])
+    assert ingestor.exhausted.is_set()
+    assert ingestor.malformed == 3
+    assert [stimulus[:3] for stimulus in ingestor.queue] == [("agent-2", 0.5, 3)]
+
+
+def test_pump_respects_the_engine_bound(ledger):
+    ledger.engine.max_in_flight = 5
+    ingestor = Ingestor(ledger, policy=BLOCK)
+    for _ in range(8):
+        ingestor.offer("agent-3 0.5 0")
+    assert ingestor.pump() == 5
+    assert len(ledger.engine.pending) == 5 and len(ingestor) == 3
+    assert ingestor.pump() == 0 and ingestor.refused == 1
+    ledger.engine.run()
+    assert ingestor.pump() == 3
+
+
+def test_socket_source_refuses_to_delete_a_regular_file(tmp_path):
+    path = tmp_path / "stimuli"
+    path.write_text("keep me")
+    with pytest.raises(FileExistsError):
+        next(socket_source(str(path)))
+    assert path.read_text() == "keep me"
+
+
+def test_socket_source_replaces_a_stale_socket(tmp_path):
+    path = str(tmp_path / "stimuli.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+
+    stop = threading.Event()
+    lines = []
+
+    def read():
+        for line in socket_source(path, stop=stop, timeout=0.05):
+            lines.append(line)
+            stop.set()
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for _ in range(100):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(path)
+            break
+        except (ConnectionRefusedError, FileNotFoundError):
+            client.close()
+            stop.wait(0.02)
+    with client:
+        client.sendall(b"agent-1 0.5 3\n")
+    reader.join(5)
+    assert lines == ["agent-1 0.5 3\n"]
@@ -0,0 +1,65 @@
+from compact_ledger import CompactLedger
+from lazy_ledger import LazyLedger
+from rng_streams import RngStreams
+
+
+def test_reads_do_not_materialize_agents():
+    ledger = LazyLedger(10**12, seed=7)
+    agent = ledger.view("agent-123456789")
+    state = agent.internal_state
+    assert 0.0 <= state < 1.0
+    assert state == LazyLedger(10**12, seed=7).view("agent-123456789").internal_state
+    assert state != LazyLedger(10**12, seed=8).view("agent-123456789").internal_state
+    assert ledger.materialized == 0
+
+
+def test_first_write_materializes_one_agent():
+    ledger = LazyLedger(1_000_000, seed=1)
+    ledger.engine.submit("agent-42", "EXTERNAL", 0.5, 5)
+    assert ledger.engine.run() == 6
+    assert ledger.materialized <= 6
+    assert ledger.live == 1_000_000
+
+
+def test_ids_and_removal():
+    ledger = LazyLedger(100)
+    assert ledger.handle_of("agent-99") == 99
+    assert ledger.handle_of("agent-100") == -1 and ledger.handle_of("EXTERNAL") == -1
+    assert ledger.handle_of("agent-099") == -1 and ledger.handle_of("agent-00") == -1
+    ledger.deregister("agent-5")
+    assert ledger.handle_of("agent-5") == -1 and "agent-5" not in ledger.agents
+    assert ledger.live == 99
+    assert all(peer.handle != 5 for peer in ledger.sample(99))
+
+
+def test_halt_flags_and_veto():
+    ledger = LazyLedger(100)
+    agent = ledger.view("agent-3")
+    agent.halted = True
+    assert agent.halted and ledger.materialized == 0
+    ledger.engine.submit("agent-4", "EXTERNAL", 0.5, 50)
+    ledger.broadcast_veto()
+    assert not ledger.engine.pending
+    ledger.resume()
+    assert not ledger.network_halted
+
+
+def test_matches_a_compact_ledger_of_the_same_states():
+    # Same initial states and streams: the lazy and compact networks evolve identically
+    lazy = LazyLedger(300, seed=3, fanout=2, streams=RngStreams(seed=5, n_streams=4, block_size=32))
+    compact = CompactLedger(fanout=2, streams=RngStreams(seed=5, n_streams=4, block_size=32))
+    for handle in range(300):
+        compact.add(state=lazy.initial_state(handle))
+    for ledger in (lazy, compact):
+        ledger.engine.submit("agent-7", "EXTERNAL", 0.5, 7)
+        ledger.engine.run()
+    assert lazy.engine.processed == compact.engine.processed
+    assert [lazy.state[handle] for handle in range(300)] == compact.state.tolist()
+
+
+def test_agent_table_iterates_live_agents():
+    ledger = LazyLedger(6)
+    ledger.deregister("agent-2")
+    assert list(ledger.agents) == ["agent-0", "agent-1", "agent-3", "agent-4", "agent-5"]
+    assert len(ledger.agents) == 5
+    assert [(agent_id, agent.handle) for agent_id, agent in ledger.agents.items()][-1] == ("agent-5", 5)
@@ -0,0 +1,124 @@
+import threading
+
+import pytest
+
+from ledger_backends import InMemoryBackend, SQLiteBackend, WriteBehindCache
+
+
+class FlakyBackend(InMemoryBackend):
+    """Fails the next `fail` bulk writes, after running `during` (a concurrent writer)."""
+    def __init__(self, fail=0, during=None):
+        super().__init__()
+        self.fail = fail
+        self.during = during
+
+    def write_many(self, ops):
+        if self.during is not None:
+            during, self.during = self.during, None
+            during()
+        if self.fail:
+            self.fail -= 1
+            raise IOError("backend unavailable")
+        super().write_many(ops)
+
+
+def test_writes_coalesce_until_flush():
+    backend = InMemoryBackend()
+    cache = WriteBehindCache(backend)
+    cache.set("a", {"x": 1})
+    for value in range(100):
+        cache.update("a", {"y": value})
+    assert cache.get("a") == {"x": 1, "y": 99}
+    assert backend.get("a") is None
+    assert cache.flush() == 1
+    assert backend.get("a") == {"x": 1, "y": 99} and backend.writes == 1
+
+
+def test_failed_flush_keeps_its_writes():
+    backend = FlakyBackend(fail=1)
+    cache = WriteBehindCache(backend)
+    cache.set("a", {"x": 1})
+    cache.delete("b")
+    with pytest.raises(IOError):
+        cache.flush()
+    assert cache.pending == {"a": ("set", {"x": 1}), "b": ("delete", None)}
+    assert cache.stats()["failures"] == 1
+    assert cache.flush() == 2
+    assert backend.get("a") == {"x": 1}
+
+
+def test_requeued_writes_do_not_replace_newer_ones():
+    cache = None
+
+    def concurrent_writes():
+        cache.update("a", {"y": 2})   # Folds into the failed set
+        cache.set("b", {"z": 3})      # Replaces the failed update
+    backend = FlakyBackend(fail=1, during=concurrent_writes)
+    cache = WriteBehindCache(backend)
+    cache.set("a", {"x": 1})
+    cache.update("b", {"z": 0})
+    with pytest.raises(IOError):
+        cache.flush()
+    assert cache.pending == {"a": ("set", {"x": 1, "y": 2}), "b": ("set", {"z": 3})}
+    cache.flush()
+    assert backend.get("a") == {"x": 1, "y": 2} and backend.get("b") == {"z": 3}
+
+
+def test_update_after_delete_recreates_the_record():
+    backend = InMemoryBackend()
+    backend.set("a", {"x": 1, "y": 2})
+    cache = WriteBehindCache(backend)
+    cache.delete("a")
+    cache.update("a", {"z": 3})
+    assert cache.pending == {"a": ("set", {"z": 3})}
+    cache.flush()
+    assert backend.get("a") == {"z": 3}
+
+
+def test_inline_flush_failure_does_not_reach_the_writer():
+    backend = FlakyBackend(fail=1)
+    cache = WriteBehindCache(backend, max_pending=1, flush_interval=60.0)
+    cache.set("a", {"x": 1})          # The inline flush fails and is counted
+    cache.set("b", {"x": 2})          # Inside the retry delay: no backend call
+    assert cache.stats()["failures"] == 1
+    assert backend.writes == 0 and set(cache.pending) == {"a", "b"}
+    assert cache.flush() == 2
+    assert backend.get("b") == {"x": 2}
+
+
+def test_one_flush_at_a_time():
+    entered, release = threading.Event(), threading.Event()
+    order = []
+
+    class SlowBackend(InMemoryBackend):
+        def write_many(self, ops):
+            order.extend(fields["v"] for _, _, fields in ops)
+            entered.set()
+            release.wait(5)
+            super().write_many(ops)
+
+    backend = SlowBackend()
+    cache = WriteBehindCache(backend, max_pending=1)
+    first = threading.Thread(target=cache.set, args=("a", {"v": 1}))  # Full: flushes on the writer's thread
+    first.start()
+    assert entered.wait(5)
+    second = threading.Thread(target=cache.set, args=("a", {"v": 2}))
+    second.start()
+    second.join(0.1)
+    assert second.is_alive() and order == [1]  # Waits for the first flush instead of racing it
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert order == [1, 2]
+    assert backend.get("a") == {"v": 2}
+
+
+def test_sqlite_round_trip(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "ledger.db"))
+    try:
+        backend.write_many([("set", "a", {"x": 1}), ("update", "a", {"y": 2}), ("set", "b", {}), ("delete", "b", None)])
+        assert backend.get("a") == {"x": 1, "y": 2}
+        assert backend.get("b") is None
+        assert dict(backend.scan()) == {"a": {"x": 1, "y": 2}}
+    finally:
+        backend.close()
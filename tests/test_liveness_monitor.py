@@ -0,0 +1,71 @@
+import threading
+
+from ledger_backends import InMemoryBackend
+from liveness_monitor import LivenessMonitor
+from memory_firestore import InMemoryFirestore
+
+
+def test_only_agents_past_their_deadline_expire():
+    ledger = InMemoryBackend()
+    expired = []
+    monitor = LivenessMonitor(ledger, timeout=30.0, on_expired=[expired.append])
+    monitor.observe("a", now=0.0)
+    monitor.observe("b", now=0.0)
+    monitor.observe("a", now=20.0)  # Heartbeat: a's deadline moves to 50
+    assert monitor.tick(now=29.0) == []
+    assert monitor.tick(now=30.0) == ["b"]
+    assert expired == ["b"] and ledger.get("b") == {"status": "dead"}
+    assert monitor.stats()["stale_pops"] == 1  # a's superseded deadline
+    assert monitor.tick(now=50.0) == ["a"]
+    assert monitor.tick(now=1000.0) == []
+
+
+def test_clean_shutdown_is_not_reported_dead():
+    monitor = LivenessMonitor(InMemoryBackend(), timeout=10.0)
+    monitor.observe("a", now=0.0)
+    monitor.forget("a")
+    assert monitor.tick(now=100.0) == [] and monitor.expired == 0
+
+
+def test_fed_by_the_change_stream():
+    db = InMemoryFirestore()
+    agents = db.collection("agents")
+    now = [0.0]
+    monitor = LivenessMonitor(InMemoryBackend(), timeout=10.0, clock=lambda: now[0]).start(agents)
+    agents.document("a").set({"status": "running"})
+    agents.document("b").set({"status": "running"})
+    now[0] = 5.0
+    agents.document("a").set({"status": "running"})
+    agents.document("b").set({"status": "stopped"})
+    now[0] = 12.0
+    assert monitor.tick() == []
+    assert monitor.tick(now=15.0) == ["a"]
+    monitor.stop()
+
+
+def test_concurrent_heartbeats_and_ticks():
+    now = [0.0]
+    monitor = LivenessMonitor(InMemoryBackend(), timeout=1.0, clock=lambda: now[0])
+    errors = []
+
+    def heartbeats(offset):
+        try:
+            for step in range(20_000):
+                agent_id = f"agent-{(step + offset) % 500}"
+                if step % 7:
+                    monitor.observe(agent_id)
+                else:
+                    monitor.forget(agent_id)
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=heartbeats, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        now[0] += 0.25
+        monitor.tick()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    # Every tracked agent still has its current deadline in the heap
+    assert set(monitor.deadlines.items()) <= {(agent_id, deadline) for deadline, agent_id in monitor._heap}
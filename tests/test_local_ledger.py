@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+import network_v1_debugged
+import network_v2_veto
+
+
+@pytest.fixture(params=[network_v1_debugged, network_v2_veto], ids=["v1_debugged", "v2_veto"])
+def ledger(request):
+    module = request.param
+    ledger = module.LocalLedger()
+    for index in range(10):
+        module.C_Agent(ledger=ledger, agent_id=f"agent-{index}")
+    return ledger
+
+
+def check_slots(ledger):
+    # The slot table and the agent list stay index-aligned after every swap-remove
+    assert len(ledger._agent_list) == len(ledger._slots) == len(ledger.agents)
+    for agent_id, slot in ledger._slots.items():
+        assert ledger._agent_list[slot].id == agent_id
+
+
+@pytest.mark.parametrize("removed", [["agent-4"], ["agent-9"], ["agent-0", "agent-9", "agent-5"]],
+                         ids=["middle", "end", "several"])
+def test_deregister_swaps_the_last_agent_in(ledger, removed):
+    for agent_id in removed:
+        assert ledger.deregister(agent_id).id == agent_id
+        check_slots(ledger)
+    assert ledger.deregister(removed[0]) is None
+    assert set(ledger.agents) == {f"agent-{index}" for index in range(10)} - set(removed)
+
+
+def test_random_agent_skips_the_sender_and_removed_agents(ledger):
+    random.seed(3)
+    ledger.deregister("agent-2")
+    ledger.deregister("agent-9")
+    seen = {ledger.get_random_agent(exclude_id="agent-5").id for _ in range(500)}
+    assert seen == set(ledger.agents) - {"agent-5"}
+    assert ledger.get_random_agent(exclude_id="agent-2").id in ledger.agents
+
+
+def test_sample_returns_distinct_live_agents(ledger):
+    random.seed(4)
+    ledger.deregister("agent-3")
+    for k in (1, 4, 8, 20):
+        picked = [agent.id for agent in ledger.sample(k, exclude_id="agent-7")]
+        assert len(picked) == min(k, 8) and len(set(picked)) == len(picked)
+        assert set(picked) <= set(ledger.agents) - {"agent-7"}
+    assert len(ledger.sample(20)) == 9
+
+
+def test_last_agent_has_no_peer(ledger):
+    for index in range(9):
+        ledger.deregister(f"agent-{index}")
+    assert ledger.get_random_agent(exclude_id="agent-9") is None
+    assert ledger.sample(3, exclude_id="agent-9") == []
@@ -0,0 +1,123 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from metrics import METRICS, Histogram, _index, _upper
+from pulse_engine import PulseEngine
+
+
+class Sink:
+    """Agent stand-in that only counts deliveries."""
+    def __init__(self):
+        self.pulses = 0
+
+    def receive_pulse(self, source_id, payload, ttl):
+        self.pulses += 1
+
+    def receive_pulse_batch(self, group):
+        self.pulses += len(group)
+
+
+@pytest.fixture
+def metrics():
+    METRICS.enable(256)
+    METRICS.reset()
+    yield METRICS
+    METRICS.disable()
+    METRICS.reset()
+
+
+def make_engine():
+    sink = Sink()
+    ledger = SimpleNamespace(agents={"a": sink})
+    return PulseEngine(ledger), sink
+
+
+def estimated_calls(name):
+    stage = METRICS.stages[name]
+    return stage.calls * stage.scale
+
+
+def test_one_pulse_ticks_are_sampled_across_ticks(metrics):
+    engine, sink = make_engine()
+    for _ in range(1001):
+        engine.submit("a", "x", 1.0, 0)
+        engine.run_ticks()
+    assert sink.pulses == 1001
+    assert abs(estimated_calls("receive_pulse_batch") - 1001) < metrics.sample_every
+
+
+def test_single_step_runs_are_sampled_across_calls(metrics):
+    engine, sink = make_engine()
+    for _ in range(1001):
+        engine.submit("a", "x", 1.0, 0)
+        engine.run(steps=1)
+    assert sink.pulses == 1001
+    assert abs(estimated_calls("receive_pulse") - 1001) < metrics.sample_every
+
+
+def test_long_run_estimate(metrics):
+    engine, _ = make_engine()
+    for _ in range(10_000):
+        engine.submit("a", "x", 1.0, 0)
+    engine.run()
+    assert abs(estimated_calls("receive_pulse") - 10_000) < metrics.sample_every
+
+
+def test_disabled_metrics_record_nothing():
+    METRICS.reset()
+    engine, sink = make_engine()
+    engine.submit("a", "x", 1.0, 0)
+    engine.run()
+    assert sink.pulses == 1
+    assert all(not stage.calls for stage in METRICS.stages.values())
+
+
+def test_wrapped_stage_counts_every_call(metrics):
+    class Store:
+        def put(self, value):
+            return value
+
+    metrics.hot_path(Store, "put", prefix="test_")
+    try:
+        store = Store()
+        assert [store.put(n) for n in range(600)] == list(range(600))
+        assert metrics.stages["test_put"].calls == 600
+        assert metrics.stages["test_put"].histogram.count == 3  # Calls 0, 256 and 512
+    finally:
+        metrics.disable()
+        metrics._hooks.remove((Store, "put", "test_put"))
+    assert "put" in Store.__dict__ and not hasattr(Store.put, "__wrapped__")
+
+
+def test_histogram_buckets_bound_values():
+    histogram = Histogram()
+    for value in (1, 15, 16, 17, 1000, 123_456, 10**9):
+        assert value < _upper(_index(value))
+        histogram.record(value)
+    assert histogram.count == 7
+    assert histogram.max == 10**9
+    assert histogram.quantile(1.0) == 10**9
+    assert histogram.cumulative([16, 10**10]) == [2, 7]
+
+
+def test_exposition_scales_sampled_counts(metrics):
+    engine, _ = make_engine()
+    for _ in range(512):
+        engine.submit("a", "x", 1.0, 0)
+    engine.run()
+    text = metrics.exposition()
+    assert 'chrysalis_stage_calls_total{stage="receive_pulse"} 512' in text
+    assert 'chrysalis_stage_seconds_count{stage="receive_pulse"} 2' in text
+
+
+def test_network_modules_leave_the_import_path_alone():
+    network_dir = os.path.join(os.path.dirname(__file__), "..", "network")
+    script = ("import sys; before = list(sys.path); import compact_ledger, pulse_engine; "
+              "assert sys.path == before, sys.path; assert not pulse_engine.METRICS.enabled")
+    env = dict(os.environ, PYTHONPATH="")
+    subprocess.run([sys.executable, "-c", script], cwd=network_dir, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
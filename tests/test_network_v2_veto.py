@@ -0,0 +1,55 @@
+import pytest
+
+from network_v2_veto import C_Agent, LocalLedger
+
+
+@pytest.fixture
+def ledger():
+    ledger = LocalLedger()
+    for index in range(10):
+        C_Agent(ledger=ledger, agent_id=f"agent-{index}", group="even" if index % 2 == 0 else "odd")
+    return ledger
+
+
+def test_network_veto_cancels_pulses_in_flight(ledger):
+    for index in range(5):
+        ledger.engine.submit(f"agent-{index}", "EXTERNAL", 0.5, 10)
+    states = {agent.id: agent.internal_state for agent in ledger.agents.values()}
+    ledger.broadcast_veto()
+    assert not ledger.engine.pending and ledger.engine.dropped == 5
+    ledger.engine.submit("agent-0", "EXTERNAL", 0.5, 10)
+    ledger.engine.run()
+    ledger.resume()
+    ledger.engine.run()
+    assert {agent.id: agent.internal_state for agent in ledger.agents.values()} == states
+
+
+def test_scoped_vetoes(ledger):
+    agents = ledger.agents
+    ledger.veto_group("odd")
+    ledger.veto_range(0, 2)
+    assert [ledger.is_vetoed(agents[f"agent-{index}"]) for index in range(5)] == [True, True, False, True, False]
+    ledger.resume_group("odd")
+    ledger.resume_range(0, 2)
+    assert not ledger.vetoes_active
+    assert not any(ledger.is_vetoed(agent) for agent in agents.values())
+
+
+def test_vetoed_agent_ignores_pulses(ledger):
+    agent = ledger.agents["agent-3"]
+    state = agent.internal_state
+    ledger.veto_range(agent.handle, agent.handle + 1)
+    agent.receive_pulse("EXTERNAL", 1.0, 5)
+    agent.receive_pulse_batch([("EXTERNAL", 1.0, 5)])
+    assert agent.internal_state == state and not ledger.engine.pending
+
+
+def test_coalesced_update_matches_successive_updates(ledger):
+    stimuli = [0.3, 0.9, 0.1, 0.5]
+    one_by_one, batched = ledger.agents["agent-1"], ledger.agents["agent-2"]
+    one_by_one.internal_state = batched.internal_state = 0.25
+    for stimulus in stimuli:
+        one_by_one._process(stimulus, ttl=0)
+    batched.receive_pulse_batch([("EXTERNAL", stimulus, 1) for stimulus in stimuli])
+    assert batched.internal_state == pytest.approx(one_by_one.internal_state, rel=1e-12)
+    assert len(ledger.engine.pending) == len(stimuli) + 1  # One pulse per update, one for the batch
@@ -0,0 +1,66 @@
+import random
+
+from ledger_backends import InMemoryBackend
+from memory_firestore import InMemoryFirestore
+from peer_cache import PeerCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_change_stream_keeps_the_cache_current():
+    db = InMemoryFirestore()
+    agents = db.collection("agents")
+    agents.document("a").set({"status": "running"})
+    cache = PeerCache(agents).start()
+    assert "a" in cache
+    reads = db.reads
+    agents.document("b").set({"status": "running"})
+    agents.document("a").set({"status": "stopped"})
+    assert "b" in cache and "a" not in cache
+    assert cache.get("b") == {"status": "running"}
+    assert db.reads == reads  # Fed by the listener, not by queries
+    cache.stop()
+
+
+def test_random_peer_excludes_the_caller_and_skips_stale_entries():
+    clock = Clock()
+    cache = PeerCache(ttl=10.0, clock=clock)
+    for agent_id in "abc":
+        cache.put(agent_id, {"status": "running"})
+    random.seed(1)
+    assert {cache.random_peer(exclude_id="a") for _ in range(50)} == {"b", "c"}
+    clock.now = 5.0
+    cache.put("c", {"status": "running"})
+    clock.now = 12.0
+    assert {cache.random_peer() for _ in range(20)} == {"c"}
+    assert len(cache) == 1
+    assert cache.random_peer(exclude_id="c") is None
+
+
+def test_size_bound_and_expiry_evict_the_oldest():
+    clock = Clock()
+    cache = PeerCache(ttl=10.0, max_size=3, clock=clock)
+    for second, agent_id in enumerate("abcd"):
+        clock.now = float(second)
+        cache.put(agent_id, {"status": "running"})
+    assert "a" not in cache and len(cache) == 3
+    clock.now = 12.5
+    assert cache.expire() == 2
+    assert list(cache.records) == ["d"]
+
+
+def test_read_through_loader():
+    loader = InMemoryBackend()
+    loader.set("x", {"status": "running"})
+    loader.set("y", {"status": "dead"})
+    cache = PeerCache(loader=loader)
+    assert cache.get("x") == {"status": "running"} and "x" in cache
+    assert cache.get("y") is None and "y" not in cache
+    assert cache.get("z") is None
+    assert cache.stats()["loads"] == 3
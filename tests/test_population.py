@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from population import AgentPopulation
+
+
+def make_population(count=4, seed=1):
+    population = AgentPopulation(capacity=2, rng=np.random.default_rng(seed))
+    population.spawn(count, ids=[f"agent-{index}" for index in range(count)])
+    return population
+
+
+def test_spawn_checks_the_ids():
+    population = make_population()
+    assert population.size == 4 and population.slots["agent-3"] == 3
+    assert len(population.state) >= 4  # Grown past the initial capacity
+    with pytest.raises(ValueError):
+        population.spawn(2, ids=["a"])
+    assert population.size == 4
+
+
+def test_tick_matches_sequential_updates():
+    population = make_population()
+    before = population.state.copy()
+    targets, payloads, ttls = [2, 0, 2, 2], [0.5, 1.0, -0.25, 2.0], [3, 5, 7, 1]
+    out_targets, out_payloads, out_ttls = population.tick(targets, payloads, ttls)
+
+    expected = before.copy()
+    for target, payload in zip(targets, payloads):
+        expected[target] = expected[target] * 0.9 + payload * 0.1
+    assert np.allclose(population.state, expected)
+    assert population.processed == 4
+
+    # One pulse per hit slot, to another slot, with the highest incoming TTL minus one
+    assert sorted(zip(out_ttls.tolist(), out_payloads.tolist())) == \
+        sorted([(4, expected[0] * 1.1), (6, expected[2] * 1.1)])
+    assert set(out_targets.tolist()) <= {0, 1, 2, 3} and len(out_targets) == 2
+
+
+def test_halted_agents_and_expired_pulses_are_skipped():
+    population = make_population()
+    population.halted[1] = True
+    before = population.state.copy()
+    out_targets, _, _ = population.tick([1, 3], [0.5, 0.5], [4, 0])
+    assert np.array_equal(population.state, before)
+    assert population.processed == 0 and len(out_targets) == 0
+
+
+def test_run_carries_pulses_over():
+    population = make_population(count=10)
+    population.inject(0, 0.5, 5)
+    assert population.run(max_ticks=2) == 2
+    assert population.run() == 3  # TTLs 5 down to 1 are processed; the TTL-0 pulse dies
+
+
+def test_views_read_and_write_the_arrays():
+    population = make_population()
+    agent = population.view("agent-2")
+    assert agent.id == "agent-2" and agent.internal_state == population.state[2]
+    agent.internal_state = 0.25
+    assert population.state[2] == 0.25
+    agent.receive_pulse("EXTERNAL", 1.0, 3)
+    agent.receive_pulse_batch([("agent-0", 0.5, 2)])
+    assert population._pending == ([2, 2], [1.0, 0.5], [3, 2])
+    agent.issue_veto_command()
+    assert agent.halted and population.halted[2]
+    agent.halted = False
+    assert not population.halted[2]
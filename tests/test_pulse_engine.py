@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+from pulse_engine import PulseEngine
+
+
+class Recorder:
+    """Agent stand-in that logs deliveries and forwards each pulse to `forward` while ttl lasts."""
+    def __init__(self, engine_ref, name, forward=None):
+        self.engine_ref = engine_ref
+        self.id = name
+        self.forward = forward
+        self.log = []
+
+    def receive_pulse(self, source_id, payload, ttl):
+        self.log.append((source_id, payload, ttl))
+        if self.forward is not None and ttl > 0:
+            self.engine_ref[0].submit(self.forward, self.id, payload, ttl - 1)
+
+    def receive_pulse_batch(self, group):
+        self.log.append(tuple(group))
+        if self.forward is not None and max(ttl for _, _, ttl in group) > 0:
+            self.engine_ref[0].submit(self.forward, self.id, 0.0, max(ttl for _, _, ttl in group) - 1)
+
+
+def make_network(max_in_flight=None):
+    engine_ref = []
+    agents = {"a": Recorder(engine_ref, "a", forward="b"), "b": Recorder(engine_ref, "b", forward="a")}
+    engine = PulseEngine(SimpleNamespace(agents=agents), max_in_flight=max_in_flight)
+    engine_ref.append(engine)
+    return engine, agents
+
+
+def test_long_cascade_runs_without_recursion():
+    engine, agents = make_network()
+    engine.submit("a", "EXTERNAL", 1.0, 5000)
+    assert engine.run() == 5001
+    assert len(agents["a"].log) == 2501 and len(agents["b"].log) == 2500
+    assert engine.pulses_per_second() > 0
+
+
+def test_steps_bound_each_call():
+    engine, _ = make_network()
+    engine.submit("a", "EXTERNAL", 1.0, 10)
+    assert engine.run(steps=4) == 4
+    assert engine.in_flight() == 1
+    assert engine.run() == 7 and engine.processed == 11
+
+
+def test_bounded_queue_refuses_and_counts():
+    engine, _ = make_network(max_in_flight=2)
+    assert engine.submit("a", "EXTERNAL", 1.0, 0)
+    assert engine.submit("b", "EXTERNAL", 1.0, 0)
+    assert not engine.submit("a", "EXTERNAL", 1.0, 0)
+    assert engine.dropped == 1
+    engine.cancel_in_flight()
+    assert engine.in_flight() == 0 and engine.dropped == 3
+
+
+def test_missing_targets_are_undelivered():
+    engine, _ = make_network()
+    engine.submit("ghost", "EXTERNAL", 1.0, 3)
+    engine.submit("ghost", "EXTERNAL", 1.0, 3)
+    engine.run_tick()
+    engine.submit("ghost", "EXTERNAL", 1.0, 3)
+    engine.run()
+    assert engine.undelivered == 3 and engine.processed == 0
+
+
+def test_tick_delivers_only_what_was_pending_grouped_by_target():
+    engine, agents = make_network()
+    engine.submit("a", "x", 0.1, 2)
+    engine.submit("b", "y", 0.2, 0)
+    engine.submit("a", "z", 0.3, 1)
+    assert engine.run_tick() == 3
+    assert agents["a"].log == [(("x", 0.1, 2), ("z", 0.3, 1))]
+    assert agents["b"].log == [(("y", 0.2, 0),)]
+    assert list(engine.pending) == [("b", "a", 0.0, 1)]  # One coalesced pulse, for the next tick
+    assert engine.run_ticks() == 2 and engine.ticks == 3
+
+
+def test_exact_tick_delivers_pulses_one_by_one():
+    engine, agents = make_network()
+    engine.submit("a", "x", 0.1, 0)
+    engine.submit("a", "z", 0.3, 0)
+    engine.run_tick(exact=True)
+    assert agents["a"].log == [("x", 0.1, 0), ("z", 0.3, 0)]
+
+
+def test_ordered_tick_is_independent_of_arrival_order():
+    logs = []
+    for arrivals in ([("a", "2", 0.5), ("b", "1", 0.1), ("a", "1", 0.9)],
+                     [("a", "1", 0.9), ("a", "2", 0.5), ("b", "1", 0.1)]):
+        engine, agents = make_network()
+        for target, source, payload in arrivals:
+            engine.submit(target, source, payload, 0)
+        engine.run_tick(order=lambda agent_id: agent_id)
+        logs.append((agents["a"].log, agents["b"].log))
+    assert logs[0] == logs[1]
+    assert logs[0][0] == [(("1", 0.9, 0), ("2", 0.5, 0))]
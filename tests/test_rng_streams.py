@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from rng_streams import BlockStream, RngStreams
+
+
+def draws(streams, count=20):
+    return [streams.stream(key).random() for key in range(count)]
+
+
+def test_same_seed_same_draws():
+    assert draws(RngStreams(seed=9, n_streams=4, block_size=8)) == draws(RngStreams(seed=9, n_streams=4, block_size=8))
+    assert draws(RngStreams(seed=9, n_streams=4, block_size=8)) != draws(RngStreams(seed=10, n_streams=4, block_size=8))
+
+
+def test_block_size_does_not_change_the_sequence():
+    small, large = RngStreams(seed=2, n_streams=2, block_size=3), RngStreams(seed=2, n_streams=2, block_size=1000)
+    assert [small.stream(0).random() for _ in range(50)] == [large.stream(0).random() for _ in range(50)]
+
+
+def test_keys_map_to_logical_shards():
+    streams = RngStreams(seed=1, n_streams=4)
+    assert streams.stream(1) is streams.stream(5)
+    assert streams.stream(1) is not streams.stream(2)
+    assert streams.generator(6) is streams.stream(2).generator
+
+
+def test_draw_ranges():
+    stream = RngStreams(seed=3, n_streams=1).stream(0)
+    assert all(0.0 <= stream.random() < 1.0 for _ in range(1000))
+    assert all(2.0 <= stream.uniform(2.0, 3.0) <= 3.0 for _ in range(1000))
+    assert {stream.randrange(5) for _ in range(1000)} == set(range(5))
+    assert {stream.randrange(3, 6) for _ in range(1000)} == {3, 4, 5}
+    assert stream.choice("x") == "x"
+    with pytest.raises(ValueError):
+        stream.randrange(0)
+
+
+def test_sample_is_distinct():
+    stream = RngStreams(seed=4, n_streams=1).stream(0)
+    picked = stream.sample(range(10), 10)
+    assert sorted(picked) == list(range(10))
+    assert len(set(stream.sample(range(1000), 5))) == 5
+    with pytest.raises(ValueError):
+        stream.sample(range(3), 4)
+
+
+def test_block_stream_wraps_any_generator():
+    first = BlockStream(np.random.default_rng(5), block_size=4)
+    second = np.random.default_rng(5)
+    assert [first.random() for _ in range(10)] == second.random(12).tolist()[:10]
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from network_v2_veto import C_Agent
+from sharded_runtime import EXTERNAL_SOURCE, PulseRing, ShardEngine, ShardLedger, ShardedNetwork, _RemotePeer, _drain
+
+
+def test_pulse_ring_is_fifo_and_bounded():
+    ring = PulseRing(4)
+    try:
+        records = [(index, index + 1, index / 10, 3, 0) for index in range(6)]
+        assert ring.push_many(records) == 4
+        assert len(ring) == 4
+        assert ring.pop_many(3) == [(0, 1, 0.0, 3, 0), (1, 2, 0.1, 3, 0), (2, 3, 0.2, 3, 0)]
+        assert ring.push_many(records[4:]) == 2  # Wraps around the end of the buffer
+        assert [record[0] for record in ring.pop_many(10)] == [3, 4, 5]
+        assert len(ring) == 0
+    finally:
+        ring.close()
+
+
+def test_sample_skips_deregistered_local_agents():
+    ledger = ShardLedger(shard=0, n_shards=2, n_agents=10)
+    for index in range(0, 10, 2):
+        C_Agent(ledger=ledger, agent_id=str(index))
+    ledger.deregister("4")
+    peers = ledger.sample(9, exclude_id="0", rng=random.Random(3))
+    ids = {peer.id for peer in peers}
+    assert "4" not in ids and "0" not in ids
+    assert {peer.id for peer in peers if isinstance(peer, _RemotePeer)} == {"1", "3", "5", "7", "9"}
+    assert len(peers) == 8
+
+
+def test_pulses_sent_before_a_veto_are_discarded_after_it():
+    ledger = ShardLedger(shard=0, n_shards=2, n_agents=4)
+    engine = ShardEngine(ledger)
+    engine.submit("1", "0", 0.5, 3)
+    ledger.broadcast_veto()
+    assert ledger.halt_epoch == 1 and not engine.outboxes[1]  # Unsent remote pulses are cancelled
+    ledger.resume()
+    engine.submit("3", "2", 0.7, 3)
+    assert engine.outboxes[1] == [(3, 2, 0.7, 3, 1)]
+
+    ring = PulseRing(8)
+    try:
+        ring.push_many([(0, EXTERNAL_SOURCE, 0.1, 5, 0), (2, 1, 0.2, 5, 1), (0, 3, 0.3, 5, 0)])
+        pulses = []
+        assert _drain([ring], pulses, epoch=1) == 3  # Stale records are read, counted and dropped
+        assert pulses == [("2", "1", 0.2, 5)]
+    finally:
+        ring.close()
+
+
+def test_lockstep_worker_count_must_divide_streams():
+    with pytest.raises(ValueError):
+        ShardedNetwork(n_agents=100, n_workers=3, lockstep=True, n_streams=64)
+
+
+def run_lockstep(workers):
+    with ShardedNetwork(n_agents=300, n_workers=workers, seed=5, lockstep=True, n_streams=6) as network:
+        for index in range(0, 300, 10):
+            network.inject(index, 0.5, 8)
+        network.run_ticks()
+        return network.state_digest(), network.processed()
+
+
+def test_lockstep_digest_is_independent_of_worker_count():
+    digest, processed = run_lockstep(1)
+    assert processed > 30
+    assert run_lockstep(2) == (digest, processed)
+    assert run_lockstep(3) == (digest, processed)
+
@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+
+from compact_ledger import CompactLedger
+from topology import Topology
+
+
+def path_graph(n, weights=None):
+    return Topology.from_edges(n, np.arange(n - 1), np.arange(1, n), weights)
+
+
+def test_from_edges_builds_sorted_csr_without_loops_or_duplicates():
+    topology = Topology.from_edges(4, [2, 0, 0, 1, 0, 3], [1, 2, 1, 1, 2, 0])
+    assert topology.indptr.tolist() == [0, 2, 2, 3, 4]
+    assert topology.indices.tolist() == [1, 2, 1, 0]
+    assert topology.degree.tolist() == [2, 0, 1, 1]
+    undirected = Topology.from_edges(3, [0], [1], undirected=True)
+    sources, targets = undirected.expand(np.arange(3))
+    assert sorted(zip(sources.tolist(), targets.tolist())) == [(0, 1), (1, 0)]
+
+
+def test_neighbor_picks_only_out_neighbours():
+    topology = Topology.from_edges(5, [0, 0, 0], [1, 2, 3])
+    rng = random.Random(2)
+    assert {topology.neighbor(0, rng) for _ in range(100)} == {1, 2, 3}
+    assert topology.neighbor(4, rng) == -1 and topology.neighbor(99, rng) == -1
+    assert sorted(topology.neighbors(0, 5, rng)) == [1, 2, 3]
+    assert len(set(topology.neighbors(0, 2, rng))) == 2
+
+
+def test_zero_weight_edges_are_never_taken():
+    topology = Topology.from_edges(3, [0, 0], [1, 2], weights=[0.0, 1.0])
+    rng = random.Random(5)
+    assert {topology.neighbor(0, rng) for _ in range(200)} == {2}
+    _, targets = topology.sample_neighbors([0], k=50, rng=np.random.default_rng(5))
+    assert set(targets.tolist()) == {2}
+
+
+def test_bfs_depths():
+    topology = path_graph(6)
+    assert topology.bfs([0]).tolist() == [0, 1, 2, 3, 4, 5]
+    assert topology.bfs([2], max_depth=2).tolist() == [-1, -1, 0, 1, 2, -1]
+
+
+def test_save_and_load(tmp_path):
+    topology = Topology.random_graph(50, 3, rng=np.random.default_rng(1), weighted=True)
+    path = str(tmp_path / "graph.npz")
+    topology.save(path)
+    loaded = Topology.load(path)
+    assert np.array_equal(loaded.indptr, topology.indptr)
+    assert np.array_equal(loaded.indices, topology.indices)
+    assert np.array_equal(loaded.weights, topology.weights)
+
+
+def test_pulses_follow_topology_edges():
+    ledger = CompactLedger(topology=path_graph(10))
+    ledger.add_many(10)
+    ledger.engine.submit("agent-0", "EXTERNAL", 0.5, 20)
+    # Each agent forwards to its only neighbour until the end of the path
+    assert ledger.engine.run() == 10
+    assert ledger.engine.undelivered == 0
@@ -0,0 +1,73 @@
+import io
+
+from tracing import (EV_EMIT, EV_RECEIVE, TRACE_PULSE, TRACE_RECORD, TRACE_SYS, Tracer,
+                     read_trace)
+
+
+def events(records):
+    return [(event, source, target, payload, ttl) for _, event, source, target, payload, ttl in records]
+
+
+def test_record_packs_fixed_size_records():
+    tracer = Tracer(level=TRACE_SYS, capacity=8)
+    assert tracer.sys and not tracer.pulse
+    tracer.record(EV_RECEIVE, 1, 2, 0.5, 7)
+    tracer.record(EV_EMIT, target=3)
+    assert events(tracer.records()) == [(EV_RECEIVE, 1, 2, 0.5, 7), (EV_EMIT, -1, 3, 0.0, 0)]
+    assert len(tracer.buffer) == 8 * TRACE_RECORD.size
+
+
+def test_ring_keeps_the_newest_records():
+    tracer = Tracer(level=TRACE_PULSE, capacity=4)
+    for ttl in range(10):
+        tracer.record(EV_EMIT, ttl=ttl)
+    assert tracer.written == 10
+    assert [record[-1] for record in tracer.records()] == [6, 7, 8, 9]
+
+
+def test_flush_writes_only_new_records_across_the_wrap():
+    tracer = Tracer(capacity=4)
+    stream = io.BytesIO()
+    for ttl in range(3):
+        tracer.record(EV_EMIT, ttl=ttl)
+    assert tracer.flush(stream) == 3
+    assert tracer.flush(stream) == 0
+    for ttl in range(3, 6):   # Wraps: records 4 and 5 land at the start of the ring
+        tracer.record(EV_EMIT, ttl=ttl)
+    assert tracer.flush(stream) == 3
+    assert tracer.overruns == 0
+    ttls = [TRACE_RECORD.unpack_from(stream.getvalue(), offset)[-1]
+            for offset in range(0, len(stream.getvalue()), TRACE_RECORD.size)]
+    assert ttls == [0, 1, 2, 3, 4, 5]
+
+
+def test_flush_counts_records_overwritten_before_it_ran():
+    tracer = Tracer(capacity=4)
+    stream = io.BytesIO()
+    for ttl in range(10):
+        tracer.record(EV_EMIT, ttl=ttl)
+    assert tracer.flush(stream) == 4
+    assert tracer.overruns == 6 and tracer.flushed == 10
+    assert len(stream.getvalue()) == 4 * TRACE_RECORD.size
+
+
+def test_read_trace_round_trip(tmp_path):
+    path = tmp_path / "pulses.trace"
+    tracer = Tracer(level=TRACE_PULSE, capacity=16)
+    for ttl in range(5):
+        tracer.record(EV_RECEIVE, ttl, ttl + 1, ttl / 4, ttl)
+    with open(path, "ab") as stream:
+        tracer.flush(stream)
+    with open(path, "ab") as stream:
+        stream.write(b"\x00" * (TRACE_RECORD.size - 1))   # A torn final record is ignored
+    assert list(read_trace(path)) == tracer.records()
+
+
+def test_background_flusher_drains_on_stop(tmp_path):
+    path = tmp_path / "pulses.trace"
+    tracer = Tracer(level=TRACE_PULSE, capacity=16)
+    tracer.start_flusher(path, interval=60.0)
+    for ttl in range(3):
+        tracer.record(EV_EMIT, ttl=ttl)
+    tracer.stop_flusher()
+    assert [record[-1] for record in read_trace(path)] == [0, 1, 2]